@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+
+"""
+ONLY TO BE USED IN DEVELOPMENT!
+
+Benchmark the vectorized spending analytics against a per-row implementation.
+
+Generates synthetic (date, amount, budget_id, account_id) rows, as returned by
+the report query, and times the monthly, weekly and per-budget reports built
+with plain Python loops and with src.budget.analytics. The database fetch is
+left out; both sides start from the same rows.
+
+Usage:
+    python -m benchmarks.bench_analytics --transactions 1000000
+"""
+
+import argparse
+import random
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from src.budget.analytics import (
+    TransactionColumns,
+    spending_by_budget,
+    spending_by_period,
+)
+
+START_DATE = datetime(2021, 1, 1)
+HISTORY_DAYS = 3 * 365
+
+
+def make_rows(transactions: int) -> list:
+    """Deterministic synthetic report rows."""
+    random.seed(0)
+    return [
+        (
+            START_DATE + timedelta(minutes=random.randrange(HISTORY_DAYS * 1440)),
+            round(random.uniform(1, 200), 2),
+            random.randrange(20) or None,
+            1,
+        )
+        for _ in range(transactions)
+    ]
+
+
+def naive_period(rows: list, unit: str, window: int) -> list:
+    """Per-row group-by into a dict, then a loop for averages and changes."""
+    groups = defaultdict(lambda: [0.0, 0])
+    for date, amount, _, _ in rows:
+        day = date.date()
+        if unit == "month":
+            key = day.replace(day=1)
+        else:
+            key = day - timedelta(days=day.weekday())
+        groups[key][0] += amount
+        groups[key][1] += 1
+
+    periods, previous, history = [], None, []
+    for key in sorted(groups):
+        total, count = groups[key]
+        history = (history + [total])[-window:]
+        periods.append(
+            {
+                "period": key,
+                "total": total,
+                "count": count,
+                "running_average": sum(history) / len(history),
+                "change": None if previous is None else total - previous,
+            }
+        )
+        previous = total
+    return periods
+
+
+def naive_budget(rows: list) -> list:
+    groups = defaultdict(lambda: [0.0, 0])
+    for _, amount, budget_id, _ in rows:
+        groups[budget_id][0] += amount
+        groups[budget_id][1] += 1
+    return [
+        {"budget_id": budget_id, "total": total, "count": count}
+        for budget_id, (total, count) in groups.items()
+    ]
+
+
+def timed(function, *args, repeat: int = 3) -> float:
+    """Best wall time in ms over `repeat` runs."""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function(*args)
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--transactions", type=int, default=1_000_000)
+    parser.add_argument("--window", type=int, default=3)
+    args = parser.parse_args()
+
+    rows = make_rows(args.transactions)
+    load = timed(TransactionColumns.from_rows, rows)
+    columns = TransactionColumns.from_rows(rows)
+
+    reports = {
+        "monthly": (
+            lambda: naive_period(rows, "month", args.window),
+            lambda: spending_by_period(columns, "month", args.window),
+        ),
+        "weekly": (
+            lambda: naive_period(rows, "week", args.window),
+            lambda: spending_by_period(columns, "week", args.window),
+        ),
+        "per budget": (
+            lambda: naive_budget(rows),
+            lambda: spending_by_budget(columns),
+        ),
+    }
+
+    print(f"\n{args.transactions} transactions")
+    print(f"rows -> arrays: {load:.1f} ms (once per request)")
+    print(f"{'report':<14}{'per row (ms)':>16}{'vectorized (ms)':>18}{'speedup':>10}")
+    for name, (naive, vectorized) in reports.items():
+        slow, fast = timed(naive), timed(vectorized)
+        print(f"{name:<14}{slow:>16.1f}{fast:>18.1f}{slow / fast:>9.0f}x")
+
+
+if __name__ == "__main__":
+    main()
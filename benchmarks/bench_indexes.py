@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+
+"""
+ONLY TO BE USED IN DEVELOPMENT!
+
+Benchmark the hot lookup paths with and without the model indexes.
+
+Fills a scratch database with synthetic users, accounts, budgets and
+transactions, then times username, per-user date range, per-account and
+per-budget lookups first with the secondary indexes dropped and then with
+them in place.
+
+Usage:
+    python -m benchmarks.bench_indexes --url sqlite:////tmp/bench_indexes.db \
+        --users 1000000 --transactions 50000000
+"""
+
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from sqlmodel import SQLModel, create_engine, text
+
+from src.models.db_models import Account, Budget, LoyaltyProgram, Transaction, User
+
+BATCH_SIZE = 50_000
+START_DATE = datetime(2021, 1, 1)
+HISTORY_DAYS = 3 * 365
+
+# name -> (SQL, parameter factory)
+QUERIES = {
+    "user by username": (
+        'SELECT user_id FROM "user" WHERE username = :username',
+        lambda users: {"username": f"user{random.randrange(users)}"},
+    ),
+    "transactions by user and month": (
+        'SELECT transaction_id, amount FROM "transaction" '
+        "WHERE user_id = :user_id AND date >= :start AND date < :end",
+        lambda users: {
+            "user_id": random.randrange(users) + 1,
+            "start": START_DATE + timedelta(days=30 * random.randrange(35)),
+            "end": START_DATE + timedelta(days=30 * random.randrange(35) + 30),
+        },
+    ),
+    "transactions by account": (
+        'SELECT count(*) FROM "transaction" WHERE account_id = :account_id',
+        lambda users: {"account_id": random.randrange(users) + 1},
+    ),
+    "transactions by budget": (
+        'SELECT count(*) FROM "transaction" WHERE budget_id = :budget_id',
+        lambda users: {"budget_id": random.randrange(users) + 1},
+    ),
+}
+
+
+def populate(engine, users: int, transactions: int):
+    """Fill the database with deterministic synthetic rows."""
+    random.seed(0)
+    with engine.begin() as conn:
+        for start in range(0, users, BATCH_SIZE):
+            ids = range(start + 1, min(start + BATCH_SIZE, users) + 1)
+            conn.execute(
+                User.__table__.insert(),
+                [
+                    {
+                        "user_id": i,
+                        "username": f"user{i - 1}",
+                        "email": f"user{i - 1}@example.com",
+                        "password": "x",
+                    }
+                    for i in ids
+                ],
+            )
+            conn.execute(
+                Account.__table__.insert(),
+                [
+                    {
+                        "account_id": i,
+                        "user_id": i,
+                        "account_type": "checking",
+                        "balance": 0.0,
+                    }
+                    for i in ids
+                ],
+            )
+            conn.execute(
+                Budget.__table__.insert(),
+                [
+                    {
+                        "budget_id": i,
+                        "user_id": i,
+                        "name": "groceries",
+                        "amount": 500.0,
+                        "start_date": START_DATE,
+                        "end_date": START_DATE + timedelta(days=HISTORY_DAYS),
+                    }
+                    for i in ids
+                ],
+            )
+        print(f"Inserted {users} users, accounts and budgets")
+
+        for start in range(0, transactions, BATCH_SIZE):
+            rows = []
+            for _ in range(min(BATCH_SIZE, transactions - start)):
+                user_id = random.randrange(users) + 1
+                rows.append(
+                    {
+                        "user_id": user_id,
+                        "account_id": user_id,
+                        "budget_id": user_id if random.random() < 0.5 else None,
+                        "date": START_DATE
+                        + timedelta(minutes=random.randrange(HISTORY_DAYS * 1440)),
+                        "amount": round(random.uniform(1, 200), 2),
+                        "description": "purchase",
+                    }
+                )
+            conn.execute(Transaction.__table__.insert(), rows)
+            if (start // BATCH_SIZE) % 20 == 0:
+                print(f"Inserted {start + len(rows)} transactions")
+
+
+def time_queries(engine, users: int, lookups: int) -> dict:
+    """Return the mean latency in ms of each lookup query."""
+    results = {}
+    with engine.connect() as conn:
+        for name, (sql, params) in QUERIES.items():
+            statement = text(sql)
+            random.seed(1)
+            started = time.perf_counter()
+            for _ in range(lookups):
+                conn.execute(statement, params(users)).all()
+            results[name] = (time.perf_counter() - started) / lookups * 1000
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--url", default="sqlite:////tmp/bench_indexes.db")
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--transactions", type=int, default=50_000_000)
+    parser.add_argument("--lookups", type=int, default=200)
+    parser.add_argument(
+        "--unindexed-lookups",
+        type=int,
+        default=5,
+        help="lookups per query without indexes, as each one is a full scan",
+    )
+    args = parser.parse_args()
+
+    engine = create_engine(args.url)
+    tables = [
+        User.__table__,
+        Account.__table__,
+        Budget.__table__,
+        Transaction.__table__,
+        LoyaltyProgram.__table__,
+    ]
+    SQLModel.metadata.drop_all(engine, tables=tables)
+    SQLModel.metadata.create_all(engine, tables=tables)
+    indexes = [index for table in tables for index in table.indexes]
+
+    # load without secondary indexes, then measure full scans
+    with engine.begin() as conn:
+        for index in indexes:
+            index.drop(conn)
+    started = time.perf_counter()
+    populate(engine, args.users, args.transactions)
+    print(f"Loaded in {time.perf_counter() - started:.1f} s")
+    without = time_queries(engine, args.users, args.unindexed_lookups)
+
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        for index in indexes:
+            index.create(conn)
+    print(f"Built indexes in {time.perf_counter() - started:.1f} s")
+    with_indexes = time_queries(engine, args.users, args.lookups)
+
+    print(f"\n{args.users} users, {args.transactions} transactions")
+    print(f"{'query':<34}{'no index (ms)':>16}{'indexed (ms)':>16}{'speedup':>10}")
+    for name in QUERIES:
+        speedup = without[name] / with_indexes[name]
+        print(
+            f"{name:<34}{without[name]:>16.3f}{with_indexes[name]:>16.3f}"
+            f"{speedup:>9.0f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+
+"""
+ONLY TO BE USED IN DEVELOPMENT!
+
+Benchmark the per-request overhead of the metrics middleware.
+
+Serves the same endpoint, which runs one query on an in-memory database,
+from two apps: one bare and one with MetricsMiddleware and the database usage
+hooks installed, as in src.api.api. Requests are sent in-process through
+httpx's ASGI transport, so the difference is the instrumentation cost alone.
+Also times the middleware alone around a no-op app, and rendering /metrics
+for a realistic number of routes.
+
+Usage:
+    python -m benchmarks.bench_metrics --requests 20000
+"""
+
+import argparse
+import asyncio
+import time
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy import create_engine, text
+
+from src.api.metrics import MetricsMiddleware, RequestMetrics
+from src.db.tracing import install_db_usage
+from src.utils.request_context import DBUsage
+
+
+def make_app(instrumented: bool) -> FastAPI:
+    engine = create_engine("sqlite://")
+    app = FastAPI()
+    if instrumented:
+        install_db_usage(engine)
+        app.add_middleware(MetricsMiddleware, metrics=RequestMetrics())
+
+    @app.get("/items/{item_id}")
+    def get_item(item_id: int):
+        with engine.connect() as connection:
+            return {"item_id": connection.execute(text("SELECT 1")).scalar()}
+
+    return app
+
+
+async def time_requests(app: FastAPI, requests: int) -> float:
+    """Mean microseconds per request."""
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as c:
+        for i in range(200):  # warm up
+            await c.get(f"/items/{i}")
+        started = time.perf_counter()
+        for i in range(requests):
+            await c.get(f"/items/{i}")
+    return (time.perf_counter() - started) / requests * 1e6
+
+
+async def time_middleware(calls: int) -> float:
+    """Microseconds the middleware itself adds around a no-op ASGI app."""
+
+    async def noop(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+
+    async def send(message):
+        pass
+
+    scope = {"type": "http", "method": "GET", "path": "/"}
+    wrapped = MetricsMiddleware(noop, RequestMetrics())
+    timings = []
+    for app in (noop, wrapped):
+        started = time.perf_counter()
+        for _ in range(calls):
+            await app(dict(scope), None, send)
+        timings.append(time.perf_counter() - started)
+    return (timings[1] - timings[0]) / calls * 1e6
+
+
+def time_render(routes: int) -> float:
+    """Milliseconds to render /metrics with `routes` routes and 3 statuses each."""
+    metrics = RequestMetrics()
+    for route in range(routes):
+        for status in (200, 404, 500):
+            metrics.observe("GET", f"/route/{route}", status, 0.01, DBUsage())
+    started = time.perf_counter()
+    metrics.render()
+    return (time.perf_counter() - started) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--routes", type=int, default=50)
+    args = parser.parse_args()
+
+    # alternate runs so that both see the same machine conditions
+    bare, instrumented = [], []
+    for _ in range(3):
+        bare.append(asyncio.run(time_requests(make_app(False), args.requests)))
+        instrumented.append(asyncio.run(time_requests(make_app(True), args.requests)))
+    bare_us, instrumented_us = min(bare), min(instrumented)
+
+    print(f"\n{args.requests} requests, best of 3")
+    print(f"bare:          {bare_us:8.1f} us/request")
+    print(f"instrumented:  {instrumented_us:8.1f} us/request")
+    print(
+        f"overhead:      {instrumented_us - bare_us:8.1f} us/request "
+        f"({(instrumented_us / bare_us - 1) * 100:.1f}%)"
+    )
+    middleware_us = asyncio.run(time_middleware(args.requests * 10))
+    print(f"middleware alone: {middleware_us:5.1f} us/request")
+    print(f"render /metrics, {args.routes} routes: {time_render(args.routes):.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+
+"""
+ONLY TO BE USED IN DEVELOPMENT!
+
+Benchmark the cost of turning a page of user rows into a response body.
+
+Compares the previous path of the user list endpoint, pydantic objects built
+by hand then validated and encoded again by FastAPI through response_model
+and rendered with the stdlib json module, with the current one: rows
+converted to dicts and rendered once by orjson. The rows are fetched once
+from an in-memory database; only serialization is timed.
+
+Usage:
+    python -m benchmarks.bench_serialization --users 10000
+"""
+
+import argparse
+import asyncio
+import time
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from src.models.data_models import UserPage, UserResponse
+from src.models.db_models import User
+
+
+def fetch_rows(users: int) -> list:
+    """User rows as returned by the user list query."""
+    engine = create_engine("sqlite://")
+    SQLModel.metadata.create_all(engine, tables=[User.__table__])
+    with Session(engine) as session:
+        session.exec(
+            User.__table__.insert(),
+            params=[
+                {
+                    "username": f"user{i}",
+                    "email": f"user{i}@example.com",
+                    "password": "x",
+                }
+                for i in range(users)
+            ],
+        )
+        return session.exec(select(User.user_id, User.username, User.email)).all()
+
+
+async def before(rows: list, field) -> bytes:
+    page = UserPage(
+        items=[
+            UserResponse(user_id=row.user_id, username=row.username, email=row.email)
+            for row in rows
+        ],
+        next_cursor="abc",
+    )
+    content = await serialize_response(field=field, response_content=page)
+    return JSONResponse(content).body
+
+
+async def after(rows: list, field) -> bytes:
+    content = {"items": [row._asdict() for row in rows], "next_cursor": "abc"}
+    return ORJSONResponse(content).body
+
+
+async def timed(path, rows: list, field, repeat: int) -> float:
+    """Best wall time in ms over `repeat` runs."""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await path(rows, field)
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    rows = fetch_rows(args.users)
+    field = create_response_field(name="Response_get_users", type_=UserPage)
+    assert asyncio.run(before(rows, field)).replace(b" ", b"") == asyncio.run(
+        after(rows, field)
+    ), "Bodies differ"
+
+    slow = asyncio.run(timed(before, rows, field, args.repeat))
+    fast = asyncio.run(timed(after, rows, field, args.repeat))
+    print(f"\n{args.users} users per response")
+    print(f"response_model + json: {slow:8.2f} ms")
+    print(f"rows + orjson:         {fast:8.2f} ms")
+    print(f"speedup:               {slow / fast:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Alembic environment
+
+Runs migrations against DATABASE_URL unless a URL or an open connection is
+passed in through the Alembic config (see src.db.migrate).
+"""
+
+from alembic import context
+from sqlalchemy.pool import NullPool
+from sqlmodel import SQLModel, create_engine
+
+import src.models.db_models  # noqa: F401  registers the tables on the metadata
+from src.budget.search import is_search_object
+from src.utils.shared import CONFIG
+
+config = context.config
+target_metadata = SQLModel.metadata
+
+
+def _database_url() -> str:
+    return config.get_main_option("sqlalchemy.url") or CONFIG.database_url
+
+
+def include_name(name, type_, parent_names) -> bool:
+    """Leave the hand-made search indexes out of autogenerate."""
+    return not is_search_object(name)
+
+
+def _configure(**kwargs):
+    context.configure(
+        target_metadata=target_metadata,
+        compare_type=True,
+        include_name=include_name,
+        **kwargs,
+    )
+
+
+def run_migrations_offline():
+    """Emit the migration SQL instead of running it."""
+    url = _database_url()
+    _configure(
+        url=url,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+        render_as_batch=url.startswith("sqlite"),
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def _run_with_connection(connection):
+    # SQLite cannot ALTER most things in place, so use batch (copy-and-move) mode
+    _configure(
+        connection=connection, render_as_batch=connection.dialect.name == "sqlite"
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    """Run the migrations against a live database."""
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        _run_with_connection(connection)
+        return
+
+    engine = create_engine(_database_url(), poolclass=NullPool)
+    with engine.connect() as connection:
+        _run_with_connection(connection)
+    engine.dispose()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,86 @@
+"""
+Initial schema
+
+The tables as SQLModel.metadata.create_all used to create them on startup.
+Databases created that way are already at this revision: run
+`python -m src.db.migrate stamp 0001` on them once, then upgrade.
+
+Revision ID: 0001
+Revises:
+Create Date: 2024-09-01 00:00:00
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+import sqlmodel
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "user",
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("username", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column("email", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column("password", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.PrimaryKeyConstraint("user_id"),
+    )
+    op.create_table(
+        "account",
+        sa.Column("account_id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("account_type", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column("balance", sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["user.user_id"]),
+        sa.PrimaryKeyConstraint("account_id"),
+    )
+    op.create_table(
+        "budget",
+        sa.Column("budget_id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("name", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column("amount", sa.Float(), nullable=False),
+        sa.Column("start_date", sa.DateTime(), nullable=False),
+        sa.Column("end_date", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["user.user_id"]),
+        sa.PrimaryKeyConstraint("budget_id"),
+    )
+    op.create_table(
+        "loyaltyprogram",
+        sa.Column("loyalty_id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("program_name", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column("points", sa.Integer(), nullable=False),
+        sa.Column("last_updated_date", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["user.user_id"]),
+        sa.PrimaryKeyConstraint("loyalty_id"),
+    )
+    op.create_table(
+        "transaction",
+        sa.Column("transaction_id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("account_id", sa.Integer(), nullable=False),
+        sa.Column("budget_id", sa.Integer(), nullable=True),
+        sa.Column("date", sa.DateTime(), nullable=False),
+        sa.Column("amount", sa.Float(), nullable=False),
+        sa.Column("description", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.ForeignKeyConstraint(["account_id"], ["account.account_id"]),
+        sa.ForeignKeyConstraint(["budget_id"], ["budget.budget_id"]),
+        sa.ForeignKeyConstraint(["user_id"], ["user.user_id"]),
+        sa.PrimaryKeyConstraint("transaction_id"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("transaction")
+    op.drop_table("loyaltyprogram")
+    op.drop_table("budget")
+    op.drop_table("account")
+    op.drop_table("user")
@@ -0,0 +1,104 @@
+"""
+Lookup indexes
+
+Unique username/email and the foreign key and (user_id, date) indexes used by
+the hot lookup paths. Built online: on Postgres each index is created
+CONCURRENTLY outside of a transaction, so writes are not blocked while it
+builds.
+
+A concurrent build that fails, e.g. on a duplicate username, leaves an
+INVALID index behind which IF NOT EXISTS would then skip. Duplicates are
+looked for first, so the upgrade stops before building anything, and an
+invalid index left by an earlier attempt is dropped and built again.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2024-09-02 00:00:00
+"""
+
+from typing import List, Sequence, Union
+
+from alembic import op
+from alembic.util import CommandError
+from sqlalchemy import text
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# name, table, columns, unique
+INDEXES = [
+    ("ix_user_username", "user", ["username"], True),
+    ("ix_user_email", "user", ["email"], True),
+    ("ix_account_user_id", "account", ["user_id"], False),
+    ("ix_budget_user_id", "budget", ["user_id"], False),
+    ("ix_loyaltyprogram_user_id", "loyaltyprogram", ["user_id"], False),
+    ("ix_transaction_user_id_date", "transaction", ["user_id", "date"], False),
+    ("ix_transaction_account_id", "transaction", ["account_id"], False),
+    ("ix_transaction_budget_id", "transaction", ["budget_id"], False),
+]
+
+
+def _check_unique(table: str, columns: List[str]):
+    """Stop the upgrade if columns to be made unique have duplicates."""
+    quoted = ", ".join(f'"{column}"' for column in columns)
+    duplicates = op.get_bind().execute(
+        text(
+            f'SELECT {quoted} FROM "{table}" GROUP BY {quoted} '
+            "HAVING COUNT(*) > 1 LIMIT 5"
+        )
+    )
+    examples = [", ".join(map(repr, row)) for row in duplicates]
+    if examples:
+        raise CommandError(
+            f"Cannot make {table}.{'/'.join(columns)} unique, it has duplicates "
+            f"such as {'; '.join(examples)}; resolve them and upgrade again"
+        )
+
+
+def _drop_if_invalid(name: str, table: str):
+    """Drop an index left INVALID by a failed concurrent build."""
+    invalid = (
+        op.get_bind()
+        .execute(
+            text(
+                "SELECT 1 FROM pg_index "
+                "WHERE indexrelid = to_regclass(:name) AND NOT indisvalid"
+            ),
+            {"name": name},
+        )
+        .scalar()
+    )
+    if invalid:
+        op.drop_index(name, table_name=table, postgresql_concurrently=True)
+
+
+def upgrade() -> None:
+    for _, table, columns, unique in INDEXES:
+        if unique:
+            _check_unique(table, columns)
+
+    postgresql = op.get_bind().dialect.name == "postgresql"
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    with op.get_context().autocommit_block():
+        for name, table, columns, unique in INDEXES:
+            if postgresql:
+                _drop_if_invalid(name, table)
+            op.create_index(
+                name,
+                table,
+                columns,
+                unique=unique,
+                if_not_exists=True,
+                postgresql_concurrently=True,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(
+                name, table_name=table, if_exists=True, postgresql_concurrently=True
+            )
@@ -0,0 +1,43 @@
+"""
+Budget rollups
+
+Adds the budgetrollup table and fills it from the existing transactions.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2024-09-03 00:00:00
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "budgetrollup",
+        sa.Column("budget_id", sa.Integer(), nullable=False),
+        sa.Column("spent", sa.Float(), nullable=False),
+        sa.Column("transaction_count", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["budget_id"], ["budget.budget_id"]),
+        sa.PrimaryKeyConstraint("budget_id"),
+    )
+    op.execute(
+        """
+        INSERT INTO budgetrollup (budget_id, spent, transaction_count)
+        SELECT b.budget_id, COALESCE(SUM(t.amount), 0), COUNT(t.transaction_id)
+        FROM budget b LEFT JOIN "transaction" t ON t.budget_id = b.budget_id
+        GROUP BY b.budget_id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("budgetrollup")
@@ -0,0 +1,80 @@
+"""
+Loyalty points ledger
+
+Adds the loyaltyentry ledger and loyaltycheckpoint tables and the entry
+counter of loyaltyprogram. Existing balances are carried over as one opening
+adjustment per program, so the ledger sums to the cached balance.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2024-09-04 00:00:00
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+import sqlmodel
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: Union[str, None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("loyaltyprogram") as batch_op:
+        batch_op.add_column(
+            sa.Column("entry_count", sa.Integer(), nullable=False, server_default="0")
+        )
+
+    op.create_table(
+        "loyaltyentry",
+        sa.Column("entry_id", sa.Integer(), nullable=False),
+        sa.Column("loyalty_id", sa.Integer(), nullable=False),
+        sa.Column("entry_type", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column("points", sa.Integer(), nullable=False),
+        sa.Column("date", sa.DateTime(), nullable=False),
+        sa.Column("description", sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+        sa.ForeignKeyConstraint(["loyalty_id"], ["loyaltyprogram.loyalty_id"]),
+        sa.PrimaryKeyConstraint("entry_id"),
+    )
+    op.create_index(
+        "ix_loyaltyentry_loyalty_id_date", "loyaltyentry", ["loyalty_id", "date"]
+    )
+    op.create_table(
+        "loyaltycheckpoint",
+        sa.Column("entry_id", sa.Integer(), nullable=False),
+        sa.Column("loyalty_id", sa.Integer(), nullable=False),
+        sa.Column("date", sa.DateTime(), nullable=False),
+        sa.Column("balance", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["entry_id"], ["loyaltyentry.entry_id"]),
+        sa.ForeignKeyConstraint(["loyalty_id"], ["loyaltyprogram.loyalty_id"]),
+        sa.PrimaryKeyConstraint("entry_id"),
+    )
+    op.create_index(
+        "ix_loyaltycheckpoint_loyalty_id_date",
+        "loyaltycheckpoint",
+        ["loyalty_id", "date"],
+    )
+
+    op.execute(
+        """
+        INSERT INTO loyaltyentry (loyalty_id, entry_type, points, date, description)
+        SELECT loyalty_id, 'adjust', points, last_updated_date, 'Opening balance'
+        FROM loyaltyprogram WHERE points <> 0
+        """
+    )
+    op.execute("UPDATE loyaltyprogram SET entry_count = 1 WHERE points <> 0")
+
+
+def downgrade() -> None:
+    op.drop_index(
+        "ix_loyaltycheckpoint_loyalty_id_date", table_name="loyaltycheckpoint"
+    )
+    op.drop_table("loyaltycheckpoint")
+    op.drop_index("ix_loyaltyentry_loyalty_id_date", table_name="loyaltyentry")
+    op.drop_table("loyaltyentry")
+    with op.batch_alter_table("loyaltyprogram") as batch_op:
+        batch_op.drop_column("entry_count")
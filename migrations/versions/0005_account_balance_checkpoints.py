@@ -0,0 +1,89 @@
+"""
+Account balance checkpoints
+
+Adds the accountbalancecheckpoint table, filled from the existing
+transactions, and replaces the account_id index of transaction with an
+(account_id, date) index that serves balance tails by date.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2024-09-05 00:00:00
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0005"
+down_revision: Union[str, None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# month start of a transaction date, as stored by each dialect
+MONTH_OF_DATE = {
+    "postgresql": "date_trunc('month', date)",
+    "sqlite": "strftime('%Y-%m-01 00:00:00.000000', date)",
+}
+
+
+def upgrade() -> None:
+    op.create_table(
+        "accountbalancecheckpoint",
+        sa.Column("account_id", sa.Integer(), nullable=False),
+        sa.Column("month", sa.DateTime(), nullable=False),
+        sa.Column("change_minor", sa.BigInteger(), nullable=False),
+        sa.Column("transaction_count", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["account_id"], ["account.account_id"]),
+        sa.PrimaryKeyConstraint("account_id", "month"),
+    )
+
+    month = MONTH_OF_DATE.get(op.get_bind().dialect.name)
+    if month is not None:
+        op.execute(
+            f"""
+            INSERT INTO accountbalancecheckpoint
+                (account_id, month, change_minor, transaction_count)
+            SELECT account_id, {month},
+                SUM(CAST(ROUND(ROUND(CAST(amount * 100 AS NUMERIC), 6)) AS BIGINT)),
+                COUNT(*)
+            FROM "transaction"
+            GROUP BY account_id, {month}
+            """
+        )
+    # other dialects: python -m src.budget.balances rebuild
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_transaction_account_id_date",
+            "transaction",
+            ["account_id", "date"],
+            if_not_exists=True,
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_transaction_account_id",
+            table_name="transaction",
+            if_exists=True,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_transaction_account_id",
+            "transaction",
+            ["account_id"],
+            if_not_exists=True,
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_transaction_account_id_date",
+            table_name="transaction",
+            if_exists=True,
+            postgresql_concurrently=True,
+        )
+    op.drop_table("accountbalancecheckpoint")
@@ -0,0 +1,37 @@
+"""
+Budget recurrence
+
+Adds the recurrence column of budget, for budgets whose window repeats every
+week or month. Existing budgets do not recur. Transactions are assigned to
+budgets as they are inserted from now on; to assign the existing ones:
+
+    python -m src.budget.assignment backfill
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2024-09-06 00:00:00
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+import sqlmodel
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0006"
+down_revision: Union[str, None] = "0005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("budget") as batch_op:
+        batch_op.add_column(
+            sa.Column("recurrence", sqlmodel.sql.sqltypes.AutoString(), nullable=True)
+        )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("budget") as batch_op:
+        batch_op.drop_column("recurrence")
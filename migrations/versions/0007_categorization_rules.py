@@ -0,0 +1,56 @@
+"""
+Categorization rules
+
+Adds the categoryrule table of user-defined description patterns and the
+category column of transaction. Existing transactions are categorized once
+rules exist, with:
+
+    python -m src.budget.rules recategorize
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2024-09-07 00:00:00
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+import sqlmodel
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0007"
+down_revision: Union[str, None] = "0006"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "categoryrule",
+        sa.Column("rule_id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("pattern", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column("match_type", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column("category", sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+        sa.Column("budget_id", sa.Integer(), nullable=True),
+        sa.Column("priority", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["budget_id"], ["budget.budget_id"]),
+        sa.ForeignKeyConstraint(["user_id"], ["user.user_id"]),
+        sa.PrimaryKeyConstraint("rule_id"),
+    )
+    op.create_index(
+        "ix_categoryrule_user_id", "categoryrule", ["user_id"], unique=False
+    )
+
+    with op.batch_alter_table("transaction") as batch_op:
+        batch_op.add_column(
+            sa.Column("category", sqlmodel.sql.sqltypes.AutoString(), nullable=True)
+        )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("transaction") as batch_op:
+        batch_op.drop_column("category")
+    op.drop_index("ix_categoryrule_user_id", table_name="categoryrule")
+    op.drop_table("categoryrule")
@@ -0,0 +1,107 @@
+"""
+Transaction search indexes
+
+Indexes transaction descriptions for src.budget.search, per dialect:
+
+- Postgres: a GIN trigram index on (user_id, description), which needs the
+  pg_trgm and btree_gin extensions shipped with Postgres;
+- SQLite: a contentless FTS5 table over the descriptions, with the user_id
+  indexed alongside so that a match is scoped to one user's rows, a
+  vocabulary table for fuzzy matching and triggers that keep it in step
+  with the transactions.
+
+Neither is described by the models, so autogenerate skips them (see
+is_search_object).
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2024-09-08 00:00:00
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0008"
+down_revision: Union[str, None] = "0007"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == "postgresql":
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        op.execute("CREATE EXTENSION IF NOT EXISTS btree_gin")
+        # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+        with op.get_context().autocommit_block():
+            op.execute(
+                "CREATE INDEX CONCURRENTLY IF NOT EXISTS "
+                'ix_transaction_user_id_description_trgm ON "transaction" '
+                "USING gin (user_id, description gin_trgm_ops)"
+            )
+    elif dialect == "sqlite":
+        # contentless, as the user_id token is not a column of the content;
+        # deletes must therefore pass the values that were indexed
+        op.execute(
+            "CREATE VIRTUAL TABLE transaction_fts "
+            "USING fts5(user_id, description, content='')"
+        )
+        op.execute(
+            "CREATE VIRTUAL TABLE transaction_fts_vocab "
+            "USING fts5vocab(transaction_fts, 'col')"
+        )
+        op.execute(
+            """
+            CREATE TRIGGER transaction_fts_insert AFTER INSERT ON "transaction"
+            BEGIN
+                INSERT INTO transaction_fts (rowid, user_id, description)
+                VALUES (new.transaction_id, new.user_id, new.description);
+            END
+            """
+        )
+        op.execute(
+            """
+            CREATE TRIGGER transaction_fts_delete AFTER DELETE ON "transaction"
+            BEGIN
+                INSERT INTO transaction_fts
+                    (transaction_fts, rowid, user_id, description)
+                VALUES
+                    ('delete', old.transaction_id, old.user_id, old.description);
+            END
+            """
+        )
+        op.execute(
+            """
+            CREATE TRIGGER transaction_fts_update
+            AFTER UPDATE OF user_id, description ON "transaction"
+            BEGIN
+                INSERT INTO transaction_fts
+                    (transaction_fts, rowid, user_id, description)
+                VALUES
+                    ('delete', old.transaction_id, old.user_id, old.description);
+                INSERT INTO transaction_fts (rowid, user_id, description)
+                VALUES (new.transaction_id, new.user_id, new.description);
+            END
+            """
+        )
+        op.execute(
+            "INSERT INTO transaction_fts (rowid, user_id, description) "
+            'SELECT transaction_id, user_id, description FROM "transaction"'
+        )
+
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == "postgresql":
+        with op.get_context().autocommit_block():
+            op.execute(
+                "DROP INDEX CONCURRENTLY IF EXISTS "
+                "ix_transaction_user_id_description_trgm"
+            )
+    elif dialect == "sqlite":
+        for trigger in ("insert", "delete", "update"):
+            op.execute(f"DROP TRIGGER IF EXISTS transaction_fts_{trigger}")
+        op.execute("DROP TABLE IF EXISTS transaction_fts_vocab")
+        op.execute("DROP TABLE IF EXISTS transaction_fts")
@@ -0,0 +1,56 @@
+"""
+Budget period index
+
+Replaces the budget_id index of transaction with a (budget_id, date) index,
+so that the spending of one period of a recurring budget is summed from
+that period's transactions instead of the budget's whole history.
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2024-09-09 00:00:00
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0009"
+down_revision: Union[str, None] = "0008"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_transaction_budget_id_date",
+            "transaction",
+            ["budget_id", "date"],
+            if_not_exists=True,
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_transaction_budget_id",
+            table_name="transaction",
+            if_exists=True,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_transaction_budget_id",
+            "transaction",
+            ["budget_id"],
+            if_not_exists=True,
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_transaction_budget_id_date",
+            table_name="transaction",
+            if_exists=True,
+            postgresql_concurrently=True,
+        )
@@ -0,0 +1,432 @@
+#!/usr/bin/env python
+
+"""
+ONLY TO BE USED IN DEVELOPMENT!
+
+This script fills a database with synthetic users, accounts, budgets,
+transactions and loyalty programs shaped like production data.
+
+Every user's rows come from a random generator seeded with --seed and the
+user id, so the same arguments always produce the same data, however the
+work is split. Users own fixed ranges of account, budget and loyalty program
+ids, which lets parallel workers load disjoint ranges of users, each chunk
+in one transaction through the statement importer's bulk loader (COPY on
+Postgres). Budget rollups, account balance checkpoints and loyalty ledgers
+are written with the rows, so the derived tables agree with the data.
+
+Activity per user and amounts per merchant are log-normal, i.e. most users
+are light and a few are very heavy. All seeded users share the password
+PASSWORD, hashed once.
+
+Usage:
+    python -m scripts.seed_data --users 20000 --transactions-per-user 500
+    python -m scripts.seed_data --url sqlite:////tmp/seed.db --users 100 --reset
+"""
+
+import argparse
+import math
+import multiprocessing
+import os
+import random
+import time
+from datetime import datetime, timedelta
+from itertools import accumulate
+from typing import Dict, List, Tuple
+
+from sqlalchemy import Engine, func, select
+from sqlalchemy.engine import make_url
+from sqlmodel import create_engine
+
+from src.budget.importer import DEFAULT_BATCH_SIZE, bulk_insert, insert_transactions
+from src.db.migrate import downgrade, upgrade
+from src.models.db_models import (
+    Account,
+    Budget,
+    LoyaltyCheckpoint,
+    LoyaltyEntry,
+    LoyaltyProgram,
+    User,
+    pwd_context,
+)
+from src.utils.shared import CONFIG, LOGGER
+
+PASSWORD = "seeded-password"
+
+# category -> (merchant, median amount); spending is positive
+MERCHANTS = {
+    "Groceries": [
+        ("Fresh Market", 85.0),
+        ("Corner Grocer", 32.0),
+        ("Wholesale Club", 160.0),
+    ],
+    "Dining": [
+        ("Coffee House", 6.5),
+        ("Burrito Bar", 14.0),
+        ("Pizza Palace", 25.0),
+        ("Local Bistro", 48.0),
+    ],
+    "Transport": [
+        ("Gas Station", 45.0),
+        ("Ride Share", 22.0),
+        ("City Transit", 2.75),
+        ("Parking Garage", 15.0),
+    ],
+    "Utilities": [
+        ("Electric Company", 95.0),
+        ("Water Utility", 40.0),
+        ("Internet Provider", 70.0),
+        ("Mobile Carrier", 60.0),
+    ],
+    "Shopping": [
+        ("Online Store", 38.0),
+        ("Department Store", 52.0),
+        ("Electronics Outlet", 180.0),
+        ("Hardware Store", 75.0),
+    ],
+    "Entertainment": [
+        ("Streaming Service", 15.5),
+        ("Music Subscription", 10.99),
+        ("Cinema", 28.0),
+        ("Concert Tickets", 120.0),
+    ],
+    "Travel": [
+        ("Airline", 420.0),
+        ("Hotel", 210.0),
+        ("Vacation Rental", 350.0),
+        ("Car Rental", 160.0),
+    ],
+}
+CATEGORIES = list(MERCHANTS)
+# cumulative share of transactions per category, in CATEGORIES order
+CATEGORY_WEIGHTS = list(accumulate([22, 25, 18, 6, 18, 8, 3]))
+
+ACCOUNT_TYPES = ("checking", "savings", "credit card")
+# relative share of transactions per account type
+ACCOUNT_ACTIVITY = {"checking": 3.0, "savings": 0.2, "credit card": 2.0}
+
+LOYALTY_PROGRAMS = (
+    "Airline Miles",
+    "Hotel Rewards",
+    "Coffee Stars",
+    "Grocery Points",
+    "Cashback Club",
+)
+# cumulative odds of earn, redeem, adjust and expire entries
+ENTRY_WEIGHTS = list(accumulate([78, 15, 4, 3]))
+
+COUNT_SIGMA = 1.0  # spread of activity per user and per program
+AMOUNT_SIGMA = 0.5  # spread of amounts around the merchant median
+REFUND_RATE = 0.02
+BUDGETED_RATE = 0.8  # share of transactions assigned to a matching budget
+
+# tables in load order, with the columns generated for them
+TABLES = [
+    (User.__table__, ("user_id", "username", "email", "password")),
+    (Account.__table__, ("account_id", "user_id", "account_type", "balance")),
+    (
+        Budget.__table__,
+        ("budget_id", "user_id", "name", "amount", "start_date", "end_date"),
+    ),
+    (
+        LoyaltyProgram.__table__,
+        (
+            "loyalty_id",
+            "user_id",
+            "program_name",
+            "points",
+            "last_updated_date",
+            "entry_count",
+        ),
+    ),
+    (
+        LoyaltyEntry.__table__,
+        ("loyalty_id", "entry_type", "points", "date", "description"),
+    ),
+]
+
+
+def lognormal_count(rng: random.Random, mean: float) -> int:
+    """A count with the given mean and a long tail."""
+    if mean <= 0:
+        return 0
+    return int(rng.lognormvariate(math.log(mean) - COUNT_SIGMA**2 / 2, COUNT_SIGMA))
+
+
+def random_dates(rng: random.Random, count: int, args) -> List[datetime]:
+    """Sorted dates spread over [args.start, args.end)."""
+    span = int((args.end - args.start).total_seconds())
+    return sorted(
+        args.start + timedelta(seconds=rng.randrange(span)) for _ in range(count)
+    )
+
+
+def generate_transactions(
+    rng: random.Random, user_id: int, accounts: List[Tuple[int, str]], args
+) -> Tuple[List[dict], List[str]]:
+    """
+    A user's transactions, spread over their accounts by account type, and
+    the spending category of each.
+    """
+    account_ids = [account_id for account_id, _ in accounts]
+    account_weights = list(
+        accumulate(ACCOUNT_ACTIVITY[account_type] for _, account_type in accounts)
+    )
+    count = lognormal_count(rng, args.transactions_per_user)
+
+    records, categories = [], []
+    for date in random_dates(rng, count, args):
+        category = rng.choices(CATEGORIES, cum_weights=CATEGORY_WEIGHTS)[0]
+        merchant, median = rng.choice(MERCHANTS[category])
+        amount = round(median * rng.lognormvariate(0, AMOUNT_SIGMA), 2)
+        if rng.random() < REFUND_RATE:
+            amount, merchant = -amount, f"{merchant} refund"
+        records.append(
+            {
+                "user_id": user_id,
+                "account_id": rng.choices(account_ids, cum_weights=account_weights)[0],
+                "budget_id": None,
+                "date": date,
+                "amount": amount,
+                "description": merchant.upper(),
+            }
+        )
+        categories.append(category)
+    return records, categories
+
+
+def generate_entries(rng: random.Random, loyalty_id: int, args) -> List[tuple]:
+    """A program's ledger entries in date order; the balance never goes negative."""
+    entries, balance = [], 0
+    for date in random_dates(rng, lognormal_count(rng, args.entries_per_program), args):
+        entry_type = rng.choices(
+            ("earn", "redeem", "adjust", "expire"), cum_weights=ENTRY_WEIGHTS
+        )[0]
+        if entry_type == "earn" or balance == 0:
+            entry_type, points = "earn", int(rng.lognormvariate(5.5, 1.0)) + 1
+        elif entry_type == "adjust":
+            points = rng.randint(-min(balance, 100), 100) or 1
+        else:
+            points = -rng.randint(1, balance)
+        balance += points
+        entries.append((loyalty_id, entry_type, points, date, None))
+    return entries
+
+
+def generate_users(
+    args, first: int, last: int, password_hash: str
+) -> Tuple[Dict[str, List[tuple]], List[dict]]:
+    """
+    Rows of users `first` to `last` (inclusive) per table name, and their
+    transaction records.
+    """
+    rows = {table.name: [] for table, _ in TABLES}
+    transactions = []
+    for user_id in range(first, last + 1):
+        rng = random.Random(f"{args.seed}:{user_id}")
+        rows["user"].append(
+            (user_id, f"user{user_id}", f"user{user_id}@example.com", password_hash)
+        )
+
+        accounts = [((user_id - 1) * args.max_accounts + 1, "checking")]
+        for k in range(1, rng.randint(1, args.max_accounts)):
+            accounts.append(
+                ((user_id - 1) * args.max_accounts + k + 1, rng.choice(ACCOUNT_TYPES))
+            )
+        records, record_categories = generate_transactions(rng, user_id, accounts, args)
+
+        balances = dict.fromkeys((account_id for account_id, _ in accounts), 0.0)
+        for record in records:
+            balances[record["account_id"]] += record["amount"]
+        for account_id, account_type in accounts:
+            rows["account"].append(
+                (account_id, user_id, account_type, round(balances[account_id], 2))
+            )
+
+        categories = rng.sample(CATEGORIES, rng.randint(0, args.max_budgets))
+        budget_ids = {
+            category: (user_id - 1) * args.max_budgets + k + 1
+            for k, category in enumerate(categories)
+        }
+        spent = dict.fromkeys(categories, 0.0)
+        for record, category in zip(records, record_categories):
+            if category in budget_ids and rng.random() < BUDGETED_RATE:
+                record["budget_id"] = budget_ids[category]
+                spent[category] += record["amount"]
+        for category, budget_id in budget_ids.items():
+            # some budgets are overspent, some are not
+            amount = round(max(spent[category], 100.0) * rng.uniform(0.8, 1.3), -1)
+            rows["budget"].append(
+                (budget_id, user_id, category, amount, args.start, args.end)
+            )
+        transactions.extend(records)
+
+        programs = rng.sample(LOYALTY_PROGRAMS, rng.randint(0, args.max_programs))
+        for k, program_name in enumerate(programs):
+            loyalty_id = (user_id - 1) * args.max_programs + k + 1
+            entries = generate_entries(rng, loyalty_id, args)
+            rows["loyaltyprogram"].append(
+                (
+                    loyalty_id,
+                    user_id,
+                    program_name,
+                    sum(entry[2] for entry in entries),
+                    entries[-1][3] if entries else args.start,
+                    len(entries),
+                )
+            )
+            rows["loyaltyentry"].extend(entries)
+    return rows, transactions
+
+
+def write_loyalty_checkpoints(connection, first_id: int, last_id: int):
+    """
+    Checkpoint the balance after every LOYALTY_CHECKPOINT_INTERVAL-th entry of
+    the programs in [first_id, last_id], as posting the entries would have.
+    """
+    entries = LoyaltyEntry.__table__
+    window = {"partition_by": entries.c.loyalty_id, "order_by": entries.c.entry_id}
+    ranked = (
+        select(
+            entries.c.entry_id,
+            entries.c.loyalty_id,
+            entries.c.date,
+            func.sum(entries.c.points).over(**window).label("balance"),
+            func.row_number().over(**window).label("position"),
+        )
+        .where(entries.c.loyalty_id.between(first_id, last_id))
+        .subquery()
+    )
+    connection.execute(
+        LoyaltyCheckpoint.__table__.insert().from_select(
+            ["entry_id", "loyalty_id", "date", "balance"],
+            select(
+                ranked.c.entry_id, ranked.c.loyalty_id, ranked.c.date, ranked.c.balance
+            ).where(ranked.c.position % CONFIG.loyalty_checkpoint_interval == 0),
+        )
+    )
+
+
+# per worker process, set by init_worker
+_ENGINE: Engine = None
+_ARGS = None
+_PASSWORD_HASH = None
+
+
+def init_worker(url: str, args, password_hash: str):
+    global _ENGINE, _ARGS, _PASSWORD_HASH
+    _ENGINE = create_engine(url, pool_size=1)
+    _ARGS = args
+    _PASSWORD_HASH = password_hash
+
+
+def load_users(bounds: Tuple[int, int]) -> Tuple[int, int]:
+    """Generate and load a range of users in one transaction."""
+    first, last = bounds
+    rows, transactions = generate_users(_ARGS, first, last, _PASSWORD_HASH)
+    with _ENGINE.begin() as connection:
+        if connection.dialect.name == "postgresql":
+            # a crash loses recent chunks, never consistency; seeding is rerun
+            connection.exec_driver_sql("SET LOCAL synchronous_commit = off")
+        for table, columns in TABLES:
+            if rows[table.name]:
+                bulk_insert(connection, table, columns, rows[table.name])
+        write_loyalty_checkpoints(
+            connection,
+            (first - 1) * _ARGS.max_programs + 1,
+            last * _ARGS.max_programs,
+        )
+        for start in range(0, len(transactions), DEFAULT_BATCH_SIZE):
+            # budgets are assigned by generate_users: assigning by date would
+            # put the transactions left unbudgeted into the user's first budget
+            insert_transactions(
+                connection,
+                transactions[start : start + DEFAULT_BATCH_SIZE],
+                auto_assign=False,
+            )
+    return last - first + 1, len(transactions)
+
+
+def finish(engine: Engine):
+    """Move the id sequences past the explicit ids and refresh statistics."""
+    if engine.dialect.name != "postgresql":
+        return
+    with engine.begin() as connection:
+        # ledger entries are the only rows loaded without ids
+        for table, _ in TABLES[:-1]:
+            column = table.primary_key.columns[0].name
+            connection.exec_driver_sql(
+                f"SELECT setval(pg_get_serial_sequence('\"{table.name}\"', "
+                f"'{column}'), (SELECT coalesce(max({column}), 0) + 1 "
+                f'FROM "{table.name}"), false)'
+            )
+        connection.exec_driver_sql("ANALYZE")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--url", help="database to fill, default DATABASE_URL")
+    parser.add_argument("--reset", action="store_true", help="recreate the schema")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--transactions-per-user", type=float, default=200)
+    parser.add_argument("--entries-per-program", type=float, default=40)
+    parser.add_argument("--max-accounts", type=int, default=3)
+    parser.add_argument("--max-budgets", type=int, default=4)
+    parser.add_argument("--max-programs", type=int, default=2)
+    parser.add_argument("--start", type=datetime.fromisoformat, default="2022-01-01")
+    parser.add_argument("--end", type=datetime.fromisoformat, default="2025-01-01")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--chunk-size", type=int, default=200, help="users per chunk")
+    args = parser.parse_args()
+    if args.max_budgets > len(CATEGORIES):
+        parser.error(f"--max-budgets can be at most {len(CATEGORIES)}")
+    if args.max_programs > len(LOYALTY_PROGRAMS):
+        parser.error(f"--max-programs can be at most {len(LOYALTY_PROGRAMS)}")
+
+    url = args.url or CONFIG.database_url
+    if args.reset:
+        downgrade(url)
+        upgrade(url)
+    engine = create_engine(url)
+    with engine.connect() as connection:
+        if connection.execute(select(func.count()).select_from(User)).scalar_one():
+            parser.error("the database already has users; use --reset to empty it")
+
+    # SQLite has a single writer
+    workers = 1 if make_url(url).get_backend_name() == "sqlite" else args.workers
+    chunks = [
+        (first, min(first + args.chunk_size - 1, args.users))
+        for first in range(1, args.users + 1, args.chunk_size)
+    ]
+    password_hash = pwd_context.hash(PASSWORD)
+
+    started = time.perf_counter()
+    users = transactions = 0
+    if workers > 1:
+        pool = multiprocessing.Pool(workers, init_worker, (url, args, password_hash))
+        results = pool.imap_unordered(load_users, chunks)
+    else:
+        pool = None
+        init_worker(url, args, password_hash)
+        results = map(load_users, chunks)
+    for loaded_users, loaded_transactions in results:
+        users += loaded_users
+        transactions += loaded_transactions
+        elapsed = time.perf_counter() - started
+        LOGGER.info(
+            f"Loaded {users}/{args.users} users, {transactions} transactions "
+            f"({transactions / elapsed:.0f} transactions/s)"
+        )
+    if pool is not None:
+        pool.close()
+        pool.join()
+
+    finish(engine)
+    LOGGER.info(
+        f"Seeded {users} users and {transactions} transactions "
+        f"in {time.perf_counter() - started:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -4,78 +4,792 @@ This module contains the API endpoints for user registration, login, and retriev
 It utilizes the FastAPI framework for building the API and interacts with a database using SQLModel.
 """
 
-from typing import List
+import math
+from datetime import datetime, timezone
+from typing import List, Literal, Optional, Union
 
-from fastapi import Depends, FastAPI, HTTPException, status
-from sqlmodel import Session, SQLModel, select
+import orjson
+from fastapi import Depends, FastAPI, HTTPException, Query, Request, status
+from fastapi.responses import ORJSONResponse, PlainTextResponse, StreamingResponse
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from starlette.concurrency import run_in_threadpool
 
-from src.db.database import engine, get_db
-from src.models.data_models import LoginData, UserCreate, UserResponse
-from src.models.db_models import User
-from src.utils.shared import LOGGER
+from src.api.metrics import CONTENT_TYPE, REQUEST_METRICS, MetricsMiddleware
+from src.api.middleware import ReadYourWritesMiddleware, RequestContextMiddleware
+from src.auth.dependencies import (
+    get_authenticated_user,
+    get_current_claims,
+    require_internal_token,
+)
+from src.auth.hashing import PASSWORD_HASHER, HashingSaturatedError
+from src.auth.rate_limit import LOGIN_LIMITER, LoginRateLimitedError
+from src.auth.user_cache import USER_CACHE, CachedUser, get_user_by_username
+from src.budget.analytics import (
+    load_transactions,
+    spending_by_budget,
+    spending_by_period,
+)
+from src.budget.assignment import BUDGET_INDEXES, BudgetWindow, current_period
+from src.budget.balances import (
+    MINOR_UNITS,
+    account_balance_as_of,
+    current_account_balance,
+    monthly_balances,
+)
+from src.budget.importer import import_statement, iter_lines
+from src.budget.rules import RULE_MATCHERS, recategorize, validate_rule
+from src.budget.search import search_transactions
+from src.db.database import (
+    ASYNC_POOL_STATS,
+    POOL_STATS,
+    REPLICAS,
+    SQL_TRACER,
+    async_engine,
+    engine,
+    get_async_db,
+    get_async_read_db,
+)
+from src.db.migrate import check_schema_version
+from src.db.pagination import InvalidCursorError, apply_keyset, encode_cursor
+from src.models.data_models import (
+    AccountBalance,
+    BudgetSpending,
+    BudgetStatus,
+    CategoryRuleCreate,
+    CategoryRuleResponse,
+    ImportResult,
+    LoginData,
+    LoyaltyBalance,
+    LoyaltyEntryCreate,
+    LoyaltyEntryPage,
+    LoyaltySummary,
+    MonthlyBalance,
+    RecategorizeResult,
+    SpendingPeriod,
+    Token,
+    TransactionSearchPage,
+    UserCreate,
+    UserPage,
+    UserResponse,
+)
+from src.models.db_models import (
+    Account,
+    Budget,
+    BudgetRollup,
+    CategoryRule,
+    LoyaltyEntry,
+    LoyaltyProgram,
+    Transaction,
+    User,
+)
+from src.points.ledger import (
+    InsufficientPointsError,
+    balance_as_of,
+    points_summary,
+    post_entry,
+)
+from src.utils.jwt_handler import create_access_token
+from src.utils.logger import logging_stats
+from src.utils.shared import CONFIG, LOGGER
 
-app = FastAPI()
+# Endpoints on hot paths build their payload from ORM rows and return an
+# ORJSONResponse themselves: FastAPI then skips the response_model validation
+# and encoding pass, and response_model only documents the schema
+app = FastAPI(default_response_class=ORJSONResponse)
+app.add_middleware(RequestContextMiddleware)
+app.add_middleware(ReadYourWritesMiddleware, window=CONFIG.db_read_your_writes_seconds)
+# outermost, so that its timing covers the other middleware too
+app.add_middleware(MetricsMiddleware)
+
+# the /internal endpoints expose operational state, for operators only
+INTERNAL = [Depends(require_internal_token)]
 
 
 @app.on_event("startup")
 def on_startup():
     """
-    TODO: Initial development only
-    Use Alembic for migrations in production.
-
-    Create the database tables on startup
+    Check that the database schema is at the expected revision.
+    Migrations are run ahead of time with `python -m src.db.migrate upgrade`.
     """
-    SQLModel.metadata.create_all(engine)
+    check_schema_version(engine)
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    """Stop the password hashing pool and close database connections"""
+    PASSWORD_HASHER.shutdown()
+    await async_engine.dispose()
+    await REPLICAS.dispose()
+
+
+@app.exception_handler(HashingSaturatedError)
+def hashing_saturated_handler(request: Request, exc: HashingSaturatedError):
+    """Shed load with a fast 503 when the password hashing pool is full"""
+    LOGGER.warning(f"Rejected {request.url.path}: {exc}")
+    return ORJSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Server is busy, try again later"},
+        headers={"Retry-After": "1"},
+    )
+
+
+@app.exception_handler(LoginRateLimitedError)
+def login_rate_limited_handler(request: Request, exc: LoginRateLimitedError):
+    """Throttle login attempts with a 429 telling when to try again"""
+    LOGGER.warning(f"Rejected {request.url.path}: {exc}")
+    return ORJSONResponse(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        content={"detail": "Too many login attempts, try again later"},
+        headers={"Retry-After": str(math.ceil(exc.retry_after))},
+    )
 
 
 @app.get("/")
-def read_root():
+async def read_root():
     """."""
     LOGGER.info("Mic check")
     return {"Mic check": 12}
 
 
 @app.post("/api/v1/users/register", response_model=UserResponse)
-def register_user(user: UserCreate, db: Session = Depends(get_db)):
-    """Register a new user with a username, email, and password"""
-    # Check if the user already exists
-    existing_user = db.exec(select(User).where(User.username == user.username)).first()
-    if existing_user:
-        raise HTTPException(status_code=400, detail="Username already registered")
-
+async def register_user(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
+    """
+    Register a new user with a username, email, and password.
+    Duplicates are caught by the unique constraints on a single INSERT.
+    """
     new_user = User.model_validate(user)  # validate the user data
-    new_user.hash_password(user.password)  # hash user password
+    new_user.password = await PASSWORD_HASHER.ahash_password(user.password)
 
     # Save the new user to the database
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(
+            status_code=400, detail="Username or email already registered"
+        )
 
     # return the new user
-    return UserResponse(
-        user_id=new_user.user_id, username=new_user.username, email=new_user.email
+    return ORJSONResponse(_user_json(new_user))
+
+
+def _user_json(user: Union[User, CachedUser]) -> dict:
+    """The public fields of a user, in the shape of UserResponse"""
+    return {"user_id": user.user_id, "username": user.username, "email": user.email}
+
+
+# Columns the user list can be sorted by
+USER_SORT_COLUMNS = {
+    "user_id": User.user_id,
+    "username": User.username,
+    "email": User.email,
+}
+
+
+@app.get("/api/v1/users", response_model=UserPage)
+async def get_users(
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    username: Optional[str] = None,
+    email: Optional[str] = None,
+    sort: Literal["user_id", "username", "email"] = "user_id",
+    order: Literal["asc", "desc"] = "asc",
+    stream: bool = False,
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    """
+    Get users from the database. For admin only
+    TODO: Authentication
+
+    Results are keyset paginated: pass the `next_cursor` of a page as `cursor`
+    to get the next one. `username` and `email` filter by prefix.
+    With `stream=true` every matching row from `cursor` on is streamed as
+    NDJSON instead, ignoring `limit`.
+    """
+    statement = select(User.user_id, User.username, User.email)
+    if username:
+        statement = statement.where(User.username.startswith(username, autoescape=True))
+    if email:
+        statement = statement.where(User.email.startswith(email, autoescape=True))
+
+    key_columns = [USER_SORT_COLUMNS[sort]]
+    if sort != "user_id":
+        key_columns.append(User.user_id)  # tie-breaker for a total order
+    try:
+        statement = apply_keyset(statement, key_columns, cursor, order == "desc")
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if stream:
+        return StreamingResponse(
+            _stream_users(db.bind, statement),
+            media_type="application/x-ndjson",
+        )
+
+    rows = (await db.exec(statement.limit(limit + 1))).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor([getattr(last, c.key) for c in key_columns])
+    return ORJSONResponse(
+        {"items": [row._asdict() for row in rows], "next_cursor": next_cursor}
     )
 
 
-@app.get("/api/v1/users", response_model=List[UserResponse])
-def get_users(db: Session = Depends(get_db)):
+async def _stream_users(bind, statement, batch_size: int = 1000):
     """
-    Get all users from the database. For admin only
-    TODO: Authentication, pagination, filtering and sorting
+    Stream users as NDJSON from a server-side cursor, one batch at a time.
+
+    Uses its own session because the request's session is closed before a
+    streaming response body is sent.
     """
-    users = db.exec(select(User)).all()
-    return [
-        UserResponse(user_id=user.user_id, username=user.username, email=user.email)
-        for user in users
-    ]
+    async with AsyncSession(bind) as session:
+        result = await session.stream(statement.execution_options(yield_per=batch_size))
+        async for batch in result.partitions():
+            yield b"".join(orjson.dumps(row._asdict()) + b"\n" for row in batch)
 
 
-@app.get("/api/v1/user/login")
-def login_user(login_data: LoginData, db: Session = Depends(get_db)):
-    user = db.exec(select(User).where(User.username == login_data.username)).first()
-    if not user or not user.verify_password(login_data.password, user.password):
+@app.get("/api/v1/user/login", response_model=Token)
+async def login_user(
+    login_data: LoginData, request: Request, db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Verify the user's password and issue an access token.
+    Only this request pays for bcrypt; later requests present the token.
+    Attempts are rate limited per client IP and username before any of it.
+    """
+    # the client behind a trusted proxy, see SERVER_FORWARDED_ALLOW_IPS
+    client_ip = request.client.host if request.client else "unknown"
+    LOGIN_LIMITER.check(client_ip, login_data.username)
+    user = await get_user_by_username(db, login_data.username)
+    with LOGIN_LIMITER.verifying():
+        if user:
+            valid = await PASSWORD_HASHER.averify_password(
+                login_data.password, user.password
+            )
+        else:
+            # as slow as a wrong password, so timing does not reveal usernames
+            valid = await PASSWORD_HASHER.averify_dummy(login_data.password)
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Incorrect username or password",
         )
-    return {"message": "Login successful"}
+    access_token = create_access_token(
+        data={"sub": str(user.user_id), "username": user.username}
+    )
+    return Token(access_token=access_token)
+
+
+@app.get("/api/v1/users/me", response_model=UserResponse)
+async def get_current_user(user: CachedUser = Depends(get_authenticated_user)):
+    """Get the user the access token was issued to"""
+    return ORJSONResponse(_user_json(user))
+
+
+@app.post(
+    "/api/v1/accounts/{account_id}/transactions/import", response_model=ImportResult
+)
+async def import_transactions(
+    account_id: int,
+    request: Request,
+    format: Literal["csv", "ofx"] = "csv",
+    claims: dict = Depends(get_current_claims),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Import a bank statement into one of the user's accounts.
+
+    The request body is the raw CSV or OFX file. It is parsed as it streams in
+    and loaded in batches; rejected rows are reported without aborting the
+    import.
+    """
+    await _get_account(db, account_id, claims)
+    return await import_statement(
+        db, iter_lines(request.stream()), format, int(claims["sub"]), account_id
+    )
+
+
+async def _get_account(db: AsyncSession, account_id: int, claims: dict):
+    """The user's account, or a 404"""
+    account = await db.get(Account, account_id)
+    if not account or account.user_id != int(claims["sub"]):
+        raise HTTPException(status_code=404, detail="Account not found")
+    return account
+
+
+@app.get("/api/v1/accounts/{account_id}/balance", response_model=AccountBalance)
+async def get_account_balance(
+    account_id: int,
+    as_of: Optional[datetime] = None,
+    claims: dict = Depends(get_current_claims),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    """
+    Get the balance of an account from its transactions, now or as of a date.
+    Reads the monthly checkpoints and only the transactions of the last month.
+    """
+    await _get_account(db, account_id, claims)
+    if as_of is None:
+        balance = await db.run_sync(
+            lambda session: current_account_balance(session.connection(), account_id)
+        )
+    else:
+        balance = await db.run_sync(
+            lambda session: account_balance_as_of(
+                session.connection(), account_id, as_of
+            )
+        )
+    return AccountBalance(
+        account_id=account_id,
+        balance=balance / MINOR_UNITS,
+        balance_minor=balance,
+        as_of=as_of,
+    )
+
+
+@app.get(
+    "/api/v1/accounts/{account_id}/balance/history",
+    response_model=List[MonthlyBalance],
+)
+async def get_account_balance_history(
+    account_id: int,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    claims: dict = Depends(get_current_claims),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    """Get the closing balance of every month with transactions, for charts"""
+    await _get_account(db, account_id, claims)
+    history = await db.run_sync(
+        lambda session: monthly_balances(session.connection(), account_id, start, end)
+    )
+    return ORJSONResponse(history)
+
+
+@app.get("/api/v1/budgets/{budget_id}/status", response_model=BudgetStatus)
+async def get_budget_status(
+    budget_id: int,
+    as_of: Optional[datetime] = None,
+    claims: dict = Depends(get_current_claims),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    """
+    Get how much of a budget has been spent.
+    Reads the budget's rollup row; the transaction history is never scanned.
+    The rollup covers every period of a recurring budget, so the spending of
+    its period in effect at `as_of` (default now) is summed from that
+    period's transactions instead, a range of the (budget_id, date) index.
+    """
+    result = await db.exec(
+        select(Budget, BudgetRollup)
+        .outerjoin(BudgetRollup, BudgetRollup.budget_id == Budget.budget_id)
+        .where(Budget.budget_id == budget_id)
+    )
+    row = result.first()
+    if not row or row[0].user_id != int(claims["sub"]):
+        raise HTTPException(status_code=404, detail="Budget not found")
+
+    budget, rollup = row
+    period_start = period_end = None
+    if budget.recurrence:
+        period_start, period_end = current_period(
+            BudgetWindow(
+                budget.budget_id, budget.start_date, budget.end_date, budget.recurrence
+            ),
+            as_of or datetime.now(timezone.utc).replace(tzinfo=None),
+        )
+        result = await db.exec(
+            select(func.sum(Transaction.amount), func.count()).where(
+                Transaction.budget_id == budget_id,
+                Transaction.date >= period_start,
+                Transaction.date < period_end,
+            )
+        )
+        spent, transaction_count = result.one()
+        spent = spent or 0.0
+    else:
+        spent = rollup.spent if rollup else 0.0
+        transaction_count = rollup.transaction_count if rollup else 0
+    return BudgetStatus(
+        budget_id=budget.budget_id,
+        name=budget.name,
+        amount=budget.amount,
+        start_date=budget.start_date,
+        end_date=budget.end_date,
+        recurrence=budget.recurrence,
+        period_start=period_start,
+        period_end=period_end,
+        spent=spent,
+        remaining=budget.amount - spent,
+        transaction_count=transaction_count,
+    )
+
+
+async def _spending_report(db, claims, period, start, end, account_id, window):
+    """Load the user's transactions once and aggregate them off the event loop"""
+    columns = await load_transactions(db, int(claims["sub"]), start, end, account_id)
+    if period == "budget":
+        report = await run_in_threadpool(spending_by_budget, columns)
+    else:
+        report = await run_in_threadpool(spending_by_period, columns, period, window)
+    return ORJSONResponse(report)
+
+
+@app.get("/api/v1/reports/spending/monthly", response_model=List[SpendingPeriod])
+async def get_monthly_spending(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    account_id: Optional[int] = None,
+    window: int = Query(3, ge=1, le=36),
+    claims: dict = Depends(get_current_claims),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    """
+    Spending per month with a running average over `window` months and the
+    change from the previous month.
+    """
+    return await _spending_report(db, claims, "month", start, end, account_id, window)
+
+
+@app.get("/api/v1/reports/spending/weekly", response_model=List[SpendingPeriod])
+async def get_weekly_spending(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    account_id: Optional[int] = None,
+    window: int = Query(4, ge=1, le=52),
+    claims: dict = Depends(get_current_claims),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    """
+    Spending per week, starting on Mondays, with a running average over
+    `window` weeks and the change from the previous week.
+    """
+    return await _spending_report(db, claims, "week", start, end, account_id, window)
+
+
+@app.get("/api/v1/reports/spending/budgets", response_model=List[BudgetSpending])
+async def get_budget_spending(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    account_id: Optional[int] = None,
+    claims: dict = Depends(get_current_claims),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    """Spending per budget; transactions without a budget have budget_id null"""
+    return await _spending_report(db, claims, "budget", start, end, account_id, None)
+
+
+async def _get_loyalty_program(db: AsyncSession, loyalty_id: int, claims: dict):
+    """The user's loyalty program, or a 404"""
+    program = await db.get(LoyaltyProgram, loyalty_id)
+    if not program or program.user_id != int(claims["sub"]):
+        raise HTTPException(status_code=404, detail="Loyalty program not found")
+    return program
+
+
+@app.post("/api/v1/loyalty/{loyalty_id}/entries", response_model=LoyaltyBalance)
+async def post_loyalty_entry(
+    loyalty_id: int,
+    entry: LoyaltyEntryCreate,
+    claims: dict = Depends(get_current_claims),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Earn, redeem, adjust or expire points.
+    The ledger entry and the cached balance are written in one transaction.
+    """
+    await _get_loyalty_program(db, loyalty_id, claims)
+    try:
+        posted = await db.run_sync(
+            lambda session: post_entry(
+                session.connection(),
+                loyalty_id,
+                entry.entry_type,
+                entry.points,
+                entry.description,
+            )
+        )
+    except InsufficientPointsError as e:
+        await db.rollback()
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+    await db.commit()
+    return LoyaltyBalance(loyalty_id=loyalty_id, points=posted["balance"])
+
+
+@app.get("/api/v1/loyalty/{loyalty_id}/balance", response_model=LoyaltyBalance)
+async def get_loyalty_balance(
+    loyalty_id: int,
+    as_of: Optional[datetime] = None,
+    claims: dict = Depends(get_current_claims),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    """
+    Get the points balance. The current balance is read from the program row;
+    a past balance replays the ledger from the nearest checkpoint.
+    """
+    program = await _get_loyalty_program(db, loyalty_id, claims)
+    if as_of is None:
+        return LoyaltyBalance(loyalty_id=loyalty_id, points=program.points)
+    points = await db.run_sync(
+        lambda session: balance_as_of(session.connection(), loyalty_id, as_of)
+    )
+    return LoyaltyBalance(loyalty_id=loyalty_id, points=points, as_of=as_of)
+
+
+@app.get("/api/v1/loyalty/{loyalty_id}/entries", response_model=LoyaltyEntryPage)
+async def get_loyalty_entries(
+    loyalty_id: int,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    claims: dict = Depends(get_current_claims),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    """
+    Get the ledger entries posted in [start, end), newest first.
+    Entries are numbered in posting order, so the entry id is the page key.
+    """
+    await _get_loyalty_program(db, loyalty_id, claims)
+    statement = select(
+        LoyaltyEntry.entry_id,
+        LoyaltyEntry.entry_type,
+        LoyaltyEntry.points,
+        LoyaltyEntry.date,
+        LoyaltyEntry.description,
+    ).where(LoyaltyEntry.loyalty_id == loyalty_id)
+    if start is not None:
+        statement = statement.where(LoyaltyEntry.date >= start)
+    if end is not None:
+        statement = statement.where(LoyaltyEntry.date < end)
+    try:
+        statement = apply_keyset(
+            statement, [LoyaltyEntry.entry_id], cursor, descending=True
+        )
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    entries = (await db.exec(statement.limit(limit + 1))).all()
+    next_cursor = None
+    if len(entries) > limit:
+        entries = entries[:limit]
+        next_cursor = encode_cursor([entries[-1].entry_id])
+    return ORJSONResponse(
+        {"items": [entry._asdict() for entry in entries], "next_cursor": next_cursor}
+    )
+
+
+@app.get("/api/v1/loyalty/{loyalty_id}/summary", response_model=LoyaltySummary)
+async def get_loyalty_summary(
+    loyalty_id: int,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    claims: dict = Depends(get_current_claims),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    """Get the net points earned, redeemed, adjusted and expired in [start, end)"""
+    await _get_loyalty_program(db, loyalty_id, claims)
+    totals = await db.run_sync(
+        lambda session: points_summary(session.connection(), loyalty_id, start, end)
+    )
+    return LoyaltySummary(loyalty_id=loyalty_id, start=start, end=end, totals=totals)
+
+
+@app.post("/api/v1/rules", response_model=CategoryRuleResponse)
+async def create_category_rule(
+    rule: CategoryRuleCreate,
+    claims: dict = Depends(get_current_claims),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Add a rule mapping transaction descriptions to a category and budget.
+    Applies to imports from now on; see /api/v1/rules/recategorize.
+    """
+    user_id = int(claims["sub"])
+    try:
+        validate_rule(rule.pattern, rule.match_type)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if rule.category is None and rule.budget_id is None:
+        raise HTTPException(
+            status_code=400, detail="A rule needs a category or a budget"
+        )
+    if rule.budget_id is not None:
+        budget = await db.get(Budget, rule.budget_id)
+        if not budget or budget.user_id != user_id:
+            raise HTTPException(status_code=404, detail="Budget not found")
+
+    category_rule = CategoryRule(user_id=user_id, **rule.model_dump())
+    db.add(category_rule)
+    await db.commit()
+    return CategoryRuleResponse.model_validate(category_rule, from_attributes=True)
+
+
+@app.get("/api/v1/rules", response_model=List[CategoryRuleResponse])
+async def get_category_rules(
+    claims: dict = Depends(get_current_claims),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    """Get the user's categorization rules, in the order they are tried"""
+    result = await db.exec(
+        select(CategoryRule)
+        .where(CategoryRule.user_id == int(claims["sub"]))
+        .order_by(CategoryRule.priority, CategoryRule.rule_id)
+    )
+    return [
+        CategoryRuleResponse.model_validate(rule, from_attributes=True)
+        for rule in result.all()
+    ]
+
+
+@app.delete("/api/v1/rules/{rule_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_category_rule(
+    rule_id: int,
+    claims: dict = Depends(get_current_claims),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Delete a categorization rule"""
+    rule = await db.get(CategoryRule, rule_id)
+    if not rule or rule.user_id != int(claims["sub"]):
+        raise HTTPException(status_code=404, detail="Rule not found")
+    await db.delete(rule)
+    await db.commit()
+
+
+@app.post("/api/v1/rules/recategorize", response_model=RecategorizeResult)
+async def recategorize_transactions(
+    reassign_budgets: bool = False,
+    claims: dict = Depends(get_current_claims),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Re-apply the user's rules to all their transactions, committing after
+    every batch. Transactions keep the budget they have unless
+    `reassign_budgets=true`.
+    """
+    user_id = int(claims["sub"])
+    after_id, updated = 0, 0
+    while after_id is not None:
+        after_id, changed = await db.run_sync(
+            lambda session: recategorize(
+                session.connection(),
+                user_id,
+                after_id,
+                reassign_budgets=reassign_budgets,
+            )
+        )
+        await db.commit()
+        updated += changed
+    return RecategorizeResult(updated=updated)
+
+
+@app.get("/api/v1/transactions/search", response_model=TransactionSearchPage)
+async def search_user_transactions(
+    q: str = Query(..., min_length=1, max_length=200),
+    fuzzy: bool = False,
+    account_id: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    claims: dict = Depends(get_current_claims),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    """
+    Search the user's transactions in [start, end) by description, newest
+    first. Every word of `q` must start a word of the description; with
+    `fuzzy=true` words may also be misspelt.
+    """
+    user_id = int(claims["sub"])
+    try:
+        page = await db.run_sync(
+            lambda session: search_transactions(
+                session.connection(),
+                user_id,
+                q,
+                limit,
+                cursor,
+                fuzzy,
+                account_id,
+                start,
+                end,
+            )
+        )
+    except (ValueError, InvalidCursorError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return ORJSONResponse(page)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Request, latency and database usage metrics in the Prometheus text format"""
+    return PlainTextResponse(REQUEST_METRICS.render(), media_type=CONTENT_TYPE)
+
+
+@app.get("/internal/hashing", dependencies=INTERNAL)
+async def get_hashing_stats():
+    """Queue depth and latency counters of the password hashing pool"""
+    return PASSWORD_HASHER.stats()
+
+
+@app.get("/internal/user-cache", dependencies=INTERNAL)
+async def get_user_cache_stats():
+    """Size and hit/miss counters of the user lookup cache"""
+    return USER_CACHE.stats()
+
+
+@app.get("/internal/budget-indexes", dependencies=INTERNAL)
+async def get_budget_index_stats():
+    """Size and hit/miss counters of the budget assignment index cache"""
+    return BUDGET_INDEXES.stats()
+
+
+@app.get("/internal/rule-matchers", dependencies=INTERNAL)
+async def get_rule_matcher_stats():
+    """Size and hit/miss counters of the compiled categorization rule cache"""
+    return RULE_MATCHERS.stats()
+
+
+@app.get("/internal/login-limiter", dependencies=INTERNAL)
+async def get_login_limiter_stats():
+    """Tracked keys and rejection counters of the login rate limiter"""
+    return LOGIN_LIMITER.stats()
+
+
+@app.get("/internal/db-pool", dependencies=INTERNAL)
+async def get_db_pool_stats():
+    """Occupancy, wait time and timeout counters of the database pools"""
+    return {
+        "sync": POOL_STATS.snapshot(),
+        "async": ASYNC_POOL_STATS.snapshot(),
+        "replicas": REPLICAS.stats(),
+    }
+
+
+@app.get("/internal/logging", dependencies=INTERNAL)
+async def get_logging_stats():
+    """Depth of the logging queue and records dropped because it was full"""
+    return logging_stats()
+
+
+@app.get("/internal/sql-stats", dependencies=INTERNAL)
+async def get_sql_stats():
+    """Per-statement aggregates and recent slow queries, when SQL tracing is on"""
+    return SQL_TRACER.dump()
+
+
+@app.post("/internal/sql-stats/reset", dependencies=INTERNAL)
+async def reset_sql_stats():
+    """Clear the SQL aggregates, returning them as they were"""
+    stats = SQL_TRACER.dump()
+    SQL_TRACER.reset()
+    return stats
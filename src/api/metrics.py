@@ -0,0 +1,173 @@
+"""
+Request metrics in the Prometheus text format
+
+MetricsMiddleware records, per route template and method, request counts by
+status, a latency histogram and histograms of the SQL statements and
+database time of each request, plus the number of requests in flight.
+Database usage is collected by the engine event hooks installed by
+src.db.tracing.install_db_usage. Everything is kept in plain counters and
+rendered on demand by the /metrics endpoint.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, List, Sequence, Tuple
+
+from src.utils.request_context import REQUEST_DB_USAGE, DBUsage
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_STATEMENT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+DB_TIME_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+# label of requests that matched no route, to bound the number of series
+UNMATCHED_ROUTE = "<unmatched>"
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class Histogram:
+    """Cumulative histogram with fixed bucket bounds"""
+
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # the last bucket is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name: str, labels: str) -> List[str]:
+        lines, cumulative = [], 0
+        for bound, count in zip((*self.bounds, "+Inf"), self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f"{name}_sum{{{labels}}} {self.sum}")
+        lines.append(f"{name}_count{{{labels}}} {self.count}")
+        return lines
+
+
+def _labels(**labels: str) -> str:
+    escaped = (
+        (key, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+        for key, value in labels.items()
+    )
+    return ",".join(f'{key}="{value}"' for key, value in escaped)
+
+
+class RequestMetrics:
+    """Per-route request, latency and database usage aggregates"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.requests: Dict[Tuple[str, str, int], int] = {}
+        self.latency: Dict[Tuple[str, str], Histogram] = {}
+        self.db_statements: Dict[Tuple[str, str], Histogram] = {}
+        self.db_seconds: Dict[Tuple[str, str], Histogram] = {}
+
+    def observe(
+        self, method: str, route: str, status: int, elapsed: float, usage: DBUsage
+    ):
+        """Record one finished request."""
+        key = (method, route)
+        with self._lock:
+            self.requests[(method, route, status)] = (
+                self.requests.get((method, route, status), 0) + 1
+            )
+            if key not in self.latency:
+                self.latency[key] = Histogram(LATENCY_BUCKETS)
+                self.db_statements[key] = Histogram(DB_STATEMENT_BUCKETS)
+                self.db_seconds[key] = Histogram(DB_TIME_BUCKETS)
+            self.latency[key].observe(elapsed)
+            self.db_statements[key].observe(usage.statements)
+            self.db_seconds[key].observe(usage.seconds)
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        lines = [
+            "# HELP http_requests_in_flight Requests being served",
+            "# TYPE http_requests_in_flight gauge",
+            f"http_requests_in_flight {self.in_flight}",
+            "# HELP http_requests_total Requests served by route, method and status",
+            "# TYPE http_requests_total counter",
+        ]
+        with self._lock:
+            for (method, route, status), count in sorted(self.requests.items()):
+                labels = _labels(method=method, route=route, status=status)
+                lines.append(f"http_requests_total{{{labels}}} {count}")
+
+            for name, help_text, histograms in (
+                (
+                    "http_request_duration_seconds",
+                    "Request latency by route and method",
+                    self.latency,
+                ),
+                (
+                    "http_request_db_statements",
+                    "SQL statements executed per request",
+                    self.db_statements,
+                ),
+                (
+                    "http_request_db_seconds",
+                    "Time spent executing SQL per request",
+                    self.db_seconds,
+                ),
+            ):
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} histogram")
+                for (method, route), histogram in sorted(histograms.items()):
+                    lines.extend(
+                        histogram.render(name, _labels(method=method, route=route))
+                    )
+        return "\n".join(lines) + "\n"
+
+
+REQUEST_METRICS = RequestMetrics()
+
+
+class MetricsMiddleware:
+    """Time requests and collect their database usage into RequestMetrics"""
+
+    def __init__(self, app, metrics: RequestMetrics = REQUEST_METRICS):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500  # if the app fails before starting a response
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        usage = DBUsage()
+        token = REQUEST_DB_USAGE.set(usage)
+        self.metrics.in_flight += 1
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.metrics.in_flight -= 1
+            REQUEST_DB_USAGE.reset(token)
+            # the router stores the matched route in the scope; label by its
+            # template so that path parameters do not create new series
+            route = scope.get("route")
+            self.metrics.observe(
+                scope["method"],
+                getattr(route, "path", UNMATCHED_ROUTE),
+                status,
+                elapsed,
+                usage,
+            )
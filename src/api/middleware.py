@@ -0,0 +1,60 @@
+"""
+ASGI middleware for the API
+
+Written as plain ASGI callables rather than BaseHTTPMiddleware so they add no
+extra task or response wrapping to every request.
+"""
+
+from src.db.replicas import primary_cookie
+from src.utils.request_context import CURRENT_ROUTE
+
+# methods that do not write, see ReadYourWritesMiddleware
+SAFE_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+
+class RequestContextMiddleware:
+    """Expose the route being served to lower layers, e.g. SQL tracing"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        token = CURRENT_ROUTE.set(f"{scope['method']} {scope['path']}")
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            CURRENT_ROUTE.reset(token)
+
+
+class ReadYourWritesMiddleware:
+    """
+    Pin a client's reads to the primary database for `window` seconds after
+    each successful write request, so that replica lag does not hide its
+    own writes from it. See src.db.replicas.
+    """
+
+    def __init__(self, app, window: float):
+        self.app = app
+        self.window = window
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or scope["method"] in SAFE_METHODS
+            or self.window <= 0
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_cookie(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                headers = list(message.get("headers", []))
+                headers.append((b"set-cookie", primary_cookie(self.window)))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
@@ -0,0 +1,230 @@
+"""
+Production server
+
+Runs the API under uvicorn with uvloop and httptools in a pre-fork model:
+this process binds the listening socket once, with the configured backlog,
+and supervises SERVER_WORKERS worker processes accepting on it.
+
+- A worker that has served SERVER_MAX_REQUESTS requests, plus a random
+  jitter so that workers do not all restart at once, finishes its in-flight
+  requests, exits and is replaced. This bounds memory growth.
+- A worker that crashes is restarted, unless workers failed on startup
+  CRASH_LOOP_FAILURES times within CRASH_LOOP_WINDOW seconds: the server then
+  exits instead of restarting them in a loop.
+- On SIGTERM or SIGINT the listening socket is closed and every worker
+  drains: it stops accepting, finishes its in-flight requests within
+  SERVER_GRACEFUL_TIMEOUT_SECONDS and runs the app's shutdown handlers.
+- Rotating log files must have a single writer, so the supervisor alone
+  writes {LOG_DIR}/app.log and every worker writes its own
+  {LOG_DIR}/app-<pid>.log (LOG_FILE_PER_PROCESS is set for them).
+
+    python -m src.api.serve
+    python -m src.api.serve --workers 8 --port 8080
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import signal
+import socket
+import sys
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, Tuple
+
+import uvicorn
+
+from src.utils.shared import CONFIG, LOGGER
+
+APP = "src.api.api:app"
+
+# uvicorn's exit code when the app fails to start
+STARTUP_FAILURE = 3
+
+# a worker failing sooner than this after it started failed on startup
+MIN_WORKER_UPTIME = 5.0
+
+# this many startup failures within the window point at a broken deploy, e.g.
+# a schema version mismatch, rather than a transient error such as a database
+# blip, so the server stops instead of restarting workers in a loop
+CRASH_LOOP_FAILURES = 5
+CRASH_LOOP_WINDOW = 60.0
+
+
+def server_options(args) -> dict:
+    """uvicorn.Config keyword arguments shared by the workers."""
+    return {
+        "host": args.host,
+        "port": args.port,
+        "loop": "uvloop",
+        "http": "httptools",
+        "lifespan": "on",
+        "backlog": args.backlog,
+        "timeout_keep_alive": args.keep_alive,
+        "timeout_graceful_shutdown": args.graceful_timeout,
+        "proxy_headers": bool(CONFIG.server_forwarded_allow_ips),
+        "forwarded_allow_ips": CONFIG.server_forwarded_allow_ips or None,
+        "access_log": CONFIG.server_access_log,
+        # the app sends every logger through its own queue handler
+        "log_config": None,
+    }
+
+
+def run_worker(app: str, options: dict, sock: socket.socket):
+    """Serve the app on the inherited socket until told to stop."""
+    server = uvicorn.Server(uvicorn.Config(app, **options))
+    server.run(sockets=[sock])
+    if not server.started:
+        sys.exit(STARTUP_FAILURE)
+
+
+class Supervisor:
+    """Keeps a number of worker processes serving on one shared socket"""
+
+    def __init__(
+        self,
+        options: dict,
+        workers: int,
+        max_requests: int = 0,
+        max_requests_jitter: int = 0,
+        app: str = APP,
+    ):
+        self.options = options
+        self.workers = workers
+        self.max_requests = max_requests
+        self.max_requests_jitter = max_requests_jitter
+        self.app = app
+        self.should_exit = threading.Event()
+        # slot -> (process, monotonic start time)
+        self.processes: Dict[int, Tuple[multiprocessing.Process, float]] = {}
+        # monotonic times of the recent startup failures
+        self.startup_failures: Deque[float] = deque()
+        # workers start from a fresh interpreter rather than a fork of this one
+        self._context = multiprocessing.get_context("spawn")
+        self._socket = None
+
+    def spawn(self, slot: int):
+        """Start the worker of a slot."""
+        options = dict(self.options)
+        if self.max_requests:
+            options["limit_max_requests"] = self.max_requests + random.randint(
+                0, self.max_requests_jitter
+            )
+        process = self._context.Process(
+            target=run_worker,
+            args=(self.app, options, self._socket),
+            name=f"worker-{slot}",
+        )
+        process.start()
+        self.processes[slot] = (process, time.monotonic())
+        LOGGER.info(f"Started worker {process.pid}")
+
+    def handle_exit(self, sig, frame):
+        self.should_exit.set()
+
+    def run(self) -> int:
+        """Serve until SIGTERM or SIGINT. Returns the exit code."""
+        self._socket = uvicorn.Config(self.app, **self.options).bind_socket()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(sig, self.handle_exit)
+        for slot in range(self.workers):
+            self.spawn(slot)
+
+        exit_code = 0
+        while not self.should_exit.wait(0.5):
+            exit_code = self.replace_exited()
+            if exit_code:
+                break
+        self.shutdown()
+        return exit_code
+
+    def replace_exited(self) -> int:
+        """
+        Replace workers that exited; non-zero once workers keep failing on
+        startup.
+        """
+        for slot, (process, started) in list(self.processes.items()):
+            if process.is_alive():
+                continue
+            process.join()
+            now = time.monotonic()
+            uptime = now - started
+            if process.exitcode == 0:
+                LOGGER.info(f"Recycling worker {process.pid} after {uptime:.0f}s")
+            elif uptime < MIN_WORKER_UPTIME:
+                self.startup_failures.append(now)
+                while self.startup_failures[0] < now - CRASH_LOOP_WINDOW:
+                    self.startup_failures.popleft()
+                if len(self.startup_failures) >= CRASH_LOOP_FAILURES:
+                    LOGGER.error(
+                        f"Worker {process.pid} failed on startup with exit code "
+                        f"{process.exitcode}, {len(self.startup_failures)} "
+                        f"failures in {CRASH_LOOP_WINDOW:.0f}s, stopping"
+                    )
+                    return process.exitcode if process.exitcode > 0 else 1
+                LOGGER.warning(
+                    f"Worker {process.pid} failed on startup with exit code "
+                    f"{process.exitcode}, restarting"
+                )
+            else:
+                LOGGER.warning(
+                    f"Worker {process.pid} exited with code {process.exitcode}, "
+                    "restarting"
+                )
+            self.spawn(slot)
+        return 0
+
+    def shutdown(self):
+        """Stop accepting, let the workers drain, then stop stragglers."""
+        LOGGER.info("Shutting down, draining workers")
+        # connections are refused once the workers close their copies too
+        self._socket.close()
+        for process, _ in self.processes.values():
+            if process.is_alive():
+                process.terminate()  # SIGTERM, uvicorn's graceful shutdown
+        deadline = time.monotonic() + self.options["timeout_graceful_shutdown"] + 5
+        for process, _ in self.processes.values():
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                LOGGER.warning(f"Killing worker {process.pid}, still draining")
+                process.kill()
+                process.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the API server")
+    parser.add_argument("--host", default=CONFIG.fastapi_host)
+    parser.add_argument("--port", type=int, default=CONFIG.fastapi_port)
+    parser.add_argument("--workers", type=int, default=CONFIG.server_workers)
+    parser.add_argument("--backlog", type=int, default=CONFIG.server_backlog)
+    parser.add_argument(
+        "--keep-alive", type=int, default=CONFIG.server_keep_alive_seconds
+    )
+    parser.add_argument(
+        "--graceful-timeout",
+        type=int,
+        default=CONFIG.server_graceful_timeout_seconds,
+    )
+    parser.add_argument("--max-requests", type=int, default=CONFIG.server_max_requests)
+    parser.add_argument(
+        "--max-requests-jitter", type=int, default=CONFIG.server_max_requests_jitter
+    )
+    args = parser.parse_args()
+
+    # inherited by the workers, which configure logging when they import the
+    # app; this process configured its own app.log already
+    os.environ["LOG_FILE_PER_PROCESS"] = "true"
+    supervisor = Supervisor(
+        server_options(args),
+        workers=args.workers,
+        max_requests=args.max_requests,
+        max_requests_jitter=args.max_requests_jitter,
+    )
+    LOGGER.info(f"Serving on {args.host}:{args.port} with {args.workers} workers")
+    sys.exit(supervisor.run())
+
+
+if __name__ == "__main__":
+    main()
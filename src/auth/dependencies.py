@@ -0,0 +1,84 @@
+"""
+FastAPI dependencies for authenticated routes
+"""
+
+import hmac
+from typing import Optional
+
+from fastapi import Depends, HTTPException, status
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.auth.token_cache import TOKEN_CACHE
+from src.auth.user_cache import CachedUser, get_user
+from src.db.database import get_async_db
+from src.utils.jwt_handler import decode_access_token
+from src.utils.shared import CONFIG
+
+bearer_scheme = HTTPBearer(auto_error=False)
+
+
+async def get_current_claims(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme),
+) -> dict:
+    """
+    Return the claims of the bearer token on the request.
+
+    Only the first request with a given token pays for signature verification;
+    after that the claims come from the token cache.
+    """
+    unauthorized = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    if credentials is None:
+        raise unauthorized
+
+    token = credentials.credentials
+    claims = TOKEN_CACHE.get(token)
+    if claims is None:
+        claims = decode_access_token(token)
+        if claims is None or "sub" not in claims:
+            raise unauthorized
+        TOKEN_CACHE.put(token, claims)
+    return claims
+
+
+async def get_authenticated_user(
+    claims: dict = Depends(get_current_claims),
+    db: AsyncSession = Depends(get_async_db),
+) -> CachedUser:
+    """
+    Return the user the bearer token was issued to, from the user cache
+    when possible.
+    """
+    user = await get_user(db, int(claims["sub"]))
+    if user is None:
+        # the token outlived its user: make the client authenticate again
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return user
+
+
+async def require_internal_token(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme),
+):
+    """
+    Let a request through only with INTERNAL_API_TOKEN as its bearer token,
+    for the operational endpoints. Every request is refused while it is unset.
+    """
+    expected = CONFIG.internal_api_token
+    if (
+        not expected
+        or credentials is None
+        or not hmac.compare_digest(credentials.credentials, expected)
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
@@ -0,0 +1,187 @@
+"""
+Password hashing service
+
+bcrypt hashing and verification cost ~250 ms of CPU per call. Running them
+inline ties up the request worker, so they are dispatched to a bounded worker
+pool instead. When every worker is busy and the queue is full, callers get a
+HashingSaturatedError straight away so the API can shed load with a fast 503.
+"""
+
+import asyncio
+import secrets
+import threading
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
+
+from src.models.db_models import pwd_context
+from src.utils.shared import CONFIG, LOGGER
+
+
+class HashingSaturatedError(Exception):
+    """Raised when the hashing pool and its queue are full"""
+
+
+def _hash(password: str) -> str:
+    """Hash a password. Module level so it can be pickled for a process pool."""
+    return pwd_context.hash(password)
+
+
+def _verify(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password. Module level so it can be pickled for a process pool."""
+    return pwd_context.verify(plain_password, hashed_password)
+
+
+class PasswordHasher:
+    """
+    Run password hashing and verification on a bounded thread or process pool.
+
+    At most `workers + max_queue` jobs are admitted at once; anything beyond
+    that is rejected with HashingSaturatedError instead of queueing unbounded.
+    """
+
+    def __init__(self, workers: int = 4, max_queue: int = 32, executor: str = "thread"):
+        if executor not in ("thread", "process"):
+            raise ValueError(f"Unknown executor type: {executor}")
+        self.workers = workers
+        self.max_queue = max_queue
+        self.executor_type = executor
+
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+        self._dummy_hash: Optional[str] = None
+
+        # counters
+        self._in_flight = 0
+        self._submitted = 0
+        self._rejected = 0
+        self._completed = 0
+        self._failed = 0
+        self._total_latency = 0.0
+        self._max_latency = 0.0
+
+    def _get_executor(self) -> Executor:
+        """Create the pool on first use so importing this module stays cheap."""
+        with self._lock:
+            if self._executor is None:
+                if self.executor_type == "process":
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                else:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.workers, thread_name_prefix="hasher"
+                    )
+            return self._executor
+
+    def _submit(self, fn, *args) -> Future:
+        """Admit a job to the pool or reject it if the pool is saturated."""
+        with self._lock:
+            if self._in_flight >= self.workers + self.max_queue:
+                self._rejected += 1
+                raise HashingSaturatedError(
+                    f"Password hashing queue is full ({self._in_flight} in flight)"
+                )
+            self._in_flight += 1
+            self._submitted += 1
+
+        try:
+            return self._get_executor().submit(fn, *args)
+        except Exception:
+            self._record(time.perf_counter(), failed=True)
+            raise
+
+    def _record(self, started: float, failed: bool):
+        """Update the counters once an admitted job finishes."""
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self._in_flight -= 1
+            if failed:
+                self._failed += 1
+            else:
+                self._completed += 1
+            self._total_latency += elapsed
+            self._max_latency = max(self._max_latency, elapsed)
+
+    def _run(self, fn, *args):
+        """Run a job on the pool and wait for its result."""
+        started = time.perf_counter()
+        future = self._submit(fn, *args)
+        failed = True
+        try:
+            result = future.result()
+            failed = False
+            return result
+        finally:
+            self._record(started, failed)
+
+    async def _arun(self, fn, *args):
+        """Run a job on the pool and await its result without blocking the loop."""
+        started = time.perf_counter()
+        future = self._submit(fn, *args)
+        failed = True
+        try:
+            result = await asyncio.wrap_future(future)
+            failed = False
+            return result
+        finally:
+            self._record(started, failed)
+
+    def hash_password(self, password: str) -> str:
+        """Hash and salt a password on the worker pool."""
+        return self._run(_hash, password)
+
+    def verify_password(self, plain_password: str, hashed_password: str) -> bool:
+        """Verify a password against its hash on the worker pool."""
+        return self._run(_verify, plain_password, hashed_password)
+
+    async def ahash_password(self, password: str) -> str:
+        """Hash and salt a password on the worker pool from async code."""
+        return await self._arun(_hash, password)
+
+    async def averify_password(self, plain_password: str, hashed_password: str) -> bool:
+        """Verify a password against its hash on the worker pool from async code."""
+        return await self._arun(_verify, plain_password, hashed_password)
+
+    async def averify_dummy(self, plain_password: str) -> bool:
+        """
+        Verify a password against a throwaway hash, so that a login for an
+        unknown user costs as much as one with a wrong password. Always False.
+        """
+        if self._dummy_hash is None:
+            self._dummy_hash = await self.ahash_password(secrets.token_urlsafe(16))
+        await self._arun(_verify, plain_password, self._dummy_hash)
+        return False
+
+    def stats(self) -> dict:
+        """Return a snapshot of the pool counters."""
+        with self._lock:
+            finished = self._completed + self._failed
+            return {
+                "executor": self.executor_type,
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "in_flight": self._in_flight,
+                "queue_depth": max(0, self._in_flight - self.workers),
+                "submitted": self._submitted,
+                "rejected": self._rejected,
+                "completed": self._completed,
+                "failed": self._failed,
+                "avg_latency_ms": (
+                    self._total_latency / finished * 1000 if finished else 0.0
+                ),
+                "max_latency_ms": self._max_latency * 1000,
+            }
+
+    def shutdown(self):
+        """Stop the worker pool."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            LOGGER.info("Shutting down password hashing pool")
+            executor.shutdown(wait=True)
+
+
+PASSWORD_HASHER = PasswordHasher(
+    workers=CONFIG.password_hash_workers,
+    max_queue=CONFIG.password_hash_max_queue,
+    executor=CONFIG.password_hash_executor,
+)
@@ -0,0 +1,172 @@
+"""
+Login rate limiting
+
+Every login attempt costs a bcrypt verification, so a credential-stuffing
+burst can pin the CPU of every worker. Attempts are throttled before any
+work is done, by token buckets per client IP and per username. The buckets
+live in size-bounded LRUs so that a flood of distinct keys cannot grow
+memory; an evicted key simply starts over with a full bucket. Admitted
+attempts then pass a global cap on concurrent verifications.
+
+Limits are kept per process: with N workers a client gets up to N times
+the configured rate.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import List
+
+from src.auth.hashing import HashingSaturatedError
+from src.utils.shared import CONFIG
+
+
+class LoginRateLimitedError(Exception):
+    """Raised when a login attempt exceeds the per-IP or per-username rate"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after  # seconds until an attempt can succeed
+
+
+class LoginsSaturatedError(HashingSaturatedError):
+    """Raised when the cap on concurrent login verifications is reached"""
+
+
+class TokenBucketLimiter:
+    """
+    Token buckets per key holding up to `burst` tokens, refilled at `rate`
+    tokens per second, for the `max_keys` most recently seen keys.
+    """
+
+    def __init__(self, rate: float, burst: int, max_keys: int = 100000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        # key -> [tokens, monotonic time of the last refill]
+        self._buckets: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.rejected = 0
+
+    def acquire(self, key: str) -> float:
+        """
+        Take a token from the bucket of `key`. Returns 0 if one was taken,
+        else the seconds until one will be available.
+        """
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [float(self.burst), now]
+                while len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                self.allowed += 1
+                return 0.0
+            self.rejected += 1
+            return (1 - bucket[0]) / self.rate
+
+    def clear(self):
+        """Forget all buckets."""
+        with self._lock:
+            self._buckets.clear()
+
+    def stats(self) -> dict:
+        """Return the number of tracked keys and the decision counters."""
+        with self._lock:
+            return {
+                "keys": len(self._buckets),
+                "max_keys": self.max_keys,
+                "allowed": self.allowed,
+                "rejected": self.rejected,
+            }
+
+
+class LoginLimiter:
+    """Per-IP and per-username attempt rates plus a cap on concurrent verifies"""
+
+    def __init__(
+        self,
+        ip_limiter: TokenBucketLimiter,
+        username_limiter: TokenBucketLimiter,
+        max_concurrent: int,
+    ):
+        self.ip_limiter = ip_limiter
+        self.username_limiter = username_limiter
+        self.max_concurrent = max_concurrent
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.saturated = 0
+
+    def check(self, ip: str, username: str):
+        """Admit a login attempt or raise LoginRateLimitedError."""
+        # the IP is checked first, so that a throttled client does not also
+        # use up the attempts of the usernames it tries
+        retry_after = self.ip_limiter.acquire(ip)
+        if retry_after:
+            raise LoginRateLimitedError(
+                f"Too many login attempts from {ip}", retry_after
+            )
+        retry_after = self.username_limiter.acquire(username)
+        if retry_after:
+            raise LoginRateLimitedError(
+                f"Too many login attempts for {username!r}", retry_after
+            )
+
+    @contextmanager
+    def verifying(self):
+        """Hold one of the verification slots or raise LoginsSaturatedError."""
+        with self._lock:
+            if self.in_flight >= self.max_concurrent:
+                self.saturated += 1
+                raise LoginsSaturatedError(
+                    f"Too many logins in progress ({self.in_flight})"
+                )
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def clear(self):
+        """Forget all buckets, e.g. between tests."""
+        self.ip_limiter.clear()
+        self.username_limiter.clear()
+
+    def stats(self) -> dict:
+        """Return a snapshot of the limiter counters."""
+        with self._lock:
+            verifications = {
+                "in_flight": self.in_flight,
+                "max_concurrent": self.max_concurrent,
+                "saturated": self.saturated,
+            }
+        return {
+            "ip": self.ip_limiter.stats(),
+            "username": self.username_limiter.stats(),
+            "verifications": verifications,
+        }
+
+
+LOGIN_LIMITER = LoginLimiter(
+    ip_limiter=TokenBucketLimiter(
+        rate=CONFIG.login_ip_per_minute / 60,
+        burst=CONFIG.login_ip_burst,
+        max_keys=CONFIG.login_limiter_max_keys,
+    ),
+    username_limiter=TokenBucketLimiter(
+        rate=CONFIG.login_username_per_minute / 60,
+        burst=CONFIG.login_username_burst,
+        max_keys=CONFIG.login_limiter_max_keys,
+    ),
+    max_concurrent=CONFIG.login_max_concurrent_verifies,
+)
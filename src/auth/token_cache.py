@@ -0,0 +1,77 @@
+"""
+Cache of decoded access tokens
+
+Verifying a JWT signature on every request is wasted work for a token we have
+already seen. Decoded claims are kept in a bounded LRU keyed by the raw token
+and dropped as soon as the token's `exp` passes, so a cache hit is a single
+dict lookup.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from src.utils.shared import CONFIG
+
+
+class TokenCache:
+    """Size-bounded LRU of decoded token claims that expire with the token."""
+
+    def __init__(self, max_size: int = 10000):
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, Tuple[float, dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token: str) -> Optional[dict]:
+        """Return the cached claims of a token or None if unknown or expired."""
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, claims = entry
+            if expires_at <= time.time():
+                del self._entries[token]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return claims
+
+    def put(self, token: str, claims: dict):
+        """Cache the claims of a verified token until its `exp`."""
+        expires_at = claims.get("exp")
+        if expires_at is None:
+            # Never cache a token that would not expire
+            return
+        with self._lock:
+            self._entries[token] = (float(expires_at), claims)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, token: str):
+        """Drop a single token, e.g. on logout."""
+        with self._lock:
+            self._entries.pop(token, None)
+
+    def clear(self):
+        """Drop every cached token."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """Return a snapshot of the cache counters."""
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+TOKEN_CACHE = TokenCache(max_size=CONFIG.token_cache_size)
@@ -0,0 +1,179 @@
+"""
+Read-through cache of user lookups
+
+Login looks users up by username and authenticated routes by id, mostly for
+the same few hot users. Their columns are kept as immutable CachedUser
+snapshots in a size-bounded LRU keyed by user id, with a username index,
+and dropped `USER_CACHE_TTL_SECONDS` after they were read.
+
+Entries are invalidated when a session commits changes to a user: a flush
+hook records the users it wrote, like the budget rollup hook does. Writes in
+other processes, or outside the ORM, are only picked up once the entry
+expires, which bounds how stale a cached user can be.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.models.db_models import User
+from src.utils.shared import CONFIG
+
+
+class CachedUser(NamedTuple):
+    """The columns of a user row"""
+
+    user_id: int
+    username: str
+    email: str
+    password: str  # the bcrypt hash
+
+
+class UserCache:
+    """Size-bounded LRU of user snapshots that expire after `ttl` seconds."""
+
+    def __init__(self, max_size: int = 10000, ttl: float = 60.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        # user_id -> (expires at, user)
+        self._entries: "OrderedDict[int, Tuple[float, CachedUser]]" = OrderedDict()
+        self._user_ids: Dict[str, int] = {}  # username -> user_id
+        self._lock = threading.Lock()
+        # bumped by every invalidation, so that a lookup racing with a write
+        # does not cache what it read before the write
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id: int) -> Optional[CachedUser]:
+        """Return the cached user with this id or None if unknown or expired."""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, user = entry
+            if expires_at <= time.monotonic():
+                self._remove(user_id)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return user
+
+    def get_by_username(self, username: str) -> Optional[CachedUser]:
+        """Return the cached user with this username or None."""
+        with self._lock:
+            user_id = self._user_ids.get(username)
+        if user_id is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        return self.get(user_id)
+
+    def put(self, user: CachedUser, version: int):
+        """
+        Cache a user read while the cache was at `version`, unless a user
+        was invalidated since.
+        """
+        with self._lock:
+            if version != self.version:
+                return
+            self._remove(user.user_id)
+            self._entries[user.user_id] = (time.monotonic() + self.ttl, user)
+            self._user_ids[user.username] = user.user_id
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, user_id: int):
+        """Drop a user, e.g. after it was updated."""
+        with self._lock:
+            self.version += 1
+            self._remove(user_id)
+
+    def _remove(self, user_id: int):
+        """Drop an entry and its username; the lock must be held."""
+        entry = self._entries.pop(user_id, None)
+        if entry is not None:
+            self._user_ids.pop(entry[1].username, None)
+
+    def clear(self):
+        """Drop every cached user."""
+        with self._lock:
+            self.version += 1
+            self._entries.clear()
+            self._user_ids.clear()
+
+    def stats(self) -> dict:
+        """Return a snapshot of the cache counters."""
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+USER_CACHE = UserCache(
+    max_size=CONFIG.user_cache_size, ttl=CONFIG.user_cache_ttl_seconds
+)
+
+_USER_COLUMNS = (User.user_id, User.username, User.email, User.password)
+
+
+async def get_user(db: AsyncSession, user_id: int) -> Optional[CachedUser]:
+    """Look a user up by id, from the cache when possible."""
+    user = USER_CACHE.get(user_id)
+    if user is None:
+        version = USER_CACHE.version
+        row = (
+            await db.exec(select(*_USER_COLUMNS).where(User.user_id == user_id))
+        ).first()
+        if row is not None:
+            user = CachedUser(*row)
+            USER_CACHE.put(user, version)
+    return user
+
+
+async def get_user_by_username(db: AsyncSession, username: str) -> Optional[CachedUser]:
+    """Look a user up by username, from the cache when possible."""
+    user = USER_CACHE.get_by_username(username)
+    if user is None:
+        version = USER_CACHE.version
+        row = (
+            await db.exec(select(*_USER_COLUMNS).where(User.username == username))
+        ).first()
+        if row is not None:
+            user = CachedUser(*row)
+            USER_CACHE.put(user, version)
+    return user
+
+
+@event.listens_for(Session, "after_flush")
+def _record_user_writes(session: Session, flush_context):
+    """Remember the users written by a flush and drop them from the cache."""
+    written = session.info.setdefault("written_user_ids", set())
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, User) and obj.user_id is not None:
+            written.add(obj.user_id)
+            USER_CACHE.invalidate(obj.user_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_written_users(session: Session):
+    """Drop the committed users again, in case a lookup re-cached them."""
+    for user_id in session.info.pop("written_user_ids", ()):
+        USER_CACHE.invalidate(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_written_users(session: Session):
+    session.info.pop("written_user_ids", None)
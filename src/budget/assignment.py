@@ -0,0 +1,391 @@
+"""
+Automatic budget assignment
+
+Transactions inserted without a budget_id are assigned to the budget of
+their user whose window contains their date, if any. A budget covers whole
+days from its start_date to its end_date inclusive; a recurring budget
+(Budget.recurrence "weekly" or "monthly") repeats that window every week or
+month from its start on. Where windows overlap, the shortest one wins, then
+the one that started last, then the lowest budget_id.
+
+Each user's budgets are flattened into a BudgetIndex of sorted, disjoint
+segments owned by one budget each, so that a lookup is a binary search
+however many budgets overlap. The periods of recurring budgets are only
+generated for the years that lookups reach. Indexes are cached per user and
+invalidated when a session commits changes to a budget, like the user cache;
+budget changes made by other processes are picked up once the entry expires
+after BUDGET_INDEX_TTL_SECONDS.
+
+Budgets are assigned:
+
+- for ORM inserts, by a before_flush hook that runs ahead of the rollup hook;
+- for bulk loads, by src.budget.importer.insert_transactions.
+
+Transactions that are still unassigned, e.g. those inserted before their
+budget was created, are assigned in batches with:
+
+    python -m src.budget.assignment backfill
+"""
+
+import argparse
+import calendar
+import heapq
+from bisect import bisect_right
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from sqlalchemy import Connection, bindparam, event, select
+from sqlalchemy.orm import Session
+
+from src.budget.rollups import apply_budget_deltas, budget_deltas
+from src.models.db_models import Budget, Transaction
+from src.utils.cache import PerUserCache
+from src.utils.shared import CONFIG, LOGGER
+
+DEFAULT_BATCH_SIZE = 10000
+
+_DAY = timedelta(days=1)
+_WEEK = timedelta(weeks=1)
+
+
+class BudgetWindow(NamedTuple):
+    """The columns of a budget that decide which dates it covers"""
+
+    budget_id: int
+    start_date: datetime
+    end_date: datetime
+    recurrence: Optional[str] = None
+
+
+def _day(date: datetime) -> datetime:
+    return datetime(date.year, date.month, date.day)
+
+
+def add_months(date: datetime, months: int) -> datetime:
+    """Shift a date by whole months, clamping the day to the month's length."""
+    month = date.month - 1 + months
+    year = date.year + month // 12
+    month = month % 12 + 1
+    return date.replace(
+        year=year, month=month, day=min(date.day, calendar.monthrange(year, month)[1])
+    )
+
+
+def _add(date: datetime, delta: timedelta) -> datetime:
+    """date + delta, clamped to datetime.max."""
+    try:
+        return date + delta
+    except OverflowError:
+        return datetime.max
+
+
+def _add_months(date: datetime, months: int) -> datetime:
+    """add_months, clamped to datetime.max."""
+    try:
+        return add_months(date, months)
+    except ValueError:  # past the year 9999
+        return datetime.max
+
+
+def budget_periods(
+    budget: BudgetWindow, lo: datetime, hi: datetime
+) -> Iterator[Tuple[datetime, datetime]]:
+    """
+    The half-open [start, end) periods of a budget, those of a recurring one
+    limited to the ones that may overlap [lo, hi). The first of those is
+    found arithmetically, however far lo is from the budget's start; periods
+    running past the last representable date end at datetime.max.
+    """
+    start = _day(budget.start_date)
+    last_day = _day(budget.end_date)
+    if last_day < start:
+        return
+    if budget.recurrence == "weekly":
+        # skip the periods that ended before lo
+        k = max(0, (lo - last_day) // _WEEK)
+        period_start = _add(start, k * _WEEK)
+        while period_start < hi and period_start < datetime.max:
+            yield period_start, _add(_add(last_day, k * _WEEK), _DAY)
+            k += 1
+            period_start = _add(start, k * _WEEK)
+    elif budget.recurrence == "monthly":
+        k = max(0, (lo.year - last_day.year) * 12 + lo.month - last_day.month - 1)
+        period_start = _add_months(start, k)
+        while period_start < hi and period_start < datetime.max:
+            yield period_start, _add(_add_months(last_day, k), _DAY)
+            k += 1
+            period_start = _add_months(start, k)
+    else:
+        yield start, _add(last_day, _DAY)
+
+
+def current_period(budget: BudgetWindow, now: datetime) -> Tuple[datetime, datetime]:
+    """
+    The [start, end) period of a budget in effect at `now`: the latest one
+    started by then, or the first one for a budget yet to start.
+    """
+    started = [
+        period
+        for period in budget_periods(budget, now, _add(now, _DAY))
+        if period[0] <= now
+    ]
+    if started:
+        return started[-1]
+    start = _day(budget.start_date)
+    # an empty window, end_date before start_date, has no periods
+    return next(budget_periods(budget, start, _add(start, _DAY)), (start, start))
+
+
+class BudgetIndex:
+    """
+    The budget windows of one user, flattened into disjoint segments that are
+    looked up by binary search.
+    """
+
+    def __init__(self, budgets: Sequence[BudgetWindow]):
+        self.budgets = list(budgets)
+        self.recurring = any(budget.recurrence for budget in self.budgets)
+        # (lo, hi, bounds, owners): budget owners[i], or None, covers
+        # [bounds[i], bounds[i + 1]); recurring periods are generated for
+        # [lo, hi) only. Replaced as a whole so that lookups need no lock.
+        self._segments = self._build(datetime.min, datetime.min)
+
+    def lookup(self, date: datetime) -> Optional[int]:
+        """The budget_id covering a date, or None."""
+        lo, hi, bounds, owners = self._segments
+        if self.recurring and not (lo <= date < hi or date == hi == datetime.max):
+            # build whole years, so that neighbouring dates do not rebuild;
+            # the built range grows by adjacent years only, so that a far
+            # away date does not generate every period in between
+            start = datetime(date.year, 1, 1)
+            end = datetime(date.year + 1, 1, 1) if date.year < 9999 else datetime.max
+            if end == lo:
+                end = hi
+            elif start == hi:
+                start = lo
+            self._segments = self._build(start, end)
+            _, _, bounds, owners = self._segments
+        i = bisect_right(bounds, date) - 1
+        return owners[i] if i >= 0 else None
+
+    def _build(self, lo: datetime, hi: datetime):
+        periods = sorted(
+            (start, end, budget.budget_id)
+            for budget in self.budgets
+            for start, end in budget_periods(budget, lo, hi)
+        )
+        bounds: List[datetime] = []
+        owners: List[Optional[int]] = []
+        # sweep over the period bounds, keeping the periods that cover the
+        # current bound in a heap ordered by precedence
+        active: List[tuple] = []
+        i = 0
+        for bound in sorted(
+            {point for start, end, _ in periods for point in (start, end)}
+        ):
+            while i < len(periods) and periods[i][0] <= bound:
+                start, end, budget_id = periods[i]
+                heapq.heappush(
+                    active, (end - start, -start.toordinal(), budget_id, end)
+                )
+                i += 1
+            while active and active[0][3] <= bound:
+                heapq.heappop(active)
+            owner = active[0][2] if active else None
+            if not owners or owners[-1] != owner:
+                bounds.append(bound)
+                owners.append(owner)
+        return lo, hi, bounds, owners
+
+
+BUDGET_INDEXES = PerUserCache(
+    max_size=CONFIG.budget_index_cache_size, ttl=CONFIG.budget_index_ttl_seconds
+)
+
+
+def load_budget_indexes(
+    connection: Connection, user_ids: Iterable[int]
+) -> Dict[int, BudgetIndex]:
+    """Build the budget indexes of users from the database."""
+    user_ids = set(user_ids)
+    budgets = defaultdict(list)
+    result = connection.execute(
+        select(
+            Budget.user_id,
+            Budget.budget_id,
+            Budget.start_date,
+            Budget.end_date,
+            Budget.recurrence,
+        ).where(Budget.user_id.in_(user_ids))
+    )
+    for user_id, *columns in result:
+        budgets[user_id].append(BudgetWindow(*columns))
+    return {user_id: BudgetIndex(budgets[user_id]) for user_id in user_ids}
+
+
+def get_budget_indexes(
+    connection: Connection, user_ids: Iterable[int]
+) -> Dict[int, BudgetIndex]:
+    """The budget indexes of users, from the cache when possible."""
+    indexes, missing = {}, []
+    for user_id in set(user_ids):
+        index = BUDGET_INDEXES.get(user_id)
+        if index is None:
+            missing.append(user_id)
+        else:
+            indexes[user_id] = index
+    if missing:
+        version = BUDGET_INDEXES.version
+        for user_id, index in load_budget_indexes(connection, missing).items():
+            BUDGET_INDEXES.put(user_id, index, version)
+            indexes[user_id] = index
+    return indexes
+
+
+def assign_budgets(connection: Connection, records: List[dict]) -> int:
+    """
+    Fill in the budget_id of transaction records that have none, in place.
+    Returns how many were assigned.
+    """
+    unassigned = [record for record in records if record["budget_id"] is None]
+    if not unassigned:
+        return 0
+    indexes = get_budget_indexes(
+        connection, {record["user_id"] for record in unassigned}
+    )
+    assigned = 0
+    for record in unassigned:
+        budget_id = indexes[record["user_id"]].lookup(record["date"])
+        if budget_id is not None:
+            record["budget_id"] = budget_id
+            assigned += 1
+    return assigned
+
+
+def backfill_budgets(
+    connection: Connection,
+    user_id: Optional[int] = None,
+    after_id: int = 0,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> Tuple[Optional[int], int]:
+    """
+    Assign budgets to the next batch of unassigned transactions with ids
+    above `after_id` and update the rollups. Returns the last transaction_id
+    scanned, None once none are left, and how many were assigned.
+    """
+    statement = (
+        select(
+            Transaction.transaction_id,
+            Transaction.user_id,
+            Transaction.budget_id,
+            Transaction.date,
+            Transaction.amount,
+        )
+        .where(Transaction.budget_id.is_(None), Transaction.transaction_id > after_id)
+        .order_by(Transaction.transaction_id)
+        .limit(batch_size)
+    )
+    if user_id is not None:
+        statement = statement.where(Transaction.user_id == user_id)
+    records = [row._asdict() for row in connection.execute(statement)]
+    if not records:
+        return None, 0
+
+    assign_budgets(connection, records)
+    assigned = [record for record in records if record["budget_id"] is not None]
+    if assigned:
+        table = Transaction.__table__
+        connection.execute(
+            table.update()
+            .where(table.c.transaction_id == bindparam("b_transaction_id"))
+            .values(budget_id=bindparam("b_budget_id")),
+            [
+                {
+                    "b_transaction_id": record["transaction_id"],
+                    "b_budget_id": record["budget_id"],
+                }
+                for record in assigned
+            ],
+        )
+        apply_budget_deltas(connection, budget_deltas(assigned))
+    return records[-1]["transaction_id"], len(assigned)
+
+
+# inserted ahead of the other before_flush hooks, so that the rollup hook
+# sees the assigned budgets
+@event.listens_for(Session, "before_flush", insert=True)
+def _assign_new_transactions(session: Session, flush_context, instances):
+    """Assign budgets to the new transactions of a flush."""
+    if not CONFIG.budget_auto_assign:
+        return
+    pending = [
+        obj
+        for obj in session.new
+        if isinstance(obj, Transaction)
+        and obj.budget_id is None
+        and obj.budget is None
+        and obj.user_id is not None
+        and obj.date is not None
+    ]
+    if not pending:
+        return
+    indexes = get_budget_indexes(
+        session.connection(), {transaction.user_id for transaction in pending}
+    )
+    for transaction in pending:
+        budget_id = indexes[transaction.user_id].lookup(transaction.date)
+        if budget_id is not None:
+            transaction.budget_id = budget_id
+
+
+@event.listens_for(Session, "after_flush")
+def _record_budget_writes(session: Session, flush_context):
+    """Remember whose budgets a flush wrote and drop their indexes."""
+    written = session.info.setdefault("written_budget_user_ids", set())
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, Budget) and obj.user_id is not None:
+            written.add(obj.user_id)
+            BUDGET_INDEXES.invalidate(obj.user_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_written_budgets(session: Session):
+    """Drop the indexes again, in case a lookup rebuilt them mid-transaction."""
+    for user_id in session.info.pop("written_budget_user_ids", ()):
+        BUDGET_INDEXES.invalidate(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_written_budgets(session: Session):
+    """Drop indexes that may have been built from the rolled back budgets."""
+    for user_id in session.info.pop("written_budget_user_ids", ()):
+        BUDGET_INDEXES.invalidate(user_id)
+
+
+def main():
+    # imported here as src.db.database imports this module
+    from src.db.database import engine
+
+    parser = argparse.ArgumentParser(description="Assign transactions to budgets")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparser = subparsers.add_parser(
+        "backfill", help="assign the transactions that have no budget"
+    )
+    subparser.add_argument("--user-id", type=int)
+    subparser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    after_id, total = 0, 0
+    while after_id is not None:
+        # one transaction per batch, so progress survives an interruption
+        with engine.begin() as connection:
+            after_id, assigned = backfill_budgets(
+                connection, args.user_id, after_id, args.batch_size
+            )
+        total += assigned
+    LOGGER.info(f"Assigned {total} transactions to budgets")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+"""
+Account balance checkpoints
+
+An account's balance is the sum of its transaction amounts. Rather than
+summing the whole history on every read, each account keeps one
+AccountBalanceCheckpoint per month holding the net change of that month's
+transactions in integer minor units (cents), so sums are exact.
+
+The balance as of any date is then the sum of the checkpoints of the earlier
+months (one row per month of history) plus the transactions of that date's
+month up to the date, read through the (account_id, date) index. Monthly
+changes rather than running totals are stored so that a back-dated
+transaction touches a single checkpoint.
+
+Checkpoints are maintained like the budget rollups (see src.budget.rollups):
+by a before_flush hook for ORM writes and by the bulk importer. To rebuild
+them from the transactions:
+
+    python -m src.budget.balances rebuild
+"""
+
+import argparse
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import (
+    BigInteger,
+    Connection,
+    Numeric,
+    cast,
+    delete,
+    event,
+    func,
+    select,
+)
+from sqlalchemy.orm import Session
+
+from src.budget.rollups import add_increments, loaded_value
+from src.models.db_models import AccountBalanceCheckpoint, Transaction
+from src.utils.shared import LOGGER
+
+# minor units per major unit of currency, e.g. cents per dollar
+MINOR_UNITS = 100
+
+# (account_id, month) -> (change in minor units, transaction count delta)
+Deltas = Dict[Tuple[int, datetime], Tuple[int, int]]
+
+
+# minor unit amounts are first rounded to this many decimals, which drops the
+# binary noise of amount * 100 (0.285 * 100 == 28.499999999999996) so that
+# exact halves are recognized on every dialect
+MINOR_DECIMALS = 6
+
+
+def to_minor(amount: float) -> int:
+    """
+    Round an amount to minor units, half away from zero, as _minor_amount
+    does in SQL.
+    """
+    minor = int(round(abs(amount) * MINOR_UNITS, MINOR_DECIMALS) + 0.5)
+    return -minor if amount < 0 else minor
+
+
+def month_of(date: datetime) -> datetime:
+    """Start of the month a date falls in, the key of its checkpoint."""
+    return datetime(date.year, date.month, 1)
+
+
+def _minor_amount():
+    """
+    SQL expression of a transaction amount in minor units, as to_minor. ROUND
+    rounds halves away from zero on NUMERIC, but to even on Postgres doubles;
+    SQLite keeps doubles, whose ROUND rounds halves away from zero too.
+    """
+    minor = cast(Transaction.amount * MINOR_UNITS, Numeric)
+    return cast(func.round(func.round(minor, MINOR_DECIMALS)), BigInteger)
+
+
+def account_deltas(records: Iterable[dict]) -> Deltas:
+    """Sum newly inserted transaction records per account and month."""
+    deltas = defaultdict(lambda: [0, 0])
+    for record in records:
+        delta = deltas[(record["account_id"], month_of(record["date"]))]
+        delta[0] += to_minor(record["amount"])
+        delta[1] += 1
+    return {key: tuple(delta) for key, delta in deltas.items()}
+
+
+def apply_account_deltas(connection: Connection, deltas: Deltas):
+    """Add deltas to the checkpoints, creating missing checkpoint rows."""
+    add_increments(
+        connection,
+        AccountBalanceCheckpoint.__table__,
+        [
+            {
+                "account_id": account_id,
+                "month": month,
+                "change_minor": change,
+                "transaction_count": count,
+            }
+            for (account_id, month), (change, count) in deltas.items()
+            if change or count
+        ],
+        keys=["account_id", "month"],
+    )
+
+
+def _flush_deltas(session: Session) -> Deltas:
+    """Per-account, per-month deltas of the transaction changes in a session."""
+    deltas = defaultdict(lambda: [0, 0])
+
+    def add(account_id: int, date: datetime, amount: float, count: int):
+        delta = deltas[(account_id, month_of(date))]
+        delta[0] += count * to_minor(amount)
+        delta[1] += count
+
+    for obj in session.new:
+        if isinstance(obj, Transaction):
+            add(obj.account_id, obj.date, obj.amount, 1)
+    for obj in session.deleted:
+        if isinstance(obj, Transaction):
+            old = [loaded_value(obj, a) for a in ("account_id", "date", "amount")]
+            add(*old, -1)
+    for obj in session.dirty:
+        if isinstance(obj, Transaction) and session.is_modified(obj):
+            old = [loaded_value(obj, a) for a in ("account_id", "date", "amount")]
+            if old != [obj.account_id, obj.date, obj.amount]:
+                add(*old, -1)
+                add(obj.account_id, obj.date, obj.amount, 1)
+    return {key: tuple(delta) for key, delta in deltas.items()}
+
+
+def _on_set(target, value, oldvalue, initiator):
+    """No-op; registered with active_history=True for its side effect."""
+
+
+# Load the replaced value on assignment, even when the attribute was expired,
+# so that updates can be turned into deltas
+for _attribute in (Transaction.account_id, Transaction.date, Transaction.amount):
+    event.listen(_attribute, "set", _on_set, active_history=True)
+
+
+@event.listens_for(Session, "before_flush")
+def _maintain_checkpoints(session: Session, flush_context, instances):
+    """Fold pending transaction changes into the checkpoints in the same flush."""
+    deltas = _flush_deltas(session)
+    if deltas:
+        apply_account_deltas(session.connection(), deltas)
+
+
+def account_balance_as_of(
+    connection: Connection, account_id: int, date: datetime
+) -> int:
+    """
+    Balance in minor units after the transactions up to and including `date`:
+    the earlier months from their checkpoints, then the tail of its month.
+    """
+    month = month_of(date)
+    checkpoints = AccountBalanceCheckpoint.__table__
+    closed = connection.execute(
+        select(func.coalesce(func.sum(checkpoints.c.change_minor), 0)).where(
+            checkpoints.c.account_id == account_id, checkpoints.c.month < month
+        )
+    ).scalar_one()
+    tail = connection.execute(
+        select(func.coalesce(func.sum(_minor_amount()), 0)).where(
+            Transaction.account_id == account_id,
+            Transaction.date >= month,
+            Transaction.date <= date,
+        )
+    ).scalar_one()
+    return closed + tail
+
+
+def current_account_balance(connection: Connection, account_id: int) -> int:
+    """Balance in minor units after all transactions, from checkpoints only."""
+    checkpoints = AccountBalanceCheckpoint.__table__
+    return connection.execute(
+        select(func.coalesce(func.sum(checkpoints.c.change_minor), 0)).where(
+            checkpoints.c.account_id == account_id
+        )
+    ).scalar_one()
+
+
+def monthly_balances(
+    connection: Connection,
+    account_id: int,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> List[dict]:
+    """
+    Closing balance in minor units of every month with transactions, read
+    from checkpoints only. Months before `start` are folded into the opening
+    balance; `end` is exclusive.
+    """
+    checkpoints = AccountBalanceCheckpoint.__table__
+    statement = (
+        select(
+            checkpoints.c.month,
+            checkpoints.c.change_minor,
+            checkpoints.c.transaction_count,
+        )
+        .where(checkpoints.c.account_id == account_id)
+        .order_by(checkpoints.c.month)
+    )
+    if end is not None:
+        statement = statement.where(checkpoints.c.month < end)
+
+    balance, history = 0, []
+    for month, change, count in connection.execute(statement):
+        balance += change
+        if start is None or month >= month_of(start):
+            history.append(
+                {
+                    "month": month.date(),
+                    "change_minor": change,
+                    "balance_minor": balance,
+                    "transaction_count": count,
+                }
+            )
+    return history
+
+
+def rebuild_account_checkpoints(
+    connection: Connection, account_id: Optional[int] = None
+):
+    """Recompute checkpoints from the transactions to reconcile drift."""
+    checkpoints = AccountBalanceCheckpoint.__table__
+    statement = select(
+        Transaction.account_id, Transaction.date, Transaction.amount
+    ).execution_options(yield_per=10000)
+    if account_id is None:
+        connection.execute(delete(checkpoints))
+    else:
+        connection.execute(
+            delete(checkpoints).where(checkpoints.c.account_id == account_id)
+        )
+        statement = statement.where(Transaction.account_id == account_id)
+
+    # grouped in Python: truncating dates to months is not portable SQL
+    deltas = account_deltas(row._asdict() for row in connection.execute(statement))
+    apply_account_deltas(connection, deltas)
+    LOGGER.info(f"Rebuilt {len(deltas)} account balance checkpoints")
+    return len(deltas)
+
+
+def main():
+    # imported here as src.db.database imports this module
+    from src.db.database import engine
+
+    parser = argparse.ArgumentParser(description="Maintain account balance checkpoints")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparser = subparsers.add_parser("rebuild", help="recompute from transactions")
+    subparser.add_argument("--account-id", type=int)
+    args = parser.parse_args()
+
+    with engine.begin() as connection:
+        rebuild_account_checkpoints(connection, args.account_id)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,419 @@
+"""
+Bulk bank-statement import
+
+Statements (CSV or OFX) are parsed line by line as they stream in, validated
+in batches and loaded into the transaction table with a single bulk write per
+batch: COPY on Postgres, executemany elsewhere. Invalid rows are reported
+with their row number and skipped; they never abort the rest of the batch.
+
+    python -m src.budget.importer --user-id 1 --account-id 1 statement.csv
+"""
+
+import argparse
+import codecs
+import csv
+import io
+import math
+import re
+from datetime import datetime, timezone
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import Connection, Table
+from sqlalchemy.util import await_only
+from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.budget.assignment import assign_budgets
+from src.budget.balances import account_deltas, apply_account_deltas
+from src.budget.rollups import apply_budget_deltas, budget_deltas
+from src.budget.rules import categorize
+from src.db.database import engine
+from src.models.data_models import ImportResult, ImportRowError
+from src.models.db_models import Budget, Transaction
+from src.utils.shared import CONFIG, LOGGER
+
+# columns written by the bulk loader, in COPY order
+COLUMNS = (
+    "user_id",
+    "account_id",
+    "budget_id",
+    "date",
+    "amount",
+    "description",
+    "category",
+)
+
+# at most this many row errors are returned, the rest are only counted
+MAX_REPORTED_ERRORS = 1000
+
+DEFAULT_BATCH_SIZE = 5000
+
+# (row number, raw fields)
+RawRow = Tuple[int, Dict[str, str]]
+
+
+class CSVStatementParser:
+    """
+    Incremental CSV parser. Expects a header with `date`, `amount` and
+    `description` columns and an optional `budget_id` column.
+    """
+
+    def __init__(self):
+        self._header: Optional[List[str]] = None
+        self._pending = ""
+        self._row = 0
+
+    def feed(self, line: str) -> List[RawRow]:
+        """Consume one line and return the rows it completes."""
+        # a quoted field may contain newlines: wait until the quotes balance
+        record = self._pending + line
+        if record.count('"') % 2:
+            self._pending = record + "\n"
+            return []
+        self._pending = ""
+        if not record.strip():
+            return []
+
+        if '"' in record:
+            fields = next(csv.reader([record]))
+        else:
+            fields = record.split(",")
+        if self._header is None:
+            self._header = [name.strip().lower() for name in fields]
+            return []
+        self._row += 1
+        return [(self._row, dict(zip(self._header, fields)))]
+
+    def close(self) -> List[RawRow]:
+        """Flush a trailing record with unbalanced quotes."""
+        if not self._pending:
+            return []
+        self._row += 1
+        return [(self._row, {"_error": "Unterminated quoted field"})]
+
+
+class OFXStatementParser:
+    """Incremental OFX (SGML or XML) parser for <STMTTRN> records."""
+
+    _TAG = re.compile(r"<(/?\w+)>([^<\r\n]*)")
+
+    def __init__(self):
+        self._fields: Optional[Dict[str, str]] = None
+        self._row = 0
+
+    def feed(self, line: str) -> List[RawRow]:
+        # a line may hold any number of records, e.g. single-line XML
+        rows = []
+        for tag, value in self._TAG.findall(line):
+            tag = tag.upper()
+            if tag == "STMTTRN":
+                self._fields = {}
+            elif tag == "/STMTTRN":
+                if self._fields is not None:
+                    rows.append(self._record(self._fields))
+                self._fields = None
+            elif self._fields is not None and not tag.startswith("/"):
+                self._fields[tag] = value.strip()
+        return rows
+
+    def _record(self, fields: Dict[str, str]) -> RawRow:
+        self._row += 1
+        return (
+            self._row,
+            {
+                "date": fields.get("DTPOSTED", ""),
+                "amount": fields.get("TRNAMT", ""),
+                "description": fields.get("NAME") or fields.get("MEMO", ""),
+            },
+        )
+
+    def close(self) -> List[RawRow]:
+        return []
+
+
+PARSERS = {"csv": CSVStatementParser, "ofx": OFXStatementParser}
+
+
+def _parse_date(value: str) -> datetime:
+    value = value.strip()
+    if value[:8].isdigit() and (len(value) == 8 or not value[8:9].isdigit()):
+        # OFX dates: YYYYMMDD[HHMMSS[.XXX]][[TZ]]
+        return datetime.strptime(value[:8], "%Y%m%d")
+    if len(value) >= 14 and value[:14].isdigit():
+        return datetime.strptime(value[:14], "%Y%m%d%H%M%S")
+    try:
+        date = datetime.fromisoformat(value)
+    except ValueError:
+        return datetime.strptime(value, "%m/%d/%Y")
+    if date.tzinfo is not None:
+        # dates are stored as naive UTC
+        date = date.astimezone(timezone.utc).replace(tzinfo=None)
+    return date
+
+
+def validate_row(
+    fields: Dict[str, str], user_id: int, account_id: int, budget_ids: Set[int]
+) -> dict:
+    """Turn raw fields into a transaction record or raise ValueError."""
+    if "_error" in fields:
+        raise ValueError(fields["_error"])
+
+    try:
+        date = _parse_date(fields.get("date") or "")
+    except ValueError:
+        raise ValueError(f"Invalid date: {fields.get('date')!r}")
+
+    raw_amount = (fields.get("amount") or "").strip().replace(",", "")
+    try:
+        amount = float(raw_amount.replace("$", ""))
+    except ValueError:
+        raise ValueError(f"Invalid amount: {fields.get('amount')!r}")
+    if not math.isfinite(amount):  # float() accepts "nan" and "inf"
+        raise ValueError(f"Invalid amount: {fields.get('amount')!r}")
+
+    description = (fields.get("description") or "").strip()
+    if not description:
+        raise ValueError("Missing description")
+
+    budget_id = None
+    if fields.get("budget_id"):
+        try:
+            budget_id = int(fields["budget_id"])
+        except ValueError:
+            raise ValueError(f"Invalid budget_id: {fields['budget_id']!r}")
+        if budget_id not in budget_ids:
+            raise ValueError(f"Unknown budget_id: {budget_id}")
+
+    return {
+        "user_id": user_id,
+        "account_id": account_id,
+        "budget_id": budget_id,
+        "date": date,
+        "amount": amount,
+        "description": description,
+        "category": None,
+    }
+
+
+def insert_transactions(
+    connection: Connection, records: List[dict], auto_assign: Optional[bool] = None
+) -> int:
+    """
+    Bulk insert validated transaction records on a sync connection and update
+    the budget rollups and account balance checkpoints in the same transaction.
+    Records are categorized by their user's rules first, then those still
+    without a budget_id are assigned one by date if `auto_assign`, which
+    defaults to BUDGET_AUTO_ASSIGN.
+    """
+    if not records:
+        return 0
+    if auto_assign is None:
+        auto_assign = CONFIG.budget_auto_assign
+    categorize(connection, records)
+    if auto_assign:
+        assign_budgets(connection, records)
+    # budget_id and category may be left out of a record
+    rows = [tuple(record.get(column) for column in COLUMNS) for record in records]
+    count = bulk_insert(connection, Transaction.__table__, COLUMNS, rows)
+    apply_budget_deltas(connection, budget_deltas(records))
+    apply_account_deltas(connection, account_deltas(records))
+    return count
+
+
+def bulk_insert(
+    connection: Connection, table: Table, columns: Sequence[str], rows: List[tuple]
+) -> int:
+    """
+    Load rows of values in `columns` order into a table: COPY on Postgres, a
+    driver-level executemany on SQLite.
+    """
+    dialect = connection.dialect
+    if dialect.name == "sqlite":
+        # plain executemany; skips per-row parameter compilation in SQLAlchemy
+        processors = [
+            table.c[column].type.dialect_impl(dialect).bind_processor(dialect)
+            for column in columns
+        ]
+        if any(processors):
+            rows = [
+                tuple(
+                    value if process is None else process(value)
+                    for process, value in zip(processors, row)
+                )
+                for row in rows
+            ]
+        connection.exec_driver_sql(
+            f'INSERT INTO "{table.name}" ({", ".join(columns)}) '
+            f"VALUES ({', '.join('?' * len(columns))})",
+            rows,
+        )
+        return len(rows)
+    if dialect.name != "postgresql":
+        connection.execute(table.insert(), [dict(zip(columns, row)) for row in rows])
+        return len(rows)
+
+    driver_connection = connection.connection.driver_connection
+    if dialect.driver == "asyncpg":
+        # the adapter opens its transaction lazily on the first statement;
+        # make sure it is open so the COPY commits or rolls back with it
+        connection.exec_driver_sql("SELECT 1")
+        # runs inside AsyncSession.run_sync, so the coroutine can be awaited
+        await_only(
+            driver_connection.copy_records_to_table(
+                table.name, records=rows, columns=list(columns)
+            )
+        )
+    else:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow(["" if value is None else value for value in row])
+        buffer.seek(0)
+        with driver_connection.cursor() as cursor:
+            cursor.copy_expert(
+                f'COPY "{table.name}" ({", ".join(columns)}) '
+                "FROM STDIN WITH (FORMAT csv)",
+                buffer,
+            )
+    return len(rows)
+
+
+class StatementImport:
+    """Accumulates the rows of one statement and loads them in batches."""
+
+    def __init__(
+        self,
+        fmt: str,
+        user_id: int,
+        account_id: int,
+        budget_ids: Set[int],
+        batch_size: int = DEFAULT_BATCH_SIZE,
+    ):
+        if fmt not in PARSERS:
+            raise ValueError(f"Unsupported statement format: {fmt}")
+        self.parser = PARSERS[fmt]()
+        self.user_id = user_id
+        self.account_id = account_id
+        self.budget_ids = budget_ids
+        self.batch_size = batch_size
+        self.pending: List[RawRow] = []
+        self.result = ImportResult()
+
+    def feed(self, line: str) -> bool:
+        """Consume a line; True once a full batch is waiting to be loaded."""
+        self.pending.extend(self.parser.feed(line))
+        return len(self.pending) >= self.batch_size
+
+    def close(self):
+        self.pending.extend(self.parser.close())
+
+    def load_pending(self, connection: Connection):
+        """Validate the pending rows and bulk insert the valid ones."""
+        records = []
+        for row, fields in self.pending:
+            try:
+                records.append(
+                    validate_row(fields, self.user_id, self.account_id, self.budget_ids)
+                )
+            except ValueError as e:
+                self.result.failed += 1
+                if len(self.result.errors) < MAX_REPORTED_ERRORS:
+                    self.result.errors.append(ImportRowError(row=row, error=str(e)))
+        self.pending = []
+        self.result.inserted += insert_transactions(connection, records)
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Split a stream of byte chunks into text lines."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    buffer = ""
+    async for chunk in chunks:
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        yield buffer.rstrip("\r")
+
+
+async def import_statement(
+    session: AsyncSession,
+    lines: AsyncIterator[str],
+    fmt: str,
+    user_id: int,
+    account_id: int,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> ImportResult:
+    """Stream a statement into the account, committing after every batch."""
+    result = await session.exec(
+        select(Budget.budget_id).where(Budget.user_id == user_id)
+    )
+    statement_import = StatementImport(
+        fmt, user_id, account_id, set(result.all()), batch_size
+    )
+
+    async def load():
+        await session.run_sync(
+            lambda sync_session: statement_import.load_pending(
+                sync_session.connection()
+            )
+        )
+        await session.commit()
+
+    async for line in lines:
+        if statement_import.feed(line):
+            await load()
+    statement_import.close()
+    await load()
+
+    LOGGER.info(
+        f"Imported {statement_import.result.inserted} transactions into account "
+        f"{account_id} ({statement_import.result.failed} rows rejected)"
+    )
+    return statement_import.result
+
+
+def import_statement_file(
+    session: Session,
+    lines: Iterable[str],
+    fmt: str,
+    user_id: int,
+    account_id: int,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> ImportResult:
+    """Synchronous counterpart of import_statement, used by the CLI."""
+    budget_ids = set(
+        session.exec(select(Budget.budget_id).where(Budget.user_id == user_id)).all()
+    )
+    statement_import = StatementImport(fmt, user_id, account_id, budget_ids, batch_size)
+    for line in lines:
+        if statement_import.feed(line.rstrip("\r\n")):
+            statement_import.load_pending(session.connection())
+            session.commit()
+    statement_import.close()
+    statement_import.load_pending(session.connection())
+    session.commit()
+    return statement_import.result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import a bank statement")
+    parser.add_argument("path")
+    parser.add_argument("--user-id", type=int, required=True)
+    parser.add_argument("--account-id", type=int, required=True)
+    parser.add_argument("--format", choices=sorted(PARSERS))
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    fmt = args.format or args.path.rsplit(".", 1)[-1].lower()
+    with open(args.path, encoding="utf-8-sig", newline="") as lines:
+        with Session(engine) as session:
+            result = import_statement_file(
+                session, lines, fmt, args.user_id, args.account_id, args.batch_size
+            )
+    print(result.model_dump_json(indent=2))
+
+
+if __name__ == "__main__":
+    main()
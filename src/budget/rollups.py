@@ -0,0 +1,188 @@
+"""
+Budget spend rollups
+
+Each budget has a BudgetRollup row holding the sum and count of the
+transactions assigned to it, so "spent so far" is a primary-key lookup
+instead of a scan of the transaction history. Rollups are kept in step
+incrementally:
+
+- ORM writes are picked up by a before_flush hook that turns the inserted,
+  updated and deleted transactions into per-budget deltas;
+- bulk loads call apply_budget_deltas themselves (see src.budget.importer).
+
+Writes that bypass both, e.g. raw SQL, leave the rollups drifting until the
+next rebuild:
+
+    python -m src.budget.rollups rebuild
+"""
+
+import argparse
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import Connection, Table, delete, event, func, inspect, select, true
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from src.models.db_models import Budget, BudgetRollup, Transaction
+from src.utils.shared import LOGGER
+
+# budget_id -> (amount delta, transaction count delta)
+Deltas = Dict[int, Tuple[float, int]]
+
+_UPSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+def budget_deltas(records: Iterable[dict]) -> Deltas:
+    """Sum newly inserted transaction records per budget."""
+    deltas = defaultdict(lambda: [0.0, 0])
+    for record in records:
+        if record["budget_id"] is not None:
+            delta = deltas[record["budget_id"]]
+            delta[0] += record["amount"]
+            delta[1] += 1
+    return {budget_id: tuple(delta) for budget_id, delta in deltas.items()}
+
+
+def apply_budget_deltas(connection: Connection, deltas: Deltas):
+    """Add deltas to the rollups, creating missing rollup rows."""
+    add_increments(
+        connection,
+        BudgetRollup.__table__,
+        [
+            {"budget_id": budget_id, "spent": amount, "transaction_count": count}
+            for budget_id, (amount, count) in deltas.items()
+            if amount or count
+        ],
+        keys=["budget_id"],
+    )
+
+
+def add_increments(connection: Connection, table: Table, params: List[dict], keys):
+    """
+    Add the non-key values of each row to the existing row with the same
+    `keys`, inserting the rows that do not exist yet.
+    """
+    if not params:
+        return
+    values = [column for column in params[0] if column not in keys]
+
+    upsert = _UPSERTS.get(connection.dialect.name)
+    if upsert is not None:
+        statement = upsert(table)
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c[key] for key in keys],
+            set_={
+                column: table.c[column] + statement.excluded[column]
+                for column in values
+            },
+        )
+        connection.execute(statement, params)
+        return
+
+    # no upsert support: update, then insert the rows that did not exist
+    for param in params:
+        result = connection.execute(
+            table.update()
+            .where(*(table.c[key] == param[key] for key in keys))
+            .values({column: table.c[column] + param[column] for column in values})
+        )
+        if result.rowcount == 0:
+            connection.execute(table.insert().values(**param))
+
+
+def loaded_value(transaction: Transaction, attribute: str):
+    """The value an attribute had when the transaction was loaded."""
+    history = inspect(transaction).attrs[attribute].load_history()
+    if history.deleted:
+        return history.deleted[0]
+    return getattr(transaction, attribute)
+
+
+def _flush_deltas(session: Session) -> Deltas:
+    """Per-budget deltas of the transaction changes pending in a session."""
+    deltas = defaultdict(lambda: [0.0, 0])
+
+    def add(budget_id: Optional[int], amount: float, count: int):
+        if budget_id is not None:
+            deltas[budget_id][0] += amount
+            deltas[budget_id][1] += count
+
+    for obj in session.new:
+        if isinstance(obj, Transaction):
+            add(obj.budget_id, obj.amount, 1)
+    for obj in session.deleted:
+        if isinstance(obj, Transaction):
+            add(loaded_value(obj, "budget_id"), -loaded_value(obj, "amount"), -1)
+    for obj in session.dirty:
+        if isinstance(obj, Transaction) and session.is_modified(obj):
+            old_budget_id = loaded_value(obj, "budget_id")
+            old_amount = loaded_value(obj, "amount")
+            if old_budget_id != obj.budget_id or old_amount != obj.amount:
+                add(old_budget_id, -old_amount, -1)
+                add(obj.budget_id, obj.amount, 1)
+    return {budget_id: tuple(delta) for budget_id, delta in deltas.items()}
+
+
+def _on_set(target, value, oldvalue, initiator):
+    """No-op; registered with active_history=True for its side effect."""
+
+
+# Load the replaced value on assignment, even when the attribute was expired,
+# so that updates can be turned into deltas
+for _attribute in (Transaction.amount, Transaction.budget_id):
+    event.listen(_attribute, "set", _on_set, active_history=True)
+
+
+@event.listens_for(Session, "before_flush")
+def _maintain_rollups(session: Session, flush_context, instances):
+    """Fold pending transaction changes into the rollups in the same flush."""
+    deltas = _flush_deltas(session)
+    if deltas:
+        apply_budget_deltas(session.connection(), deltas)
+
+
+def rebuild_budget_rollups(connection: Connection, budget_id: Optional[int] = None):
+    """Recompute rollups from the transaction history to reconcile drift."""
+    table = BudgetRollup.__table__
+    if budget_id is None:
+        connection.execute(delete(table))
+        condition = true()
+    else:
+        connection.execute(delete(table).where(table.c.budget_id == budget_id))
+        condition = Budget.budget_id == budget_id
+
+    totals = (
+        select(
+            Budget.budget_id,
+            func.coalesce(func.sum(Transaction.amount), 0.0),
+            func.count(Transaction.transaction_id),
+        )
+        .select_from(Budget)
+        .outerjoin(Transaction, Transaction.budget_id == Budget.budget_id)
+        .where(condition)
+        .group_by(Budget.budget_id)
+    )
+    result = connection.execute(
+        table.insert().from_select(["budget_id", "spent", "transaction_count"], totals)
+    )
+    LOGGER.info(f"Rebuilt {result.rowcount} budget rollups")
+    return result.rowcount
+
+
+def main():
+    # imported here as src.db.database imports this module
+    from src.db.database import engine
+
+    parser = argparse.ArgumentParser(description="Maintain budget spend rollups")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparser = subparsers.add_parser("rebuild", help="recompute from transactions")
+    subparser.add_argument("--budget-id", type=int)
+    args = parser.parse_args()
+
+    with engine.begin() as connection:
+        rebuild_budget_rollups(connection, args.budget_id)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,447 @@
+"""
+Transaction categorization rules
+
+Users map transaction descriptions, e.g. "AMZN MKTP US*2K4", to a category
+and optionally a budget with CategoryRule rows. A rule matches when the
+description contains, starts with or equals its pattern, compared without
+regard to case or runs of whitespace, or when its regular expression matches
+anywhere in the description. When several rules match, the one with the
+lowest priority wins, then the oldest.
+
+Trying every rule on every row does not scale to imports of thousands of
+rows against hundreds of rules, so each user's rules are compiled once into
+a RuleMatcher:
+
+- literal patterns go into an Aho-Corasick automaton that finds all of them
+  in a single pass over the description;
+- regular expressions are combined into one alternation in priority order,
+  run by a single `re.match` call, and only when one of them could beat the
+  best literal match.
+
+Matchers are cached per user and invalidated when a session commits changes
+to the user's rules, like the budget indexes of src.budget.assignment.
+
+Rules are applied by bulk imports, before budgets are assigned by date, and
+to the existing transactions by the re-categorize job:
+
+    python -m src.budget.rules recategorize
+"""
+
+import argparse
+import re
+from collections import defaultdict, deque
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from sqlalchemy import Connection, bindparam, event, select
+from sqlalchemy.orm import Session
+
+from src.budget.rollups import Deltas, apply_budget_deltas
+from src.models.db_models import CategoryRule, Transaction
+from src.utils.cache import PerUserCache
+from src.utils.shared import CONFIG, LOGGER
+
+MATCH_TYPES = ("contains", "prefix", "exact", "regex")
+
+DEFAULT_BATCH_SIZE = 10000
+
+# longer patterns are rejected, as is a repeated group containing a repeat,
+# e.g. (a+)+, which backtracks exponentially on a near miss
+MAX_PATTERN_LENGTH = 200
+
+# numbered back references and named groups would break once the patterns
+# are combined into one regex
+_UNSUPPORTED_REGEX = re.compile(r"\\[1-9]|\(\?P[<=]")
+
+_QUANTIFIER = re.compile(r"[*+]|\{(\d*)(,?)(\d*)\}")
+
+
+class RuleSpec(NamedTuple):
+    """The columns of a rule that decide what it matches and assigns"""
+
+    rule_id: int
+    pattern: str
+    match_type: str
+    category: Optional[str]
+    budget_id: Optional[int]
+    priority: int
+
+
+def _normalize(text: str) -> str:
+    """Upper-case a description or literal pattern and collapse whitespace."""
+    return " ".join(text.upper().split())
+
+
+def _regex_branch(pattern: str) -> str:
+    """A pattern as a zero-width branch of the combined regex, found anywhere."""
+    return rf"(?=[\s\S]*?(?:{pattern}))"
+
+
+def _repeats(quantifier: re.Match) -> bool:
+    """Whether a quantifier allows more than one repetition."""
+    low, comma, high = quantifier.groups()
+    if quantifier.group() in ("*", "+"):
+        return True
+    if comma:
+        return not high or int(high) > 1
+    return bool(low) and int(low) > 1
+
+
+def _has_nested_quantifier(pattern: str) -> bool:
+    """Whether a regular expression repeats a group that itself repeats."""
+    # whether each open group contains a repetition, the outermost first
+    groups = [False]
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == "\\":
+            i += 2
+        elif char == "[":
+            i += 2 if pattern.startswith("^", i + 1) else 1
+            # skips the first character, as a ] there is a literal
+            i += 2 if pattern[i] == "\\" else 1
+            while i < len(pattern) and pattern[i] != "]":
+                i += 2 if pattern[i] == "\\" else 1
+            i += 1
+        elif char == "(":
+            groups.append(False)
+            i += 1
+        elif char == ")" and len(groups) > 1:
+            inner = groups.pop()
+            quantifier = _QUANTIFIER.match(pattern, i + 1)
+            if inner and quantifier and _repeats(quantifier):
+                return True
+            groups[-1] = groups[-1] or inner
+            i += 1
+        else:
+            quantifier = _QUANTIFIER.match(pattern, i)
+            if quantifier:
+                groups[-1] = groups[-1] or _repeats(quantifier)
+                i = quantifier.end()
+            else:
+                i += 1
+    return False
+
+
+def validate_rule(pattern: str, match_type: str):
+    """Raise ValueError unless a rule can be compiled into a matcher."""
+    if match_type not in MATCH_TYPES:
+        raise ValueError(f"Unknown match type: {match_type!r}")
+    if not pattern.strip():
+        raise ValueError("Empty pattern")
+    if len(pattern) > MAX_PATTERN_LENGTH:
+        raise ValueError(f"Patterns are limited to {MAX_PATTERN_LENGTH} characters")
+    if match_type != "regex":
+        return
+    if _UNSUPPORTED_REGEX.search(pattern):
+        raise ValueError("Back references and named groups are not supported")
+    try:
+        re.compile(_regex_branch(pattern), re.IGNORECASE)
+    except re.error as e:
+        raise ValueError(f"Invalid regular expression: {e}")
+    if _has_nested_quantifier(pattern):
+        raise ValueError("Repeated groups cannot contain repetitions")
+
+
+class KeywordAutomaton:
+    """Aho-Corasick automaton finding all occurrences of a set of keywords"""
+
+    def __init__(self, keywords: Sequence[str]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # ids of the keywords ending at each node, including via fail links
+        self._out: List[Tuple[int, ...]] = [()]
+        for keyword_id, keyword in enumerate(keywords):
+            node = 0
+            for char in keyword:
+                child = self._goto[node].get(char)
+                if child is None:
+                    child = self._goto[node][char] = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(())
+                node = child
+            self._out[node] += (keyword_id,)
+
+        # breadth first, so that the fail target of a node is done before it
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fail = self._goto[fail].get(char, 0)
+                self._fail[child] = fail
+                self._out[child] += self._out[fail]
+
+    def find(self, text: str) -> Iterator[Tuple[int, int]]:
+        """Yield (end offset, keyword id) of every keyword occurrence."""
+        goto, fail, out = self._goto, self._fail, self._out
+        node = 0
+        for end, char in enumerate(text, 1):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            for keyword_id in out[node]:
+                yield end, keyword_id
+
+
+class RuleMatcher:
+    """The rules of one user, compiled to match a description in one pass"""
+
+    def __init__(self, rules: Sequence[RuleSpec]):
+        # best first: rules are referred to by their rank in this order
+        self.rules = sorted(rules, key=lambda rule: (rule.priority, rule.rule_id))
+        keywords: List[str] = []
+        self._keywords: List[Tuple[int, str, int]] = []  # rank, match type, length
+        branches: List[str] = []
+        self._first_regex_rank = len(self.rules)
+        for rank, rule in enumerate(self.rules):
+            if rule.match_type == "regex":
+                # the empty group after the lookahead tells which branch matched
+                branches.append(f"{_regex_branch(rule.pattern)}(?P<r{rank}>)")
+                self._first_regex_rank = min(self._first_regex_rank, rank)
+            else:
+                keyword = _normalize(rule.pattern)
+                keywords.append(keyword)
+                self._keywords.append((rank, rule.match_type, len(keyword)))
+        self._automaton = KeywordAutomaton(keywords)
+        self._regex = (
+            re.compile("|".join(branches), re.IGNORECASE) if branches else None
+        )
+
+    def match(self, description: str) -> Optional[RuleSpec]:
+        """The best rule matching a description, or None."""
+        if not self.rules:
+            return None
+        text = _normalize(description)
+        best = len(self.rules)
+        for end, keyword_id in self._automaton.find(text):
+            rank, match_type, length = self._keywords[keyword_id]
+            if rank < best and (
+                match_type == "contains"
+                or (end == length and (match_type == "prefix" or end == len(text)))
+            ):
+                best = rank
+        if self._first_regex_rank < best:
+            match = self._regex.match(description)
+            if match is not None:
+                best = min(best, int(match.lastgroup[1:]))
+        return self.rules[best] if best < len(self.rules) else None
+
+
+RULE_MATCHERS = PerUserCache(
+    max_size=CONFIG.rule_matcher_cache_size, ttl=CONFIG.rule_matcher_ttl_seconds
+)
+
+
+def load_rule_matchers(
+    connection: Connection, user_ids: Iterable[int]
+) -> Dict[int, RuleMatcher]:
+    """Compile the rules of users from the database."""
+    user_ids = set(user_ids)
+    rules = defaultdict(list)
+    result = connection.execute(
+        select(
+            CategoryRule.user_id,
+            CategoryRule.rule_id,
+            CategoryRule.pattern,
+            CategoryRule.match_type,
+            CategoryRule.category,
+            CategoryRule.budget_id,
+            CategoryRule.priority,
+        ).where(CategoryRule.user_id.in_(user_ids))
+    )
+    for user_id, *columns in result:
+        rules[user_id].append(RuleSpec(*columns))
+    return {user_id: RuleMatcher(rules[user_id]) for user_id in user_ids}
+
+
+def get_rule_matchers(
+    connection: Connection, user_ids: Iterable[int]
+) -> Dict[int, RuleMatcher]:
+    """The rule matchers of users, from the cache when possible."""
+    matchers, missing = {}, []
+    for user_id in set(user_ids):
+        matcher = RULE_MATCHERS.get(user_id)
+        if matcher is None:
+            missing.append(user_id)
+        else:
+            matchers[user_id] = matcher
+    if missing:
+        version = RULE_MATCHERS.version
+        for user_id, matcher in load_rule_matchers(connection, missing).items():
+            RULE_MATCHERS.put(user_id, matcher, version)
+            matchers[user_id] = matcher
+    return matchers
+
+
+def _match_all(connection: Connection, records: List[dict]) -> List[Optional[RuleSpec]]:
+    """The best rule of each record, matching each distinct description once."""
+    matchers = get_rule_matchers(connection, {record["user_id"] for record in records})
+    rules: Dict[Tuple[int, str], Optional[RuleSpec]] = {}
+    matched = []
+    for record in records:
+        key = (record["user_id"], record["description"])
+        if key not in rules:
+            rules[key] = matchers[record["user_id"]].match(record["description"])
+        matched.append(rules[key])
+    return matched
+
+
+def categorize(connection: Connection, records: List[dict]) -> int:
+    """
+    Set the category of transaction records from their user's rules, in
+    place, and the budget_id of those without one to their rule's budget.
+    Returns how many records matched a rule.
+    """
+    if not records:
+        return 0
+    count = 0
+    for record, rule in zip(records, _match_all(connection, records)):
+        if rule is None:
+            continue
+        count += 1
+        record["category"] = rule.category
+        if record["budget_id"] is None:
+            record["budget_id"] = rule.budget_id
+    return count
+
+
+def recategorize(
+    connection: Connection,
+    user_id: Optional[int] = None,
+    after_id: int = 0,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    reassign_budgets: bool = False,
+) -> Tuple[Optional[int], int]:
+    """
+    Re-apply the rules to the next batch of transactions with ids above
+    `after_id`: every category is recomputed, and transactions without a
+    budget that match a rule with one are assigned to it, as on import.
+    With `reassign_budgets`, transactions that have a budget move to their
+    rule's too. The rollups follow. Returns the last transaction_id scanned,
+    None once none are left, and how many changed.
+    """
+    statement = (
+        select(
+            Transaction.transaction_id,
+            Transaction.user_id,
+            Transaction.budget_id,
+            Transaction.category,
+            Transaction.description,
+            Transaction.amount,
+        )
+        .where(Transaction.transaction_id > after_id)
+        .order_by(Transaction.transaction_id)
+        .limit(batch_size)
+    )
+    if user_id is not None:
+        statement = statement.where(Transaction.user_id == user_id)
+    records = [row._asdict() for row in connection.execute(statement)]
+    if not records:
+        return None, 0
+
+    changes = []
+    deltas = defaultdict(lambda: [0.0, 0])
+    for record, rule in zip(records, _match_all(connection, records)):
+        category = rule.category if rule else None
+        budget_id = record["budget_id"]
+        if (
+            rule is not None
+            and rule.budget_id is not None
+            and (budget_id is None or reassign_budgets)
+        ):
+            budget_id = rule.budget_id
+        if category == record["category"] and budget_id == record["budget_id"]:
+            continue
+        changes.append(
+            {
+                "b_transaction_id": record["transaction_id"],
+                "b_category": category,
+                "b_budget_id": budget_id,
+            }
+        )
+        if budget_id != record["budget_id"]:
+            for moved, sign in ((record["budget_id"], -1), (budget_id, 1)):
+                if moved is not None:
+                    deltas[moved][0] += sign * record["amount"]
+                    deltas[moved][1] += sign
+
+    if changes:
+        table = Transaction.__table__
+        connection.execute(
+            table.update()
+            .where(table.c.transaction_id == bindparam("b_transaction_id"))
+            .values(
+                category=bindparam("b_category"), budget_id=bindparam("b_budget_id")
+            ),
+            changes,
+        )
+        budget_deltas: Deltas = {
+            budget_id: tuple(delta) for budget_id, delta in deltas.items()
+        }
+        apply_budget_deltas(connection, budget_deltas)
+    return records[-1]["transaction_id"], len(changes)
+
+
+@event.listens_for(Session, "after_flush")
+def _record_rule_writes(session: Session, flush_context):
+    """Remember whose rules a flush wrote and drop their matchers."""
+    written = session.info.setdefault("written_rule_user_ids", set())
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, CategoryRule) and obj.user_id is not None:
+            written.add(obj.user_id)
+            RULE_MATCHERS.invalidate(obj.user_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_written_rules(session: Session):
+    """Drop the matchers again, in case a lookup compiled them mid-transaction."""
+    for user_id in session.info.pop("written_rule_user_ids", ()):
+        RULE_MATCHERS.invalidate(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_written_rules(session: Session):
+    """Drop matchers that may have been compiled from the rolled back rules."""
+    for user_id in session.info.pop("written_rule_user_ids", ()):
+        RULE_MATCHERS.invalidate(user_id)
+
+
+def main():
+    # imported here as src.db.database imports this module
+    from src.db.database import engine
+
+    parser = argparse.ArgumentParser(description="Apply categorization rules")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparser = subparsers.add_parser(
+        "recategorize", help="re-apply the rules to the existing transactions"
+    )
+    subparser.add_argument("--user-id", type=int)
+    subparser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    subparser.add_argument(
+        "--reassign-budgets",
+        action="store_true",
+        help="also move transactions that have a budget to their rule's",
+    )
+    args = parser.parse_args()
+
+    after_id, total = 0, 0
+    while after_id is not None:
+        # one transaction per batch, so progress survives an interruption
+        with engine.begin() as connection:
+            after_id, changed = recategorize(
+                connection,
+                args.user_id,
+                after_id,
+                args.batch_size,
+                args.reassign_budgets,
+            )
+        total += changed
+    LOGGER.info(f"Recategorized {total} transactions")
+
+
+if __name__ == "__main__":
+    main()
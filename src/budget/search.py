@@ -0,0 +1,218 @@
+"""
+Transaction search
+
+Finds a user's transactions by the words of their description, newest
+first, optionally within an account and a date range, with keyset
+pagination. Every word of the query must match the start of a word of the
+description, so "starb" finds "STARBUCKS #123"; with fuzzy matching a word
+may also be misspelt.
+
+Descriptions are never scanned, each dialect answers from an index created
+by migration 0008:
+
+- Postgres: a GIN trigram index on (user_id, description), from the pg_trgm
+  and btree_gin extensions. Word prefixes are matched with `~* '\\mword'`
+  and misspellings by word similarity (`%>`), both served by the index.
+- SQLite: an FTS5 table, SQLite's built-in inverted index, kept in step with
+  the transaction table by triggers. The user_id is indexed as a token next
+  to the description, so a match only walks the user's rows. Word prefixes
+  are FTS5 prefix queries and misspellings are expanded to the indexed words
+  within a small edit distance. Those are read from the FTS5 vocabulary,
+  which is shared by all users, so only words with the same first letter
+  are considered, at most MAX_VOCABULARY_SCAN of them.
+
+Other dialects fall back to a substring scan.
+"""
+
+import re
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import Connection, and_, literal_column, or_, select, text
+
+from src.db.pagination import apply_keyset, encode_cursor
+from src.models.db_models import Transaction
+
+# at most this many words of a query are searched for
+MAX_TERMS = 8
+
+# at most this many indexed words stand in for a misspelt one
+MAX_FUZZY_TERMS = 20
+
+# at most this many indexed words are compared with a misspelt one
+MAX_VOCABULARY_SCAN = 5000
+
+FTS_TABLE = "transaction_fts"
+FTS_VOCAB_TABLE = "transaction_fts_vocab"
+TRIGRAM_INDEX = "ix_transaction_user_id_description_trgm"
+
+RESULT_COLUMNS = (
+    Transaction.transaction_id,
+    Transaction.account_id,
+    Transaction.budget_id,
+    Transaction.date,
+    Transaction.amount,
+    Transaction.description,
+    Transaction.category,
+)
+
+
+def is_search_object(name: Optional[str]) -> bool:
+    """
+    Whether a table or index is one of the search indexes, which migration
+    0008 creates by hand and autogenerate must leave alone.
+    """
+    return bool(name) and (name.startswith(FTS_TABLE) or name == TRIGRAM_INDEX)
+
+
+def parse_query(query: str) -> List[str]:
+    """The distinct lower-cased words of a query, or ValueError if none."""
+    terms = list(dict.fromkeys(re.findall(r"\w+", query.lower())))
+    if not terms:
+        raise ValueError("The query has no words to search for")
+    return terms[:MAX_TERMS]
+
+
+def max_edits(term: str) -> int:
+    """The number of typos tolerated in a word of this length."""
+    if len(term) < 4:
+        return 0
+    return 1 if len(term) < 8 else 2
+
+
+def within_edits(a: str, b: str, limit: int) -> bool:
+    """Whether the Levenshtein distance of two words is at most `limit`."""
+    if abs(len(a) - len(b)) > limit:
+        return False
+    previous = list(range(len(b) + 1))
+    for i, char in enumerate(a, 1):
+        current = [i]
+        for j, other in enumerate(b, 1):
+            current.append(
+                min(
+                    previous[j] + 1,
+                    current[j - 1] + 1,
+                    previous[j - 1] + (char != other),
+                )
+            )
+        if min(current) > limit:
+            return False
+        previous = current
+    return previous[-1] <= limit
+
+
+def _fuzzy_terms(connection: Connection, term: str) -> List[str]:
+    """
+    Indexed words within the tolerated edit distance of a term, among those
+    with the same first letter.
+    """
+    limit = max_edits(term)
+    if not limit:
+        return []
+    # the range on term is served by the vocabulary's index
+    result = connection.execute(
+        text(
+            f"SELECT term FROM {FTS_VOCAB_TABLE} "
+            "WHERE col = 'description' AND term >= :first AND term < :after "
+            "AND length(term) BETWEEN :shortest AND :longest LIMIT :scan"
+        ),
+        {
+            "first": term[0],
+            "after": chr(ord(term[0]) + 1),
+            "shortest": len(term) - limit,
+            "longest": len(term) + limit,
+            "scan": MAX_VOCABULARY_SCAN,
+        },
+    )
+    terms = [
+        word
+        for (word,) in result
+        if not word.startswith(term) and within_edits(term, word, limit)
+    ]
+    return terms[:MAX_FUZZY_TERMS]
+
+
+def _fts_condition(connection: Connection, user_id: int, terms: List[str], fuzzy: bool):
+    # words are \w+ only, so they can be quoted as FTS5 strings as is
+    clauses = []
+    for term in terms:
+        options = [f'"{term}"*']
+        if fuzzy:
+            options += [f'"{word}"' for word in _fuzzy_terms(connection, term)]
+        clauses.append(f"({' OR '.join(options)})")
+    matching = (
+        select(literal_column("rowid"))
+        .select_from(text(FTS_TABLE))
+        .where(
+            text(f"{FTS_TABLE} MATCH :match").bindparams(
+                match=f'user_id : "{int(user_id)}" AND description : '
+                f"({' AND '.join(clauses)})"
+            )
+        )
+    )
+    return Transaction.transaction_id.in_(matching)
+
+
+def _trigram_condition(terms: List[str], fuzzy: bool):
+    clauses = []
+    for term in terms:
+        # \m is the start of a word in Postgres regular expressions
+        clause = Transaction.description.regexp_match(rf"\m{term}", flags="i")
+        if fuzzy:
+            clause = or_(clause, Transaction.description.op("%>")(term))
+        clauses.append(clause)
+    return and_(*clauses)
+
+
+def match_condition(
+    connection: Connection, user_id: int, terms: List[str], fuzzy: bool = False
+):
+    """
+    The WHERE clause matching the user's transactions whose description
+    contains all the terms.
+    """
+    dialect = connection.dialect.name
+    if dialect == "sqlite":
+        return _fts_condition(connection, user_id, terms, fuzzy)
+    if dialect == "postgresql":
+        return _trigram_condition(terms, fuzzy)
+    return and_(*(Transaction.description.ilike(f"%{term}%") for term in terms))
+
+
+def search_transactions(
+    connection: Connection,
+    user_id: int,
+    query: str,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    fuzzy: bool = False,
+    account_id: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> dict:
+    """
+    A page of the user's transactions matching a query, newest first, in
+    [start, end), with the cursor of the next page. Raises ValueError for a
+    query without words and InvalidCursorError for a bad cursor.
+    """
+    terms = parse_query(query)
+    statement = select(*RESULT_COLUMNS).where(
+        Transaction.user_id == user_id,
+        match_condition(connection, user_id, terms, fuzzy),
+    )
+    if account_id is not None:
+        statement = statement.where(Transaction.account_id == account_id)
+    if start is not None:
+        statement = statement.where(Transaction.date >= start)
+    if end is not None:
+        statement = statement.where(Transaction.date < end)
+
+    key_columns = [Transaction.date, Transaction.transaction_id]
+    statement = apply_keyset(statement, key_columns, cursor, descending=True)
+    rows = connection.execute(statement.limit(limit + 1)).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor([last.date, last.transaction_id])
+    return {"items": [row._asdict() for row in rows], "next_cursor": next_cursor}
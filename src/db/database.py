@@ -1,17 +1,151 @@
 """
 Contains the database connection and the session maker.
+
+The synchronous engine serves scripts, tests and startup tasks. Request
+handlers use the async engine so waiting on the database does not hold a
+threadpool thread. Read-only handlers may be served by read replicas, see
+src.db.replicas.
 """
 
+from fastapi import Depends, Request
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import InterfaceError, OperationalError
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from sqlmodel import Session, create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
 
+import src.auth.user_cache  # noqa: F401  registers the cache invalidation hooks
+import src.budget.assignment  # noqa: F401  registers the budget assignment hook
+import src.budget.balances  # noqa: F401  registers the checkpoint maintenance hook
+import src.budget.rollups  # noqa: F401  registers the rollup maintenance hook
+import src.budget.rules  # noqa: F401  registers the rule cache invalidation hooks
+from src.db.pool import PoolStats, instrumented_pool_class
+from src.db.replicas import Replica, ReplicaSet, pinned_to_primary
+from src.db.tracing import SQLTracer, install_db_usage
 from src.utils.shared import CONFIG
 
+# async drivers to use for each sync database backend
+ASYNC_DRIVERS = {"postgresql": "asyncpg", "sqlite": "aiosqlite"}
+
+
+def to_async_url(url: str) -> str:
+    """Swap the driver of a database URL for its async counterpart."""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for {backend} databases")
+    return parsed.set(
+        drivername=f"{backend}+{ASYNC_DRIVERS[backend]}"
+    ).render_as_string(hide_password=False)
+
+
+def pool_options(url: str, base_pool: type, stats: PoolStats) -> dict:
+    """Engine keyword arguments for a tuned, instrumented connection pool."""
+    options = {
+        "pool_pre_ping": CONFIG.db_pool_pre_ping,
+        "pool_recycle": CONFIG.db_pool_recycle,
+    }
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite" and parsed.database in (
+        None,
+        "",
+        ":memory:",
+    ):
+        # in-memory SQLite keeps its single-connection default pool
+        return options
+    options.update(
+        {
+            "poolclass": instrumented_pool_class(base_pool, stats),
+            "pool_size": CONFIG.db_pool_size,
+            "max_overflow": CONFIG.db_max_overflow,
+            "pool_timeout": CONFIG.db_pool_timeout,
+        }
+    )
+    return options
+
+
 # create database engine
 DATABASE_URL = CONFIG.database_url
-engine = create_engine(url=DATABASE_URL, echo=True)
+POOL_STATS = PoolStats("sync")
+engine = create_engine(
+    url=DATABASE_URL, **pool_options(DATABASE_URL, QueuePool, POOL_STATS)
+)
+
+# create async database engine
+ASYNC_DATABASE_URL = CONFIG.async_database_url or to_async_url(DATABASE_URL)
+ASYNC_POOL_STATS = PoolStats("async")
+async_engine = create_async_engine(
+    url=ASYNC_DATABASE_URL,
+    **pool_options(ASYNC_DATABASE_URL, AsyncAdaptedQueuePool, ASYNC_POOL_STATS),
+)
+
+# per-request statement counts and database time, exported on /metrics
+install_db_usage(engine)
+install_db_usage(async_engine.sync_engine)
+
+# SQL tracing is off by default; when off no engine events are registered
+SQL_TRACER = SQLTracer(
+    sample_percent=CONFIG.sql_trace_sample_percent,
+    slow_query_ms=CONFIG.sql_slow_query_ms,
+)
+if CONFIG.sql_trace_enabled:
+    SQL_TRACER.install(engine)
+    SQL_TRACER.install(async_engine.sync_engine)
+
+
+def create_replica(url: str, number: int) -> Replica:
+    """An instrumented async engine on a read replica."""
+    async_url = to_async_url(url)
+    stats = PoolStats(f"replica {number}")
+    replica_engine = create_async_engine(
+        url=async_url, **pool_options(async_url, AsyncAdaptedQueuePool, stats)
+    )
+    install_db_usage(replica_engine.sync_engine)
+    if CONFIG.sql_trace_enabled:
+        SQL_TRACER.install(replica_engine.sync_engine)
+    return Replica(url, replica_engine, stats)
+
+
+# read replicas, none unless DATABASE_REPLICA_URLS is set
+REPLICAS = ReplicaSet(
+    [
+        create_replica(url, number)
+        for number, url in enumerate(CONFIG.database_replica_urls, 1)
+    ],
+    check_interval=CONFIG.db_replica_check_seconds,
+    check_timeout=CONFIG.db_replica_check_timeout,
+)
 
 
 def get_db():
     """Get a database connection."""
     with Session(engine) as session:
         yield session
+
+
+async def get_async_db():
+    """Get an async database connection."""
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        yield session
+
+
+async def get_async_read_db(
+    request: Request, primary: AsyncSession = Depends(get_async_db)
+):
+    """
+    Get an async database connection for reads only: to a healthy replica,
+    or to the primary when there is none or the client wrote recently. The
+    primary session does not connect unless it is used.
+    """
+    replica = None if pinned_to_primary(request.cookies) else REPLICAS.choose()
+    if replica is None:
+        yield primary
+        return
+
+    async with AsyncSession(replica.engine, expire_on_commit=False) as session:
+        try:
+            yield session
+        except (OperationalError, InterfaceError) as e:
+            replica.mark_down(f"request failed: {e.orig!r}")
+            raise
@@ -0,0 +1,145 @@
+"""
+Schema migrations
+
+Thin wrapper around Alembic (configured in alembic.ini and migrations/) plus
+the schema-version check run at startup. Workers no longer create or reflect
+tables when they boot; the schema is migrated ahead of a deploy with:
+
+    python -m src.db.migrate upgrade
+    python -m src.db.migrate revision -m "add foo" --autogenerate
+"""
+
+import argparse
+from functools import lru_cache
+from typing import Optional
+
+from alembic import command
+from alembic.config import Config as AlembicConfig
+from alembic.script import ScriptDirectory
+from alembic.script.revision import RevisionError
+from alembic.util import CommandError
+from sqlalchemy import exc, text
+from sqlalchemy.engine import Engine
+
+from src.utils.shared import LOGGER, ROOT_DIR
+
+
+class SchemaVersionError(RuntimeError):
+    """Raised when the database schema is not at the version the code expects"""
+
+
+def alembic_config(url: Optional[str] = None) -> AlembicConfig:
+    """Load alembic.ini, optionally pointing it at another database URL."""
+    config = AlembicConfig(str(ROOT_DIR / "alembic.ini"))
+    if url is not None:
+        config.set_main_option("sqlalchemy.url", url.replace("%", "%%"))
+    return config
+
+
+@lru_cache(maxsize=1)
+def script_directory() -> ScriptDirectory:
+    """The migration scripts shipped with the code."""
+    return ScriptDirectory.from_config(alembic_config())
+
+
+def head_revision() -> str:
+    """The revision the code expects the database to be at, at least."""
+    return script_directory().get_current_head()
+
+
+def schema_is_compatible(current: Optional[str]) -> bool:
+    """
+    Whether code at the head revision can run on a database at `current`:
+    the head itself or a later revision. A revision the code does not know
+    is taken for a later one, migrated by newer code ahead of its deploy,
+    while workers of the old code are still being recycled.
+    """
+    if current is None:
+        return False
+    expected = head_revision()
+    if current == expected:
+        return True
+    script = script_directory()
+    try:
+        script.get_revision(current)
+    except (CommandError, RevisionError):
+        LOGGER.warning(
+            f"Database schema is at revision {current}, unknown to this code "
+            f"at {expected}; assuming it is newer"
+        )
+        return True
+    # the head must be an ancestor of the database's revision, otherwise the
+    # database is behind or on another branch
+    ancestors = {
+        revision.revision for revision in script.walk_revisions("base", current)
+    }
+    return expected in ancestors
+
+
+def check_schema_version(bind: Engine):
+    """
+    Fail fast unless the database is at the head revision or a later one.
+    Costs one query.
+    """
+    try:
+        with bind.connect() as connection:
+            current = connection.execute(
+                text("SELECT version_num FROM alembic_version")
+            ).scalar()
+    except exc.DBAPIError:
+        current = None
+
+    if not schema_is_compatible(current):
+        raise SchemaVersionError(
+            f"Database schema is at revision {current}, expected "
+            f"{head_revision()} or later. Run `python -m src.db.migrate upgrade` "
+            "first."
+        )
+    LOGGER.info(f"Database schema is at revision {current}")
+
+
+def upgrade(url: Optional[str] = None, revision: str = "head"):
+    """Migrate the database up to `revision`."""
+    command.upgrade(alembic_config(url), revision)
+
+
+def downgrade(url: Optional[str] = None, revision: str = "base"):
+    """Migrate the database down to `revision`."""
+    command.downgrade(alembic_config(url), revision)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage database schema migrations")
+    parser.add_argument("--url", help="database URL, defaults to DATABASE_URL")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparser = subparsers.add_parser("upgrade", help="migrate up")
+    subparser.add_argument("revision", nargs="?", default="head")
+    subparser = subparsers.add_parser("downgrade", help="migrate down")
+    subparser.add_argument("revision")
+    subparser = subparsers.add_parser("stamp", help="set the revision, no SQL")
+    subparser.add_argument("revision")
+    subparsers.add_parser("current", help="show the current revision")
+    subparsers.add_parser("history", help="list the revisions")
+    subparser = subparsers.add_parser("revision", help="create a new revision")
+    subparser.add_argument("-m", "--message", required=True)
+    subparser.add_argument("--autogenerate", action="store_true")
+    args = parser.parse_args()
+
+    config = alembic_config(args.url)
+    if args.command == "upgrade":
+        command.upgrade(config, args.revision)
+    elif args.command == "downgrade":
+        command.downgrade(config, args.revision)
+    elif args.command == "stamp":
+        command.stamp(config, args.revision)
+    elif args.command == "current":
+        command.current(config, verbose=True)
+    elif args.command == "history":
+        command.history(config)
+    elif args.command == "revision":
+        command.revision(config, message=args.message, autogenerate=args.autogenerate)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Keyset (cursor) pagination helpers
+
+Instead of OFFSET, which rescans every skipped row, each page continues from
+the sort key of the last row of the previous page. The cursor handed to the
+client is an opaque, URL-safe encoding of that sort key.
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Sequence
+
+from sqlalchemy import DateTime, tuple_
+
+# types a sort key value may decode to
+SCALARS = (str, int, float)
+
+# JSON numbers without a fraction decode to int
+_PYTHON_TYPES = {float: (int, float)}
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a pagination cursor cannot be decoded"""
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Encode the sort key of the last row of a page into an opaque cursor."""
+    raw = json.dumps(
+        list(values), separators=(",", ":"), default=datetime.isoformat
+    ).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    """Decode a cursor back into a sort key with `size` values."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except ValueError as e:
+        raise InvalidCursorError(f"Malformed cursor: {cursor}") from e
+    if not isinstance(values, list) or len(values) != size:
+        raise InvalidCursorError(f"Malformed cursor: {cursor}")
+    # only scalars can be bound; anything else would fail in the database
+    if not all(value is None or isinstance(value, SCALARS) for value in values):
+        raise InvalidCursorError(f"Malformed cursor: {cursor}")
+    return values
+
+
+def _cursor_value(column, value: Any) -> Any:
+    """
+    A decoded cursor value as the type of its column, or InvalidCursorError
+    when it is not one, e.g. a number for a string column.
+    """
+    if value is None:
+        return value
+    # datetimes are encoded as ISO 8601 strings
+    if isinstance(column.type, DateTime):
+        if not isinstance(value, str):
+            raise InvalidCursorError(f"Expected a datetime for {column.key}")
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError as e:
+            raise InvalidCursorError(f"Expected a datetime for {column.key}") from e
+    # type decorators such as SQLModel's AutoString defer to the type they wrap
+    column_type = getattr(column.type, "impl_instance", column.type)
+    try:
+        python_type = column_type.python_type
+    except NotImplementedError:
+        return value
+    expected = _PYTHON_TYPES.get(python_type, python_type)
+    # bool is an int, but never a sort key
+    if isinstance(value, bool) or not isinstance(value, expected):
+        raise InvalidCursorError(f"Expected a {python_type.__name__} for {column.key}")
+    return value
+
+
+def apply_keyset(statement, columns: Sequence, cursor: str = None, descending=False):
+    """
+    Order a select by `columns` and, given a cursor, continue after it.
+
+    The last column must be unique (usually the primary key) so that the
+    ordering is total and no row is skipped or repeated between pages.
+    """
+    if cursor is not None:
+        values = [
+            _cursor_value(column, value)
+            for column, value in zip(columns, decode_cursor(cursor, len(columns)))
+        ]
+        key = tuple_(*columns) if len(columns) > 1 else columns[0]
+        bound = tuple_(*values) if len(columns) > 1 else values[0]
+        statement = statement.where(key < bound if descending else key > bound)
+    order_by = [column.desc() if descending else column.asc() for column in columns]
+    return statement.order_by(*order_by)
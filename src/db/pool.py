@@ -0,0 +1,105 @@
+"""
+Connection pool instrumentation
+
+Pools are built from an instrumented subclass of the SQLAlchemy pool class
+that times every checkout, so pool exhaustion shows up as wait time and
+timeout counters instead of only as failed requests.
+"""
+
+import threading
+import time
+
+from sqlalchemy import exc
+from sqlalchemy.pool import Pool
+
+from src.utils.shared import CONFIG, LOGGER
+
+
+class PoolStats:
+    """Checkout counters of a single connection pool"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.slow_wait = CONFIG.db_pool_slow_wait_ms / 1000
+        self._lock = threading.Lock()
+        self.pool = None  # the live pool, set on every checkout
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record_checkout(self, pool: Pool, wait: float):
+        """Count a successful checkout and how long it waited."""
+        with self._lock:
+            self.pool = pool
+            self.checkouts += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+        if wait >= self.slow_wait:
+            LOGGER.warning(
+                f"Waited {wait * 1000:.1f} ms for a {self.name} database connection "
+                f"({pool.status()})"
+            )
+
+    def record_timeout(self, pool: Pool, wait: float):
+        """Count a checkout that gave up waiting for a connection."""
+        with self._lock:
+            self.pool = pool
+            self.timeouts += 1
+        LOGGER.error(
+            f"Timed out after {wait * 1000:.1f} ms waiting for a {self.name} "
+            f"database connection ({pool.status()})"
+        )
+
+    def snapshot(self) -> dict:
+        """Return the counters along with the live pool occupancy."""
+        with self._lock:
+            stats = {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "avg_wait_ms": (
+                    self.total_wait / self.checkouts * 1000 if self.checkouts else 0.0
+                ),
+                "max_wait_ms": self.max_wait * 1000,
+            }
+            pool = self.pool
+        if pool is not None and hasattr(pool, "checkedout"):
+            stats.update(
+                {
+                    "size": pool.size(),
+                    "checked_in": pool.checkedin(),
+                    "checked_out": pool.checkedout(),
+                    "overflow": pool.overflow(),
+                }
+            )
+        return stats
+
+
+class _InstrumentedPoolMixin:
+    """Time connection checkouts of the pool class it is mixed into"""
+
+    stats: PoolStats
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.stats.record_timeout(self, time.perf_counter() - started)
+            raise
+        self.stats.record_checkout(self, time.perf_counter() - started)
+        return connection
+
+
+def instrumented_pool_class(base: type, stats: PoolStats) -> type:
+    """
+    Build a pool class that reports to `stats`.
+
+    The stats live on the class rather than the instance because SQLAlchemy
+    recreates pools (e.g. after invalidation) from their class alone.
+    """
+    return type(
+        f"Instrumented{base.__name__}",
+        (_InstrumentedPoolMixin, base),
+        {"stats": stats},
+    )
@@ -0,0 +1,146 @@
+"""
+Read replica routing
+
+Read-only endpoints get their session from get_async_read_db, which spreads
+them round-robin over the healthy replicas in DATABASE_REPLICA_URLS and
+falls back to the primary when there is none. Replicas are health checked
+with `SELECT 1` in the background every DB_REPLICA_CHECK_SECONDS, without
+holding up requests, and taken out of rotation as soon as a request fails to
+reach them.
+
+Replicas lag behind the primary, so a client that just wrote would not see
+its own write. After every successful write request the client gets a
+short-lived cookie, and while it holds it its reads go to the primary. The
+cookie, rather than process memory, carries the pin so that it holds
+whichever worker serves the next request.
+"""
+
+import asyncio
+import itertools
+import time
+from typing import List, Mapping, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from src.db.pool import PoolStats
+from src.utils.shared import LOGGER
+
+# set on the responses to writes; holds the time until which to read from the
+# primary, as seconds since the epoch
+PRIMARY_COOKIE = "db_primary_until"
+
+
+def primary_cookie(window: float) -> bytes:
+    """Set-Cookie value pinning the client's reads to the primary."""
+    until = time.time() + window
+    return (
+        f"{PRIMARY_COOKIE}={until:.3f}; Max-Age={int(window) or 1}; Path=/; "
+        "HttpOnly; SameSite=Lax"
+    ).encode("latin-1")
+
+
+def pinned_to_primary(cookies: Mapping[str, str]) -> bool:
+    """Whether the request's cookies pin its reads to the primary."""
+    try:
+        return float(cookies.get(PRIMARY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+class Replica:
+    """A replica database, its engine and its health"""
+
+    def __init__(self, url: str, engine: AsyncEngine, pool_stats: PoolStats):
+        self.name = make_url(url).render_as_string(hide_password=True)
+        self.engine = engine
+        self.pool_stats = pool_stats
+        self.healthy = True  # until a check or a request says otherwise
+        self.failures = 0
+        self.last_error: Optional[str] = None
+
+    def mark_down(self, reason: str):
+        """Take the replica out of rotation until it passes a health check."""
+        self.failures += 1
+        self.last_error = reason
+        if self.healthy:
+            LOGGER.warning(f"Replica {self.name} is down: {reason}")
+            self.healthy = False
+
+    def mark_up(self):
+        if not self.healthy:
+            LOGGER.info(f"Replica {self.name} is back up")
+            self.healthy = True
+
+
+class ReplicaSet:
+    """Round-robin over the healthy replicas, with background health checks"""
+
+    def __init__(
+        self,
+        replicas: List[Replica],
+        check_interval: float = 5.0,
+        check_timeout: float = 2.0,
+    ):
+        self.replicas = replicas
+        self.check_interval = check_interval
+        self.check_timeout = check_timeout
+        self._next = itertools.count()
+        self._checked_at = time.monotonic()
+        self._check_task: Optional[asyncio.Task] = None
+
+    def choose(self) -> Optional[Replica]:
+        """
+        The next healthy replica, or None to use the primary. Must be called
+        from the event loop, which runs the health checks when they are due.
+        """
+        self._schedule_check()
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            return None
+        return healthy[next(self._next) % len(healthy)]
+
+    def _schedule_check(self):
+        if not self.replicas or (
+            self._check_task is not None and not self._check_task.done()
+        ):
+            return
+        if time.monotonic() - self._checked_at < self.check_interval:
+            return
+        self._checked_at = time.monotonic()
+        self._check_task = asyncio.get_running_loop().create_task(self.check())
+
+    async def check(self):
+        """Health check every replica."""
+        await asyncio.gather(*(self._check(replica) for replica in self.replicas))
+
+    async def _check(self, replica: Replica):
+        async def ping():
+            async with replica.engine.connect() as connection:
+                await connection.execute(text("SELECT 1"))
+
+        try:
+            await asyncio.wait_for(ping(), self.check_timeout)
+        except Exception as e:
+            replica.mark_down(f"health check failed: {e!r}")
+        else:
+            replica.mark_up()
+
+    async def dispose(self):
+        """Close the connections of every replica."""
+        for replica in self.replicas:
+            await replica.engine.dispose()
+
+    def stats(self) -> List[dict]:
+        """Health and pool counters of every replica."""
+        return [
+            {
+                "name": replica.name,
+                "healthy": replica.healthy,
+                "failures": replica.failures,
+                "last_error": replica.last_error,
+                "pool": replica.pool_stats.snapshot(),
+            }
+            for replica in self.replicas
+        ]
@@ -0,0 +1,183 @@
+"""
+SQL tracing and slow-query log
+
+Replaces `echo=True`, which logged every statement synchronously. Once
+installed on an engine, every statement is timed and folded into
+per-fingerprint aggregates; only a sampled fraction is logged, plus every
+statement slower than the threshold, together with the route that issued it.
+"""
+
+import random
+import re
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+from typing import Deque, Dict
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from src.utils.request_context import CURRENT_ROUTE, REQUEST_DB_USAGE
+from src.utils.shared import LOGGER
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+_PLACEHOLDER = re.compile(r"%\(\w+\)s|%s|(?<!:):\w+|\$\d+|\?")
+
+
+@lru_cache(maxsize=2048)
+def fingerprint(statement: str) -> str:
+    """
+    Normalize a statement so that executions differing only in literals,
+    placeholder style or IN-list length are aggregated together.
+    """
+    normalized = _STRING_LITERAL.sub("?", statement)
+    normalized = _PLACEHOLDER.sub("?", normalized)
+    normalized = _NUMBER_LITERAL.sub("?", normalized)
+    normalized = _PLACEHOLDER_LIST.sub("(?+)", normalized)
+    return _WHITESPACE.sub(" ", normalized).strip()
+
+
+class _StatementStats:
+    """Aggregates for a single statement fingerprint"""
+
+    __slots__ = ("count", "total", "max", "samples")
+
+    def __init__(self, max_samples: int):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        # most recent durations, for percentiles
+        self.samples: Deque[float] = deque(maxlen=max_samples)
+
+    def add(self, elapsed: float):
+        self.count += 1
+        self.total += elapsed
+        self.max = max(self.max, elapsed)
+        self.samples.append(elapsed)
+
+    def p95(self) -> float:
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+
+class SQLTracer:
+    """
+    Time statements on the engines it is installed on.
+
+    `sample_percent` of statements are logged at INFO; statements taking at
+    least `slow_query_ms` are always logged at WARNING and kept in a ring of
+    recent slow queries.
+    """
+
+    # fingerprints beyond this many are aggregated under a single bucket
+    OTHER = "<other>"
+
+    def __init__(
+        self,
+        sample_percent: float = 0.0,
+        slow_query_ms: float = 500.0,
+        max_fingerprints: int = 1000,
+        max_samples: int = 512,
+        max_slow_queries: int = 100,
+    ):
+        self.sample_rate = sample_percent / 100
+        self.slow_threshold = slow_query_ms / 1000
+        self.max_fingerprints = max_fingerprints
+        self.max_samples = max_samples
+        self._lock = threading.Lock()
+        self._stats: Dict[str, _StatementStats] = {}
+        self._slow_queries: Deque[dict] = deque(maxlen=max_slow_queries)
+
+    def install(self, engine: Engine):
+        """Listen to statement execution on a (sync) engine."""
+        event.listen(engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", self._after_cursor_execute)
+
+    def _before_cursor_execute(
+        self, conn, cursor, statement, parameters, context, executemany
+    ):
+        context._trace_start = time.perf_counter()
+
+    def _after_cursor_execute(
+        self, conn, cursor, statement, parameters, context, executemany
+    ):
+        elapsed = time.perf_counter() - context._trace_start
+        self.record(statement, elapsed)
+
+    def record(self, statement: str, elapsed: float):
+        """
+        Fold a statement execution into the aggregates and log it if due.
+        Bound parameters are never logged: they hold user data and password
+        hashes, and a bulk insert's can be thousands of rows.
+        """
+        key = fingerprint(statement)
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                if len(self._stats) >= self.max_fingerprints:
+                    key = self.OTHER
+                stats = self._stats.setdefault(key, _StatementStats(self.max_samples))
+            stats.add(elapsed)
+
+        elapsed_ms = elapsed * 1000
+        route = CURRENT_ROUTE.get()
+        if elapsed >= self.slow_threshold:
+            self._slow_queries.append(
+                {
+                    "statement": statement,
+                    "elapsed_ms": elapsed_ms,
+                    "route": route,
+                    "at": time.time(),
+                }
+            )
+            LOGGER.warning(f"Slow query ({elapsed_ms:.1f} ms) in {route}: {statement}")
+        elif self.sample_rate and random.random() < self.sample_rate:
+            LOGGER.info(f"SQL ({elapsed_ms:.1f} ms) in {route}: {statement}")
+
+    def dump(self) -> dict:
+        """Return per-fingerprint aggregates, costliest first, and slow queries."""
+        with self._lock:
+            statements = [
+                {
+                    "fingerprint": key,
+                    "count": stats.count,
+                    "total_ms": stats.total * 1000,
+                    "avg_ms": stats.total / stats.count * 1000,
+                    "p95_ms": stats.p95() * 1000,
+                    "max_ms": stats.max * 1000,
+                }
+                for key, stats in self._stats.items()
+            ]
+            slow_queries = list(self._slow_queries)
+        statements.sort(key=lambda s: s["total_ms"], reverse=True)
+        return {"statements": statements, "slow_queries": slow_queries}
+
+    def reset(self):
+        """Drop all aggregates and slow queries."""
+        with self._lock:
+            self._stats.clear()
+            self._slow_queries.clear()
+
+
+def _before_usage(conn, cursor, statement, parameters, context, executemany):
+    context._usage_start = time.perf_counter()
+
+
+def _after_usage(conn, cursor, statement, parameters, context, executemany):
+    usage = REQUEST_DB_USAGE.get()
+    if usage is not None:
+        usage.statements += 1
+        usage.seconds += time.perf_counter() - context._usage_start
+
+
+def install_db_usage(engine: Engine):
+    """
+    Count the statements and database time of the request being served (see
+    src.api.metrics). Two clock reads per statement, cheap enough to stay on.
+    """
+    event.listen(engine, "before_cursor_execute", _before_usage)
+    event.listen(engine, "after_cursor_execute", _after_usage)
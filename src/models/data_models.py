@@ -2,6 +2,9 @@
 Data models
 """
 
+from datetime import date, datetime
+from typing import Dict, List, Literal, Optional
+
 from pydantic import BaseModel, EmailStr, StringConstraints
 from typing_extensions import Annotated
 
@@ -27,3 +30,171 @@ class LoginData(BaseModel):
 
     username: str
     password: str
+
+
+class Token(BaseModel):
+    """Access token returned on login"""
+
+    access_token: str
+    token_type: str = "bearer"
+
+
+class UserPage(BaseModel):
+    """A page of users with the cursor of the next page, if any"""
+
+    items: List[UserResponse]
+    next_cursor: Optional[str] = None
+
+
+class ImportRowError(BaseModel):
+    """A statement row that was rejected during an import"""
+
+    row: int
+    error: str
+
+
+class ImportResult(BaseModel):
+    """Outcome of a bulk statement import"""
+
+    inserted: int = 0
+    failed: int = 0
+    errors: List[ImportRowError] = []
+
+
+class BudgetStatus(BaseModel):
+    """
+    Budget model with the amount spent so far; for a recurring budget, in the
+    current [period_start, period_end) only
+    """
+
+    budget_id: int
+    name: str
+    amount: float
+    start_date: datetime
+    end_date: datetime
+    recurrence: Optional[str] = None
+    period_start: Optional[datetime] = None
+    period_end: Optional[datetime] = None
+    spent: float
+    remaining: float
+    transaction_count: int
+
+
+class SpendingPeriod(BaseModel):
+    """Spending in one month or week of a report"""
+
+    period: date
+    total: float
+    count: int
+    running_average: float
+    change: Optional[float] = None
+    change_pct: Optional[float] = None
+
+
+class BudgetSpending(BaseModel):
+    """Spending assigned to one budget, or to none"""
+
+    budget_id: Optional[int] = None
+    total: float
+    count: int
+
+
+class CategoryRuleCreate(BaseModel):
+    """Categorization rule to add; the lowest matching priority wins"""
+
+    pattern: Annotated[str, StringConstraints(min_length=1, max_length=200)]
+    match_type: Literal["contains", "prefix", "exact", "regex"] = "contains"
+    category: Optional[str] = None
+    budget_id: Optional[int] = None
+    priority: int = 0
+
+
+class CategoryRuleResponse(CategoryRuleCreate):
+    """Categorization rule of a user"""
+
+    rule_id: int
+
+
+class RecategorizeResult(BaseModel):
+    """Outcome of re-applying a user's categorization rules"""
+
+    updated: int = 0
+
+
+class TransactionResponse(BaseModel):
+    """Transaction of a user"""
+
+    transaction_id: int
+    account_id: Optional[int] = None
+    budget_id: Optional[int] = None
+    date: datetime
+    amount: float
+    description: Optional[str] = None
+    category: Optional[str] = None
+
+
+class TransactionSearchPage(BaseModel):
+    """A page of matching transactions, newest first, with the next page's cursor"""
+
+    items: List[TransactionResponse]
+    next_cursor: Optional[str] = None
+
+
+class LoyaltyEntryCreate(BaseModel):
+    """Loyalty points ledger entry to post; points are signed only for adjustments"""
+
+    entry_type: Literal["earn", "redeem", "adjust", "expire"]
+    points: int
+    description: Optional[str] = None
+
+
+class LoyaltyEntryResponse(BaseModel):
+    """Loyalty points ledger entry with its signed points"""
+
+    entry_id: int
+    entry_type: str
+    points: int
+    date: datetime
+    description: Optional[str] = None
+
+
+class LoyaltyEntryPage(BaseModel):
+    """A page of ledger entries, newest first, with the cursor of the next page"""
+
+    items: List[LoyaltyEntryResponse]
+    next_cursor: Optional[str] = None
+
+
+class LoyaltyBalance(BaseModel):
+    """Points balance of a loyalty program, now or as of a date"""
+
+    loyalty_id: int
+    points: int
+    as_of: Optional[datetime] = None
+
+
+class LoyaltySummary(BaseModel):
+    """Net points per entry type posted in a period"""
+
+    loyalty_id: int
+    start: Optional[datetime] = None
+    end: Optional[datetime] = None
+    totals: Dict[str, int]
+
+
+class AccountBalance(BaseModel):
+    """Balance of an account from its transactions, now or as of a date"""
+
+    account_id: int
+    balance: float
+    balance_minor: int  # exact, in minor units such as cents
+    as_of: Optional[datetime] = None
+
+
+class MonthlyBalance(BaseModel):
+    """Net change and closing balance of an account in one month, in minor units"""
+
+    month: date
+    change_minor: int
+    balance_minor: int
+    transaction_count: int
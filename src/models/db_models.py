@@ -7,6 +7,7 @@ from typing import List, Optional
 
 from passlib.context import CryptContext
 from pydantic import StringConstraints
+from sqlalchemy import BigInteger, Index
 from sqlmodel import Field, Relationship, SQLModel
 from typing_extensions import Annotated
 
@@ -18,8 +19,8 @@ class User(SQLModel, table=True):
     """User model with fields for user information and relationships to other models."""
 
     user_id: Optional[int] = Field(default=None, primary_key=True)
-    username: Annotated[str, StringConstraints(min_length=3, max_length=50)]
-    email: str  # use str for SQLModel
+    username: str = Field(unique=True, index=True, min_length=3, max_length=50)
+    email: str = Field(unique=True, index=True)  # use str for SQLModel
     password: Annotated[str, StringConstraints(min_length=8, max_length=50)]
 
     # Relationships
@@ -42,7 +43,7 @@ class Account(SQLModel, table=True):
     """Account model with fields for account information and relationships to other models."""
 
     account_id: Optional[int] = Field(default=None, primary_key=True)
-    user_id: int = Field(foreign_key="user.user_id")
+    user_id: int = Field(foreign_key="user.user_id", index=True)
     account_type: str  # checking, savings, or credit card
     balance: float
 
@@ -55,11 +56,12 @@ class Budget(SQLModel, table=True):
     """Budget model with fields for budget information and relationships to other models."""
 
     budget_id: Optional[int] = Field(default=None, primary_key=True)
-    user_id: int = Field(foreign_key="user.user_id")
+    user_id: int = Field(foreign_key="user.user_id", index=True)
     name: str
     amount: float
     start_date: datetime
-    end_date: datetime
+    end_date: datetime  # inclusive
+    recurrence: Optional[str] = None  # repeats the window "weekly" or "monthly"
 
     # Relationships
     user: User = Relationship(back_populates="budgets")
@@ -69,6 +71,14 @@ class Budget(SQLModel, table=True):
 class Transaction(SQLModel, table=True):
     """Transaction model with fields for transaction information and relationships to other models."""
 
+    # per-user, per-account and per-budget history by date; also serve
+    # lookups by the id alone
+    __table_args__ = (
+        Index("ix_transaction_user_id_date", "user_id", "date"),
+        Index("ix_transaction_account_id_date", "account_id", "date"),
+        Index("ix_transaction_budget_id_date", "budget_id", "date"),
+    )
+
     transaction_id: Optional[int] = Field(default=None, primary_key=True)
     user_id: int = Field(foreign_key="user.user_id")
     account_id: int = Field(foreign_key="account.account_id")
@@ -76,6 +86,7 @@ class Transaction(SQLModel, table=True):
     date: datetime
     amount: float
     description: str
+    category: Optional[str] = None  # set by the user's categorization rules
 
     # Relationships
     user: User = Relationship(back_populates="transactions")
@@ -83,14 +94,72 @@ class Transaction(SQLModel, table=True):
     budget: Optional[Budget] = Relationship(back_populates="transactions")
 
 
+class CategoryRule(SQLModel, table=True):
+    """Category Rule model, a user's pattern mapping transaction descriptions to a category and budget."""
+
+    rule_id: Optional[int] = Field(default=None, primary_key=True)
+    user_id: int = Field(foreign_key="user.user_id", index=True)
+    pattern: str
+    match_type: str = "contains"  # contains, prefix, exact or regex
+    category: Optional[str] = None
+    budget_id: Optional[int] = Field(default=None, foreign_key="budget.budget_id")
+    priority: int = 0  # the lowest matching priority wins, then the oldest rule
+
+
 class LoyaltyProgram(SQLModel, table=True):
     """Loyalty Program model with fields for loyalty program information and relationships to other models."""
 
     loyalty_id: Optional[int] = Field(default=None, primary_key=True)
-    user_id: int = Field(foreign_key="user.user_id")
+    user_id: int = Field(foreign_key="user.user_id", index=True)
     program_name: str
-    points: int
+    points: int  # cached balance, kept in step with the points ledger
     last_updated_date: datetime
+    entry_count: int = 0  # ledger entries posted, used to space out checkpoints
 
     # Relationships
     user: User = Relationship(back_populates="loyalty_programs")
+
+
+class BudgetRollup(SQLModel, table=True):
+    """Budget Rollup model with running totals of the transactions assigned to a budget."""
+
+    budget_id: int = Field(foreign_key="budget.budget_id", primary_key=True)
+    spent: float = 0.0
+    transaction_count: int = 0
+
+
+class AccountBalanceCheckpoint(SQLModel, table=True):
+    """Account Balance Checkpoint model with the net change of an account's transactions in one month."""
+
+    account_id: int = Field(foreign_key="account.account_id", primary_key=True)
+    month: datetime = Field(primary_key=True)  # first day of the month
+    # in minor units, e.g. cents; 64-bit, as monthly sums overflow int4
+    change_minor: int = Field(default=0, sa_type=BigInteger)
+    transaction_count: int = 0
+
+
+class LoyaltyEntry(SQLModel, table=True):
+    """Loyalty Entry model, one row of the append-only points ledger of a loyalty program."""
+
+    # history of a program by date; also serves lookups by loyalty_id alone
+    __table_args__ = (Index("ix_loyaltyentry_loyalty_id_date", "loyalty_id", "date"),)
+
+    entry_id: Optional[int] = Field(default=None, primary_key=True)
+    loyalty_id: int = Field(foreign_key="loyaltyprogram.loyalty_id")
+    entry_type: str  # earn, redeem, adjust or expire
+    points: int  # signed: redemptions and expiries are negative
+    date: datetime
+    description: Optional[str] = None
+
+
+class LoyaltyCheckpoint(SQLModel, table=True):
+    """Loyalty Checkpoint model with the balance of a loyalty program after a ledger entry."""
+
+    __table_args__ = (
+        Index("ix_loyaltycheckpoint_loyalty_id_date", "loyalty_id", "date"),
+    )
+
+    entry_id: int = Field(foreign_key="loyaltyentry.entry_id", primary_key=True)
+    loyalty_id: int = Field(foreign_key="loyaltyprogram.loyalty_id")
+    date: datetime
+    balance: int
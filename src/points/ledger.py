@@ -0,0 +1,203 @@
+"""
+Loyalty points ledger
+
+Every change to a loyalty program's points is an append-only LoyaltyEntry
+(earn, redeem, adjust or expire); the ledger is the source of truth. The
+program's `points` column caches the balance and is moved by the same
+transaction with a single atomic UPDATE, so concurrent accruals serialize on
+the program row instead of racing, and balance reads stay a primary-key
+lookup.
+
+Every `LOYALTY_CHECKPOINT_INTERVAL` entries the balance is checkpointed, so a
+balance as of any past date replays at most that many entries. Entries are
+dated when they are posted, which keeps entry ids and dates in the same
+order.
+
+The cached balances can be reconciled with the ledger with:
+
+    python -m src.points.ledger rebuild
+"""
+
+import argparse
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from sqlalchemy import Connection, func, select
+
+from src.models.db_models import LoyaltyCheckpoint, LoyaltyEntry, LoyaltyProgram
+from src.utils.shared import CONFIG, LOGGER
+
+ENTRY_TYPES = ("earn", "redeem", "adjust", "expire")
+
+
+class LoyaltyProgramNotFoundError(LookupError):
+    """Raised when posting to a loyalty program that does not exist"""
+
+
+class InsufficientPointsError(ValueError):
+    """Raised when a redemption or expiry exceeds the balance"""
+
+
+def signed_points(entry_type: str, points: int) -> int:
+    """
+    The balance change of an entry. Earned, redeemed and expired points are
+    given as positive amounts; adjustments carry their own sign.
+    """
+    if entry_type not in ENTRY_TYPES:
+        raise ValueError(f"Unknown entry type: {entry_type}")
+    if entry_type == "adjust":
+        if points == 0:
+            raise ValueError("Adjustments must be non-zero")
+        return points
+    if points <= 0:
+        raise ValueError(f"Points to {entry_type} must be positive")
+    return points if entry_type == "earn" else -points
+
+
+def post_entry(
+    connection: Connection,
+    loyalty_id: int,
+    entry_type: str,
+    points: int,
+    description: Optional[str] = None,
+    date: Optional[datetime] = None,
+) -> dict:
+    """
+    Append an entry to the ledger and move the cached balance with it.
+    Returns the new entry id and balance.
+    """
+    delta = signed_points(entry_type, points)
+
+    # the row lock taken here orders concurrent entries of the same program
+    programs = LoyaltyProgram.__table__
+    update = (
+        programs.update()
+        .where(programs.c.loyalty_id == loyalty_id)
+        .values(
+            points=programs.c.points + delta,
+            entry_count=programs.c.entry_count + 1,
+        )
+        .returning(programs.c.points, programs.c.entry_count)
+    )
+    if entry_type in ("redeem", "expire"):
+        update = update.where(programs.c.points + delta >= 0)
+    row = connection.execute(update).first()
+    if row is None:
+        exists = connection.execute(
+            select(programs.c.loyalty_id).where(programs.c.loyalty_id == loyalty_id)
+        ).first()
+        if exists is None:
+            raise LoyaltyProgramNotFoundError(f"Unknown loyalty program: {loyalty_id}")
+        raise InsufficientPointsError(f"Not enough points to {entry_type} {points}")
+    balance, entry_count = row
+    # dated under the lock, so that dates follow the order of the entry ids
+    date = date or datetime.now(timezone.utc).replace(tzinfo=None)
+    connection.execute(
+        programs.update()
+        .where(programs.c.loyalty_id == loyalty_id)
+        .values(last_updated_date=date)
+    )
+
+    entries = LoyaltyEntry.__table__
+    entry_id = connection.execute(
+        entries.insert()
+        .values(
+            loyalty_id=loyalty_id,
+            entry_type=entry_type,
+            points=delta,
+            date=date,
+            description=description,
+        )
+        .returning(entries.c.entry_id)
+    ).scalar_one()
+
+    if entry_count % CONFIG.loyalty_checkpoint_interval == 0:
+        connection.execute(
+            LoyaltyCheckpoint.__table__.insert().values(
+                entry_id=entry_id, loyalty_id=loyalty_id, date=date, balance=balance
+            )
+        )
+    return {"entry_id": entry_id, "balance": balance}
+
+
+def balance_as_of(connection: Connection, loyalty_id: int, date: datetime) -> int:
+    """
+    The balance at `date`: the latest checkpoint before it plus the entries
+    posted after that checkpoint.
+    """
+    checkpoints = LoyaltyCheckpoint.__table__
+    checkpoint = connection.execute(
+        select(checkpoints.c.entry_id, checkpoints.c.balance)
+        .where(checkpoints.c.loyalty_id == loyalty_id, checkpoints.c.date <= date)
+        .order_by(checkpoints.c.date.desc(), checkpoints.c.entry_id.desc())
+        .limit(1)
+    ).first()
+    after_entry_id, balance = checkpoint or (0, 0)
+
+    entries = LoyaltyEntry.__table__
+    replayed = connection.execute(
+        select(func.coalesce(func.sum(entries.c.points), 0)).where(
+            entries.c.loyalty_id == loyalty_id,
+            entries.c.date <= date,
+            entries.c.entry_id > after_entry_id,
+        )
+    ).scalar_one()
+    return balance + replayed
+
+
+def points_summary(
+    connection: Connection,
+    loyalty_id: int,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> Dict[str, int]:
+    """Net points per entry type posted in [start, end)."""
+    entries = LoyaltyEntry.__table__
+    statement = (
+        select(entries.c.entry_type, func.sum(entries.c.points))
+        .where(entries.c.loyalty_id == loyalty_id)
+        .group_by(entries.c.entry_type)
+    )
+    if start is not None:
+        statement = statement.where(entries.c.date >= start)
+    if end is not None:
+        statement = statement.where(entries.c.date < end)
+    totals = dict.fromkeys(ENTRY_TYPES, 0)
+    totals.update(connection.execute(statement).all())
+    return totals
+
+
+def rebuild_balances(connection: Connection, loyalty_id: Optional[int] = None):
+    """Recompute cached balances and entry counts from the ledger."""
+    programs = LoyaltyProgram.__table__
+    entries = LoyaltyEntry.__table__
+    own_entries = entries.c.loyalty_id == programs.c.loyalty_id
+    update = programs.update().values(
+        points=select(func.coalesce(func.sum(entries.c.points), 0))
+        .where(own_entries)
+        .scalar_subquery(),
+        entry_count=select(func.count()).where(own_entries).scalar_subquery(),
+    )
+    if loyalty_id is not None:
+        update = update.where(programs.c.loyalty_id == loyalty_id)
+    result = connection.execute(update)
+    LOGGER.info(f"Rebuilt {result.rowcount} loyalty balances")
+    return result.rowcount
+
+
+def main():
+    # imported here so that the ledger does not depend on the app's engine
+    from src.db.database import engine
+
+    parser = argparse.ArgumentParser(description="Maintain loyalty points balances")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparser = subparsers.add_parser("rebuild", help="recompute from the ledger")
+    subparser.add_argument("--loyalty-id", type=int)
+    args = parser.parse_args()
+
+    with engine.begin() as connection:
+        rebuild_balances(connection, args.loyalty_id)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Caches of data derived per user, e.g. compiled budget and rule indexes
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+
+class PerUserCache:
+    """Size-bounded LRU of per-user values that expire after `ttl` seconds."""
+
+    def __init__(self, max_size: int = 10000, ttl: float = 60.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        # user_id -> (expires at, value)
+        self._entries: "OrderedDict[int, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # bumped by every invalidation, so that a value derived while racing
+        # with a write is not cached, see UserCache.version
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id: int) -> Optional[Any]:
+        """Return the cached value of a user or None if unknown or expired."""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[0] <= time.monotonic():
+                self._entries.pop(user_id, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, user_id: int, value: Any, version: int):
+        """
+        Cache a value derived while the cache was at `version`, unless a
+        user was invalidated since.
+        """
+        with self._lock:
+            if version != self.version:
+                return
+            self._entries.pop(user_id, None)
+            self._entries[user_id] = (time.monotonic() + self.ttl, value)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: int):
+        """Drop the value of a user, e.g. after what it is derived from changed."""
+        with self._lock:
+            self.version += 1
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        """Drop every cached value."""
+        with self._lock:
+            self.version += 1
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """Return a snapshot of the cache counters."""
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
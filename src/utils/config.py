@@ -50,6 +50,41 @@ class Config:
     def fastapi_port(self):
         return int(self.get_env_var("FASTAPI_PORT", "8000"))
 
+    @property
+    def server_workers(self):
+        return int(self.get_env_var("SERVER_WORKERS", str(os.cpu_count() or 1)))
+
+    @property
+    def server_backlog(self):
+        return int(self.get_env_var("SERVER_BACKLOG", "2048"))
+
+    @property
+    def server_keep_alive_seconds(self):
+        # keep above the idle timeout of the load balancer in front
+        return int(self.get_env_var("SERVER_KEEP_ALIVE_SECONDS", "75"))
+
+    @property
+    def server_graceful_timeout_seconds(self):
+        return int(self.get_env_var("SERVER_GRACEFUL_TIMEOUT_SECONDS", "30"))
+
+    @property
+    def server_max_requests(self):
+        # requests after which a worker is replaced, 0 disables recycling
+        return int(self.get_env_var("SERVER_MAX_REQUESTS", "0"))
+
+    @property
+    def server_max_requests_jitter(self):
+        return int(self.get_env_var("SERVER_MAX_REQUESTS_JITTER", "0"))
+
+    @property
+    def server_access_log(self):
+        return self.get_env_var("SERVER_ACCESS_LOG", "false").lower() in ("1", "true")
+
+    @property
+    def server_forwarded_allow_ips(self):
+        # proxies trusted to set X-Forwarded-For, e.g. "10.0.0.1,10.0.0.2"
+        return self.get_env_var("SERVER_FORWARDED_ALLOW_IPS", "")
+
     @property
     def database_url(self):
         return self.get_env_var("DATABASE_URL")
@@ -117,3 +152,203 @@ class Config:
     @property
     def access_token_expire_minutes(self):
         return int(self.get_env_var("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
+
+    @property
+    def password_hash_workers(self):
+        return int(self.get_env_var("PASSWORD_HASH_WORKERS", "4"))
+
+    @property
+    def password_hash_max_queue(self):
+        return int(self.get_env_var("PASSWORD_HASH_MAX_QUEUE", "32"))
+
+    @property
+    def password_hash_executor(self):
+        return self.get_env_var("PASSWORD_HASH_EXECUTOR", "thread")
+
+    @property
+    def login_ip_burst(self):
+        return int(self.get_env_var("LOGIN_IP_BURST", "30"))
+
+    @property
+    def login_ip_per_minute(self):
+        return float(self.get_env_var("LOGIN_IP_PER_MINUTE", "60"))
+
+    @property
+    def login_username_burst(self):
+        return int(self.get_env_var("LOGIN_USERNAME_BURST", "10"))
+
+    @property
+    def login_username_per_minute(self):
+        return float(self.get_env_var("LOGIN_USERNAME_PER_MINUTE", "5"))
+
+    @property
+    def login_limiter_max_keys(self):
+        # buckets kept per limiter; the least recently used ones are evicted
+        return int(self.get_env_var("LOGIN_LIMITER_MAX_KEYS", "100000"))
+
+    @property
+    def login_max_concurrent_verifies(self):
+        return int(self.get_env_var("LOGIN_MAX_CONCURRENT_VERIFIES", "8"))
+
+    @property
+    def previous_secret_keys(self):
+        keys = self.get_env_var("PREVIOUS_SECRET_KEYS", "")
+        return [key.strip() for key in keys.split(",") if key.strip()]
+
+    @property
+    def internal_api_token(self):
+        # bearer token of the /internal endpoints, which are closed when unset
+        return self.get_env_var("INTERNAL_API_TOKEN", "")
+
+    @property
+    def token_cache_size(self):
+        return int(self.get_env_var("TOKEN_CACHE_SIZE", "10000"))
+
+    @property
+    def user_cache_size(self):
+        return int(self.get_env_var("USER_CACHE_SIZE", "10000"))
+
+    @property
+    def user_cache_ttl_seconds(self):
+        # bounds how long writes from other processes can go unseen
+        return float(self.get_env_var("USER_CACHE_TTL_SECONDS", "60"))
+
+    @property
+    def budget_auto_assign(self):
+        # assign new transactions without a budget to the one covering their date
+        return self.get_env_var("BUDGET_AUTO_ASSIGN", "true").lower() in ("1", "true")
+
+    @property
+    def budget_index_cache_size(self):
+        return int(self.get_env_var("BUDGET_INDEX_CACHE_SIZE", "10000"))
+
+    @property
+    def budget_index_ttl_seconds(self):
+        # bounds how long budget changes from other processes can go unseen
+        return float(self.get_env_var("BUDGET_INDEX_TTL_SECONDS", "60"))
+
+    @property
+    def rule_matcher_cache_size(self):
+        return int(self.get_env_var("RULE_MATCHER_CACHE_SIZE", "10000"))
+
+    @property
+    def rule_matcher_ttl_seconds(self):
+        # bounds how long rule changes from other processes can go unseen
+        return float(self.get_env_var("RULE_MATCHER_TTL_SECONDS", "60"))
+
+    @property
+    def async_database_url(self):
+        # Derived from DATABASE_URL when not set
+        return self.get_env_var("ASYNC_DATABASE_URL", "")
+
+    @property
+    def database_replica_urls(self):
+        # comma-separated, in the same form as DATABASE_URL
+        urls = self.get_env_var("DATABASE_REPLICA_URLS", "")
+        return [url.strip() for url in urls.split(",") if url.strip()]
+
+    @property
+    def db_replica_check_seconds(self):
+        return float(self.get_env_var("DB_REPLICA_CHECK_SECONDS", "5"))
+
+    @property
+    def db_replica_check_timeout(self):
+        return float(self.get_env_var("DB_REPLICA_CHECK_TIMEOUT", "2"))
+
+    @property
+    def db_read_your_writes_seconds(self):
+        # reads go to the primary for this long after a client wrote
+        return float(self.get_env_var("DB_READ_YOUR_WRITES_SECONDS", "5"))
+
+    @property
+    def db_pool_size(self):
+        return int(self.get_env_var("DB_POOL_SIZE", "5"))
+
+    @property
+    def db_max_overflow(self):
+        return int(self.get_env_var("DB_MAX_OVERFLOW", "10"))
+
+    @property
+    def db_pool_recycle(self):
+        # seconds, -1 disables recycling
+        return int(self.get_env_var("DB_POOL_RECYCLE", "1800"))
+
+    @property
+    def db_pool_pre_ping(self):
+        return self.get_env_var("DB_POOL_PRE_PING", "true").lower() in ("1", "true")
+
+    @property
+    def db_pool_timeout(self):
+        return float(self.get_env_var("DB_POOL_TIMEOUT", "30"))
+
+    @property
+    def db_pool_slow_wait_ms(self):
+        return float(self.get_env_var("DB_POOL_SLOW_WAIT_MS", "100"))
+
+    @property
+    def sql_trace_enabled(self):
+        return self.get_env_var("SQL_TRACE_ENABLED", "false").lower() in ("1", "true")
+
+    @property
+    def sql_trace_sample_percent(self):
+        return float(self.get_env_var("SQL_TRACE_SAMPLE_PERCENT", "1"))
+
+    @property
+    def sql_slow_query_ms(self):
+        return float(self.get_env_var("SQL_SLOW_QUERY_MS", "500"))
+
+    @property
+    def loyalty_checkpoint_interval(self):
+        # ledger entries between two balance checkpoints of a loyalty program
+        return int(self.get_env_var("LOYALTY_CHECKPOINT_INTERVAL", "100"))
+
+    @property
+    def log_level(self):
+        return self.get_env_var("LOG_LEVEL", "INFO").upper()
+
+    @property
+    def log_levels(self):
+        # per-logger overrides, e.g. "sqlalchemy.engine=INFO,app=DEBUG"
+        levels = self.get_env_var("LOG_LEVELS", "")
+        pairs = [pair.split("=", 1) for pair in levels.split(",") if "=" in pair]
+        return {name.strip(): level.strip().upper() for name, level in pairs}
+
+    @property
+    def log_format(self):
+        # json or text
+        return self.get_env_var("LOG_FORMAT", "json")
+
+    @property
+    def log_dir(self):
+        # empty disables the log file
+        return self.get_env_var("LOG_DIR", "/tmp")
+
+    @property
+    def log_file_per_process(self):
+        # suffix the log file with the pid, for processes sharing LOG_DIR
+        return self.get_env_var("LOG_FILE_PER_PROCESS", "false").lower() in (
+            "1",
+            "true",
+        )
+
+    @property
+    def log_console(self):
+        return self.get_env_var("LOG_CONSOLE", "true").lower() in ("1", "true")
+
+    @property
+    def log_max_bytes(self):
+        return int(self.get_env_var("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+
+    @property
+    def log_rotate_seconds(self):
+        # 0 disables time-based rotation
+        return int(self.get_env_var("LOG_ROTATE_SECONDS", "86400"))
+
+    @property
+    def log_backup_count(self):
+        return int(self.get_env_var("LOG_BACKUP_COUNT", "5"))
+
+    @property
+    def log_queue_size(self):
+        # records waiting to be written; further records are dropped and counted
+        return int(self.get_env_var("LOG_QUEUE_SIZE", "10000"))
@@ -1,30 +1,64 @@
-import os
-from datetime import datetime, timedelta
-from typing import Union
+"""
+JWT creation and decoding
+
+Tokens are signed with the current SECRET_KEY and carry a `kid` header naming
+that key. Keys listed in PREVIOUS_SECRET_KEYS are still accepted when decoding,
+so the signing key can be rotated without invalidating live sessions.
+"""
+
+import hashlib
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Union
 
 import jwt
 
-SECRET_KEY = os.getenv("SECRET_KEY")
-ALGORITHM = os.getenv("ALGORITHM")
-ACCESS_TOKEN_EXPIRE_MINUTES = os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES")
+from src.utils.shared import CONFIG
+
+
+def _key_id(key: str) -> str:
+    """Derive a stable, non-secret identifier for a signing key."""
+    return hashlib.sha256(key.encode()).hexdigest()[:16]
+
+
+def _verification_keys() -> Dict[str, str]:
+    """Map key ids to every key that is currently accepted for decoding."""
+    keys = [CONFIG.secret_key, *CONFIG.previous_secret_keys]
+    return {_key_id(key): key for key in keys}
 
 
 def create_access_token(data: dict, expires_delta: Union[timedelta, None] = None):
     to_encode = data.copy()
     if expires_delta:
-        expire = datetime.now(datetime.UTC) + expires_delta
+        expire = datetime.now(timezone.utc) + expires_delta
     else:
-        expire = datetime.now(datetime.UTC) + timedelta(
-            minutes=ACCESS_TOKEN_EXPIRE_MINUTES
+        expire = datetime.now(timezone.utc) + timedelta(
+            minutes=CONFIG.access_token_expire_minutes
         )
     to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    secret_key = CONFIG.secret_key
+    encoded_jwt = jwt.encode(
+        to_encode,
+        secret_key,
+        algorithm=CONFIG.algorithm,
+        headers={"kid": _key_id(secret_key)},
+    )
     return encoded_jwt
 
 
 def decode_access_token(token: str):
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
+        kid = jwt.get_unverified_header(token).get("kid")
+        keys = _verification_keys()
+        # Tokens issued before key ids existed are tried against every key
+        candidates = [keys[kid]] if kid in keys else list(keys.values())
     except jwt.PyJWTError:
         return None
+
+    for key in candidates:
+        try:
+            return jwt.decode(token, key, algorithms=[CONFIG.algorithm])
+        except jwt.InvalidSignatureError:
+            continue
+        except jwt.PyJWTError:
+            return None
+    return None
@@ -1,57 +1,189 @@
 """
 Create logger for the application
+
+Logging never blocks a request: loggers only put records on a bounded
+in-memory queue, and a background QueueListener thread formats them and
+writes them to the console and to a rotating file. When the queue is full,
+e.g. because the disk is slow, new records are dropped and counted instead
+of waiting for room.
 """
 
+import atexit
 import logging
-from datetime import datetime
+import logging.handlers
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+import orjson
+
+from src.utils.request_context import CURRENT_ROUTE
+
+# attributes every LogRecord has; anything else was passed with `extra=`
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "route"}
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+
+class JSONFormatter(logging.Formatter):
+    """Formats a record as one JSON object per line"""
 
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(
+                timespec="milliseconds"
+            ),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "module": record.module,
+            "line": record.lineno,
+            "process": record.process,
+        }
+        route = getattr(record, "route", None)
+        if route is not None:
+            entry["route"] = route
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and key not in entry:
+                entry[key] = value
+        return orjson.dumps(entry, default=str).decode()
 
-def _create_logger(
-    name: str = "app", dir: str = "/tmp", level: int = logging.DEBUG
-) -> logging.Logger:
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
     """
-    Create logger for the application and save to file.
-    Default name is app.
-    Default level is DEBUG.
-    Default log path is /tmp/app_%Y-%m-%d_%H:%M:%S.log
+    Puts records on a bounded queue without ever blocking; records that do not
+    fit are dropped and counted.
     """
-    logger = logging.getLogger(name)
-    logger.setLevel(level)
 
-    # Create a datetime string in YYYY-MM-DD_HH:MM:SS format and append to log path
-    now = datetime.now()
-    date_string = now.strftime("%Y-%m-%d_%H:%M:%S")
-    log_path = f"{dir}/{name}_{date_string}.log"
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """
+        Resolve everything that depends on the calling thread or on mutable
+        arguments before the record changes threads.
+        """
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        record.route = CURRENT_ROUTE.get()
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+    def stats(self) -> dict:
+        """Queue depth and dropped record count"""
+        return {
+            "queued": self.queue.qsize(),
+            "capacity": self.queue.maxsize,
+            "dropped": self.dropped,
+        }
 
-    # Create file handler
-    fh = logging.FileHandler(log_path)
-    fh.setLevel(level)
 
-    # Create console handler
-    ch = logging.StreamHandler()
-    ch.setLevel(level)
+class SizeAndTimeRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """
+    Rotates the file once it reaches `max_bytes` or every `interval` seconds,
+    whichever comes first, keeping `backup_count` numbered backups.
+    """
+
+    def __init__(self, filename: str, max_bytes: int, interval: int, backup_count: int):
+        super().__init__(
+            filename, maxBytes=max_bytes, backupCount=backup_count, delay=True
+        )
+        self.interval = interval
+        self.rollover_at = time.time() + interval if interval > 0 else None
 
-    # Create formatter and add it to handlers
-    formatter = logging.Formatter(
-        "%(asctime)s - %(name)s - %(levelname)s - %(message)s", "%Y-%m-%d %H:%M:%S"
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        if self.rollover_at is not None and time.time() >= self.rollover_at:
+            return True
+        return bool(super().shouldRollover(record))
+
+    def doRollover(self):
+        super().doRollover()
+        if self.rollover_at is not None:
+            self.rollover_at = time.time() + self.interval
+
+
+QUEUE_HANDLER: Optional[DroppingQueueHandler] = None
+_LISTENER: Optional[logging.handlers.QueueListener] = None
+
+
+def configure_logging(config, name: str = "app"):
+    """
+    Route every logger through the queue: the root logger gets the only
+    handler, levels come from LOG_LEVEL and the per-logger LOG_LEVELS.
+    Handlers are written to by the listener thread only.
+    """
+    global QUEUE_HANDLER, _LISTENER
+    if _LISTENER is not None:
+        return
+
+    if config.log_format == "json":
+        formatter = JSONFormatter()
+    else:
+        formatter = logging.Formatter(TEXT_FORMAT, "%Y-%m-%d %H:%M:%S")
+
+    handlers = []
+    if config.log_console:
+        handlers.append(logging.StreamHandler())
+    if config.log_dir:
+        # a rotating file must have a single writer: processes sharing the
+        # directory get a file each
+        if config.log_file_per_process:
+            name = f"{name}-{os.getpid()}"
+        handlers.append(
+            SizeAndTimeRotatingFileHandler(
+                os.path.join(config.log_dir, f"{name}.log"),
+                config.log_max_bytes,
+                config.log_rotate_seconds,
+                config.log_backup_count,
+            )
+        )
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    QUEUE_HANDLER = DroppingQueueHandler(queue.Queue(config.log_queue_size))
+    root = logging.getLogger()
+    root.addHandler(QUEUE_HANDLER)
+    root.setLevel(config.log_level)
+    for logger_name, level in config.log_levels.items():
+        logging.getLogger(logger_name).setLevel(level)
+
+    _LISTENER = logging.handlers.QueueListener(
+        QUEUE_HANDLER.queue, *handlers, respect_handler_level=True
     )
-    fh.setFormatter(formatter)
-    ch.setFormatter(formatter)
+    _LISTENER.start()
+    # flush what is still queued when the process exits
+    atexit.register(_LISTENER.stop)
 
-    # Add handlers to logger
-    logger.addHandler(fh)
-    logger.addHandler(ch)
 
-    return logger
+def logging_stats() -> dict:
+    """Queue depth and dropped record count of the logging queue"""
+    if QUEUE_HANDLER is None:
+        return {"queued": 0, "capacity": 0, "dropped": 0}
+    return QUEUE_HANDLER.stats()
 
 
 def get_logger(name: str = "app") -> logging.Logger:
     """
-    Get logger for the application
+    Get logger for the application. Records propagate to the queue handler
+    installed by configure_logging.
     """
-    # check if logger exists
-    if name in logging.Logger.manager.loggerDict:
-        return logging.getLogger(name)
-    else:
-        # create logger
-        return _create_logger(name)
+    return logging.getLogger(name)
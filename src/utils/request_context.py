@@ -0,0 +1,25 @@
+"""
+Request-scoped context shared between the API layer and lower layers
+"""
+
+from contextvars import ContextVar
+from typing import Optional
+
+# "METHOD /path" of the request being served, None outside of a request
+CURRENT_ROUTE: ContextVar[Optional[str]] = ContextVar("current_route", default=None)
+
+
+class DBUsage:
+    """SQL statements executed and time spent in the database by one request"""
+
+    __slots__ = ("statements", "seconds")
+
+    def __init__(self):
+        self.statements = 0
+        self.seconds = 0.0
+
+
+# database usage of the request being served, None outside of a request
+REQUEST_DB_USAGE: ContextVar[Optional[DBUsage]] = ContextVar(
+    "request_db_usage", default=None
+)
@@ -5,8 +5,9 @@ Shared resources for the project
 from pathlib import Path
 
 from src.utils.config import Config
-from src.utils.logger import get_logger
+from src.utils.logger import configure_logging, get_logger
 
 CONFIG = Config()
+configure_logging(CONFIG)
 LOGGER = get_logger()
 ROOT_DIR = Path(__file__).parent.parent.parent.absolute()
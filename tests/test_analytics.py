@@ -0,0 +1,110 @@
+"""
+Tests for the vectorized spending analytics
+"""
+
+import random
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from src.budget.analytics import (
+    TransactionColumns,
+    running_average,
+    spending_by_budget,
+    spending_by_period,
+)
+
+
+@pytest.fixture(name="rows")
+def rows_fixture():
+    """
+    Random (date, amount, budget_id, account_id) rows over two years.
+    """
+    random.seed(0)
+    return [
+        (
+            datetime(2023, 1, 1) + timedelta(minutes=random.randrange(730 * 1440)),
+            round(random.uniform(-50, 200), 2),
+            random.choice([None, 1, 2, 3]),
+            1,
+        )
+        for _ in range(5000)
+    ]
+
+
+def test_monthly_totals_match_per_row_sums(rows):
+    """
+    Test that monthly totals and counts match a plain per-row aggregation.
+    """
+    expected = defaultdict(lambda: [0.0, 0])
+    for date, amount, _, _ in rows:
+        expected[date.date().replace(day=1)][0] += amount
+        expected[date.date().replace(day=1)][1] += 1
+
+    periods = spending_by_period(TransactionColumns.from_rows(rows), "month")
+    assert len(periods) == 24, "Months are missing"
+    for period in periods:
+        total, count = expected[period["period"]]
+        assert period["total"] == pytest.approx(total), "Total does not match"
+        assert period["count"] == count, "Count does not match"
+
+
+def test_weekly_periods_start_on_monday(rows):
+    """
+    Test that weeks start on Mondays and cover every transaction.
+    """
+    periods = spending_by_period(TransactionColumns.from_rows(rows), "week")
+    assert all(period["period"].weekday() == 0 for period in periods), "Not Monday"
+    assert sum(period["count"] for period in periods) == len(rows), "Rows lost"
+    first = min(date for date, _, _, _ in rows).date()
+    assert periods[0]["period"] == first - timedelta(days=first.weekday())
+
+
+def test_empty_periods_and_changes():
+    """
+    Test that gaps are filled with zero periods and changes are relative.
+    """
+    rows = [
+        (datetime(2024, 1, 10), 100.0, None, 1),
+        (datetime(2024, 3, 2), 50.0, None, 1),
+    ]
+    periods = spending_by_period(TransactionColumns.from_rows(rows), "month", 2)
+    assert [p["total"] for p in periods] == [100.0, 0.0, 50.0], "Gap not filled"
+    assert [p["running_average"] for p in periods] == [100.0, 50.0, 25.0]
+    assert periods[0]["change"] is None, "First month has a change"
+    assert periods[1]["change_pct"] == -100.0, "Change percentage is wrong"
+    assert periods[2]["change_pct"] is None, "Change from zero is not None"
+
+
+def test_running_average_window():
+    """
+    Test the trailing mean against a direct computation.
+    """
+    totals = np.arange(1.0, 11.0)
+    expected = [totals[max(0, i - 2) : i + 1].mean() for i in range(10)]
+    assert running_average(totals, 3) == pytest.approx(expected)
+
+
+def test_budget_totals(rows):
+    """
+    Test per-budget totals, with unassigned transactions under None.
+    """
+    expected = defaultdict(float)
+    for _, amount, budget_id, _ in rows:
+        expected[budget_id] += amount
+
+    budgets = spending_by_budget(TransactionColumns.from_rows(rows))
+    assert {b["budget_id"] for b in budgets} == {None, 1, 2, 3}, "Budget missing"
+    for budget in budgets:
+        assert budget["total"] == pytest.approx(expected[budget["budget_id"]])
+
+
+def test_no_transactions():
+    """
+    Test that an empty history produces empty reports.
+    """
+    columns = TransactionColumns.from_rows([])
+    assert spending_by_period(columns) == [], "Report is not empty"
+    assert spending_by_budget(columns) == [], "Report is not empty"
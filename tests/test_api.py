@@ -0,0 +1,740 @@
+"""
+Tests for the API endpoints
+"""
+
+import json
+import shutil
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+from sqlmodel import Session, create_engine, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.api import api
+from src.api.api import app
+from src.auth.rate_limit import LOGIN_LIMITER, TokenBucketLimiter
+from src.auth.user_cache import USER_CACHE
+from src.budget.assignment import BUDGET_INDEXES
+from src.budget.rules import RULE_MATCHERS
+from src.db import database
+from src.db.database import get_async_db, to_async_url
+from src.db.migrate import downgrade, upgrade
+from src.db.pagination import encode_cursor
+from src.db.pool import PoolStats
+from src.db.replicas import Replica, ReplicaSet
+from src.models.db_models import Account, Budget, LoyaltyProgram, Transaction, User
+from src.utils.shared import CONFIG
+
+# Use test database
+engine = create_engine(CONFIG.pytest_database_url)
+INTERNAL_TOKEN = "test-internal-token"
+INTERNAL_HEADERS = {"Authorization": f"Bearer {INTERNAL_TOKEN}"}
+# No pooling: each test client runs the app on its own event loop
+async_engine = create_async_engine(
+    to_async_url(CONFIG.pytest_database_url), poolclass=NullPool
+)
+
+
+@pytest.fixture(name="client", scope="function")
+def client_fixture(monkeypatch):
+    """
+    Create a test client backed by the test database
+    """
+    # Migrate the database up, and point the startup schema check at it
+    # rather than at DATABASE_URL
+    upgrade(CONFIG.pytest_database_url)
+    monkeypatch.setattr(api, "engine", engine)
+    monkeypatch.setenv("INTERNAL_API_TOKEN", INTERNAL_TOKEN)
+
+    async def get_test_db():
+        async with AsyncSession(async_engine, expire_on_commit=False) as session:
+            yield session
+
+    app.dependency_overrides[get_async_db] = get_test_db
+    # Start every test with full login rate limit buckets and no cached
+    # users, budgets or rules, as ids are reused once the tables are recreated
+    LOGIN_LIMITER.clear()
+    USER_CACHE.clear()
+    BUDGET_INDEXES.clear()
+    RULE_MATCHERS.clear()
+    with TestClient(app) as client:
+        yield client
+    app.dependency_overrides.clear()
+
+    # Drop all database tables
+    downgrade(CONFIG.pytest_database_url)
+
+
+def _register(client: TestClient, username: str, password: str, email: str):
+    """
+    Register a test user through the API.
+    """
+    return client.post(
+        "/api/v1/users/register",
+        json={"username": username, "email": email, "password": password},
+    )
+
+
+def _login(client: TestClient, username: str, password: str):
+    """
+    Log a test user in through the API.
+    """
+    return client.request(
+        "GET",
+        "/api/v1/user/login",
+        json={"username": username, "password": password},
+    )
+
+
+def test_register_and_login(client):
+    """
+    Test that a registered user can log in with the right password only.
+    """
+    response = _register(client, "testuser", "testpassword", "test@example.com")
+    assert response.status_code == 200, response.text
+    assert response.json()["username"] == "testuser", "Username does not match"
+
+    response = _login(client, "testuser", "testpassword")
+    assert response.status_code == 200, response.text
+    assert response.json()["access_token"], "No access token issued"
+    assert _login(client, "testuser", "wrongpassword").status_code == 400
+    assert _login(client, "nouser", "testpassword").status_code == 400
+
+
+def test_register_duplicate_user(client):
+    """
+    Test that a username or email cannot be registered twice.
+    """
+    _register(client, "testuser", "testpassword", "test@example.com")
+    response = _register(client, "testuser", "testpassword", "other@example.com")
+    assert response.status_code == 400, "Duplicate username was registered"
+    response = _register(client, "otheruser", "testpassword", "test@example.com")
+    assert response.status_code == 400, "Duplicate email was registered"
+    response = _register(client, "otheruser", "testpassword", "other@example.com")
+    assert response.status_code == 200, "Session was not usable after a conflict"
+
+
+def test_login_rate_limit(client, monkeypatch):
+    """
+    Test that login attempts beyond the per-username burst get a 429.
+    """
+    monkeypatch.setattr(
+        LOGIN_LIMITER, "username_limiter", TokenBucketLimiter(rate=0.01, burst=2)
+    )
+    _register(client, "testuser", "testpassword", "test@example.com")
+
+    assert _login(client, "testuser", "wrongpassword").status_code == 400
+    assert _login(client, "testuser", "testpassword").status_code == 200
+    response = _login(client, "testuser", "testpassword")
+    assert response.status_code == 429, response.text
+    assert 0 < int(response.headers["Retry-After"]) <= 100, "Retry-After is off"
+
+    # other usernames are limited separately
+    assert _login(client, "nouser", "testpassword").status_code == 400
+    stats = client.get("/internal/login-limiter", headers=INTERNAL_HEADERS).json()
+    assert stats["username"]["rejected"] == 1, "Rejection was not counted"
+
+
+def test_get_current_user(client):
+    """
+    Test that the access token issued on login authenticates later requests.
+    """
+    _register(client, "testuser", "testpassword", "test@example.com")
+    token = _login(client, "testuser", "testpassword").json()["access_token"]
+
+    response = client.get(
+        "/api/v1/users/me", headers={"Authorization": f"Bearer {token}"}
+    )
+    assert response.status_code == 200, response.text
+    assert response.json()["username"] == "testuser", "Username does not match"
+
+    assert client.get("/api/v1/users/me").status_code == 401
+    response = client.get(
+        "/api/v1/users/me", headers={"Authorization": "Bearer not-a-token"}
+    )
+    assert response.status_code == 401, "Invalid token was accepted"
+
+
+def test_current_user_is_cached(client):
+    """
+    Test that user lookups are served from the cache until the user changes.
+    """
+    _register(client, "testuser", "testpassword", "test@example.com")
+    token = _login(client, "testuser", "testpassword").json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    hits = client.get("/internal/user-cache", headers=INTERNAL_HEADERS).json()["hits"]
+    client.get("/api/v1/users/me", headers=headers)
+    client.get("/api/v1/users/me", headers=headers)
+    stats = client.get("/internal/user-cache", headers=INTERNAL_HEADERS).json()
+    assert stats["hits"] == hits + 2, "Login should have cached the user"
+
+    user_id = client.get("/api/v1/users/me", headers=headers).json()["user_id"]
+    with Session(engine) as session:
+        user = session.get(User, user_id)
+        user.email = "new@example.com"
+        session.add(user)
+        session.commit()
+    response = client.get("/api/v1/users/me", headers=headers)
+    assert response.json()["email"] == "new@example.com", "Stale user was served"
+
+    with Session(engine) as session:
+        session.delete(session.get(User, user_id))
+        session.commit()
+    response = client.get("/api/v1/users/me", headers=headers)
+    assert response.status_code == 401, "Token of a deleted user was accepted"
+
+
+def _add_users(count: int):
+    """
+    Add test users straight to the database, skipping password hashing.
+    """
+    with Session(engine) as session:
+        for i in range(count):
+            session.add(
+                User(
+                    username=f"user{i:02d}",
+                    email=f"user{i:02d}@example.com",
+                    password="x",
+                )
+            )
+        session.commit()
+
+
+def test_get_users_paginated(client):
+    """
+    Test that following next_cursor walks every user exactly once.
+    """
+    _add_users(7)
+
+    usernames, cursor = [], None
+    while True:
+        params = {"limit": 3, "sort": "username", "order": "desc"}
+        if cursor:
+            params["cursor"] = cursor
+        page = client.get("/api/v1/users", params=params).json()
+        usernames += [user["username"] for user in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert usernames == [f"user{i:02d}" for i in reversed(range(7))]
+
+
+def test_reads_use_replica(client, monkeypatch, tmp_path):
+    """
+    Test that reads go to a replica, except right after the client wrote.
+    """
+    # a replica that stopped replicating before any user was added
+    replica_path = tmp_path / "replica.db"
+    shutil.copy(make_url(CONFIG.pytest_database_url).database, replica_path)
+    replica_url = f"sqlite+aiosqlite:///{replica_path}"
+    replica_engine = create_async_engine(replica_url, poolclass=NullPool)
+    replica = Replica(replica_url, replica_engine, PoolStats("replica"))
+    monkeypatch.setattr(database, "REPLICAS", ReplicaSet([replica]))
+
+    response = _register(client, "testuser", "testpassword", "test@example.com")
+    assert "db_primary_until" in response.cookies, "Write did not pin to primary"
+    users = client.get("/api/v1/users").json()["items"]
+    assert [user["username"] for user in users] == ["testuser"], "Write was hidden"
+
+    client.cookies.clear()
+    assert client.get("/api/v1/users").json()["items"] == [], "Primary was read"
+
+
+def test_get_users_filtered(client):
+    """
+    Test filtering users by username prefix.
+    """
+    _add_users(12)
+    page = client.get("/api/v1/users", params={"username": "user1"}).json()
+    assert [user["username"] for user in page["items"]] == ["user10", "user11"]
+    assert page["next_cursor"] is None, "Unexpected next page"
+
+    page = client.get("/api/v1/users", params={"username": "user_"}).json()
+    assert page["items"] == [], "Underscore was treated as a wildcard"
+
+    response = client.get("/api/v1/users", params={"cursor": "garbage"})
+    assert response.status_code == 400, "Malformed cursor was accepted"
+    response = client.get("/api/v1/users", params={"cursor": encode_cursor([[1]])})
+    assert response.status_code == 400, "Cursor holding a list was accepted"
+    for sort, key in [("email", [1, 1]), ("user_id", ["1"]), ("user_id", [True])]:
+        response = client.get(
+            "/api/v1/users", params={"sort": sort, "cursor": encode_cursor(key)}
+        )
+        assert response.status_code == 400, f"Cursor {key} sorting by {sort} passed"
+    response = client.get(
+        "/api/v1/users",
+        params={"sort": "email", "cursor": encode_cursor(["user1@example.com", 2])},
+    )
+    assert response.status_code == 200, response.text
+
+
+def test_get_users_stream(client):
+    """
+    Test streaming users as NDJSON.
+    """
+    _add_users(5)
+    response = client.get("/api/v1/users", params={"stream": True})
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    users = [json.loads(line) for line in response.text.splitlines()]
+    assert [user["user_id"] for user in users] == [1, 2, 3, 4, 5]
+
+
+def test_import_transactions(client):
+    """
+    Test importing a CSV statement into the user's account.
+    """
+    _register(client, "testuser", "testpassword", "test@example.com")
+    token = _login(client, "testuser", "testpassword").json()["access_token"]
+    with Session(engine) as session:
+        account = Account(user_id=1, account_type="checking", balance=0.0)
+        session.add(account)
+        session.commit()
+        account_id = account.account_id
+
+    statement = "date,amount,description\n2024-01-05,-12.50,COFFEE\nbad,1,X\n"
+    response = client.post(
+        f"/api/v1/accounts/{account_id}/transactions/import",
+        content=statement,
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    assert response.status_code == 200, response.text
+    assert response.json()["inserted"] == 1, "Valid row was not imported"
+    assert response.json()["errors"][0]["row"] == 2, "Row error was not reported"
+
+    response = client.post(
+        "/api/v1/accounts/999/transactions/import",
+        content=statement,
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    assert response.status_code == 404, "Imported into an unknown account"
+
+
+def test_budget_status(client):
+    """
+    Test that the budget status reflects the transactions assigned to it.
+    """
+    _register(client, "testuser", "testpassword", "test@example.com")
+    token = _login(client, "testuser", "testpassword").json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    with Session(engine) as session:
+        account = Account(user_id=1, account_type="checking", balance=0.0)
+        budget = Budget(
+            user_id=1,
+            name="food",
+            amount=100.0,
+            start_date=datetime(2024, 1, 1),
+            end_date=datetime(2024, 1, 31),
+        )
+        session.add_all([account, budget])
+        session.commit()
+        account_id, budget_id = account.account_id, budget.budget_id
+
+    statement = (
+        "date,amount,description,budget_id\n"
+        f"2024-01-05,12.50,COFFEE,{budget_id}\n"
+        f"2024-01-06,7.50,LUNCH,{budget_id}\n"
+    )
+    client.post(
+        f"/api/v1/accounts/{account_id}/transactions/import",
+        content=statement,
+        headers=headers,
+    )
+
+    status = client.get(f"/api/v1/budgets/{budget_id}/status", headers=headers)
+    assert status.status_code == 200, status.text
+    assert status.json()["spent"] == 20.0, "Spent does not match"
+    assert status.json()["remaining"] == 80.0, "Remaining does not match"
+    assert status.json()["transaction_count"] == 2, "Count does not match"
+
+    response = client.get("/api/v1/budgets/999/status", headers=headers)
+    assert response.status_code == 404, "Unknown budget was found"
+
+
+def test_recurring_budget_status(client):
+    """
+    Test that a recurring budget's status covers its current period only.
+    """
+    _register(client, "testuser", "testpassword", "test@example.com")
+    token = _login(client, "testuser", "testpassword").json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    with Session(engine) as session:
+        account = Account(user_id=1, account_type="checking", balance=0.0)
+        budget = Budget(
+            user_id=1,
+            name="food",
+            amount=100.0,
+            start_date=datetime(2024, 1, 1),
+            end_date=datetime(2024, 1, 31),
+            recurrence="monthly",
+        )
+        session.add_all([account, budget])
+        session.commit()
+        account_id, budget_id = account.account_id, budget.budget_id
+
+    client.post(
+        f"/api/v1/accounts/{account_id}/transactions/import",
+        content=(
+            "date,amount,description\n"
+            "2024-01-05,70.00,GROCERIES\n"
+            "2024-02-06,30.00,LUNCH\n"
+            "2024-02-20,5.00,COFFEE\n"
+        ),
+        headers=headers,
+    )
+
+    status = client.get(
+        f"/api/v1/budgets/{budget_id}/status",
+        params={"as_of": "2024-02-15T12:00:00"},
+        headers=headers,
+    ).json()
+    assert status["period_start"] == "2024-02-01T00:00:00", "Wrong period"
+    assert status["period_end"] == "2024-03-01T00:00:00", "Wrong period"
+    assert status["spent"] == 35.0, "Spent covers other periods"
+    assert status["remaining"] == 65.0, "Remaining does not match"
+    assert status["transaction_count"] == 2, "Count does not match"
+
+
+def test_spending_reports(client):
+    """
+    Test the monthly, weekly and per-budget spending reports.
+    """
+    _register(client, "testuser", "testpassword", "test@example.com")
+    token = _login(client, "testuser", "testpassword").json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    with Session(engine) as session:
+        account = Account(user_id=1, account_type="checking", balance=0.0)
+        budget = Budget(
+            user_id=1,
+            name="food",
+            amount=100.0,
+            start_date=datetime(2024, 1, 10),
+            end_date=datetime(2024, 12, 31),
+        )
+        session.add_all([account, budget])
+        session.commit()
+        account_id, budget_id = account.account_id, budget.budget_id
+
+    # BOOKS is dated before the budget, so it is not assigned to it
+    statement = (
+        "date,amount,description,budget_id\n"
+        f"2024-01-05,10.00,COFFEE,{budget_id}\n"
+        "2024-01-08,20.00,BOOKS,\n"
+        f"2024-02-06,40.00,LUNCH,{budget_id}\n"
+    )
+    client.post(
+        f"/api/v1/accounts/{account_id}/transactions/import",
+        content=statement,
+        headers=headers,
+    )
+
+    monthly = client.get("/api/v1/reports/spending/monthly", headers=headers)
+    assert monthly.status_code == 200, monthly.text
+    assert [m["total"] for m in monthly.json()] == [30.0, 40.0], "Wrong totals"
+    assert monthly.json()[1]["period"] == "2024-02-01", "Wrong period"
+    assert monthly.json()[1]["change"] == 10.0, "Wrong change"
+
+    weekly = client.get(
+        "/api/v1/reports/spending/weekly",
+        params={"end": "2024-02-01T00:00:00"},
+        headers=headers,
+    )
+    assert [w["period"] for w in weekly.json()] == ["2024-01-01", "2024-01-08"]
+
+    budgets = client.get("/api/v1/reports/spending/budgets", headers=headers)
+    totals = {b["budget_id"]: b["total"] for b in budgets.json()}
+    assert totals == {budget_id: 50.0, None: 20.0}, "Wrong budget totals"
+
+    response = client.get("/api/v1/reports/spending/monthly")
+    assert response.status_code == 401, "Report is not authenticated"
+
+
+def test_category_rules(client):
+    """
+    Test managing rules and re-applying them to imported transactions.
+    """
+    _register(client, "testuser", "testpassword", "test@example.com")
+    token = _login(client, "testuser", "testpassword").json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    with Session(engine) as session:
+        account = Account(user_id=1, account_type="checking", balance=0.0)
+        session.add(account)
+        session.commit()
+        account_id = account.account_id
+
+    response = client.post(
+        "/api/v1/rules",
+        json={"pattern": "(AMZN", "match_type": "regex", "category": "shopping"},
+        headers=headers,
+    )
+    assert response.status_code == 400, "Invalid regex was accepted"
+    response = client.post(
+        "/api/v1/rules", json={"pattern": "AMZN", "budget_id": 99}, headers=headers
+    )
+    assert response.status_code == 404, "Unknown budget was accepted"
+
+    client.post(
+        f"/api/v1/accounts/{account_id}/transactions/import",
+        content="date,amount,description\n2024-01-05,12.50,AMZN MKTP US*2K4\n",
+        headers=headers,
+    )
+    response = client.post(
+        "/api/v1/rules",
+        json={"pattern": "AMZN", "category": "shopping"},
+        headers=headers,
+    )
+    assert response.status_code == 200, response.text
+    rule_id = response.json()["rule_id"]
+    assert [
+        r["rule_id"] for r in client.get("/api/v1/rules", headers=headers).json()
+    ] == [rule_id]
+
+    response = client.post("/api/v1/rules/recategorize", headers=headers)
+    assert response.json() == {"updated": 1}, "Transaction was not recategorized"
+    with Session(engine) as session:
+        transaction = session.exec(select(Transaction)).one()
+        assert transaction.category == "shopping", "Category was not stored"
+
+    response = client.delete(f"/api/v1/rules/{rule_id}", headers=headers)
+    assert response.status_code == 204, response.text
+    assert client.get("/api/v1/rules", headers=headers).json() == []
+
+
+def test_transaction_search(client):
+    """
+    Test searching transactions by prefix and misspelt words, with filters
+    and pagination.
+    """
+    _register(client, "testuser", "testpassword", "test@example.com")
+    token = _login(client, "testuser", "testpassword").json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    with Session(engine) as session:
+        accounts = [
+            Account(user_id=1, account_type="checking", balance=0.0),
+            Account(user_id=1, account_type="savings", balance=0.0),
+        ]
+        session.add_all(accounts)
+        session.commit()
+        account_ids = [account.account_id for account in accounts]
+
+    client.post(
+        f"/api/v1/accounts/{account_ids[0]}/transactions/import",
+        content=(
+            "date,amount,description\n"
+            "2024-01-05,4.50,STARBUCKS #123 SEATTLE\n"
+            "2024-01-06,12.50,AMZN MKTP US*2K4\n"
+            "2024-02-07,5.25,Starbucks Store 77\n"
+            "2024-03-08,3.75,STARBUCKS RESERVE\n"
+        ),
+        headers=headers,
+    )
+    client.post(
+        f"/api/v1/accounts/{account_ids[1]}/transactions/import",
+        content="date,amount,description\n2024-03-09,6.00,STARBUCKS ONLINE\n",
+        headers=headers,
+    )
+
+    def search(**params):
+        response = client.get(
+            "/api/v1/transactions/search", params=params, headers=headers
+        )
+        assert response.status_code == 200, response.text
+        return response.json()
+
+    page = search(q="starb")
+    assert [t["date"][:10] for t in page["items"]] == [
+        "2024-03-09",
+        "2024-03-08",
+        "2024-02-07",
+        "2024-01-05",
+    ], "Prefix search did not find the transactions newest first"
+    assert search(q="starbucks store")["items"][0]["amount"] == 5.25
+    assert search(q="bucks")["items"] == [], "Matched the middle of a word"
+    assert search(q="starbukcs")["items"] == [], "Misspelling matched without fuzzy"
+    assert len(search(q="starbukcs", fuzzy=True)["items"]) == 4, "Fuzzy search failed"
+
+    page = search(q="starbucks", account_id=account_ids[0], start="2024-02-01")
+    assert [t["date"][:10] for t in page["items"]] == [
+        "2024-03-08",
+        "2024-02-07",
+    ], "Account and date filters were not applied"
+
+    seen, cursor = [], None
+    while True:
+        params = {"q": "starbucks", "limit": 3}
+        if cursor:
+            params["cursor"] = cursor
+        page = search(**params)
+        seen += [t["transaction_id"] for t in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert len(seen) == len(set(seen)) == 4, "Pages skipped or repeated results"
+
+    response = client.get(
+        "/api/v1/transactions/search", params={"q": "#*"}, headers=headers
+    )
+    assert response.status_code == 400, "Query without words was accepted"
+    response = client.get(
+        "/api/v1/transactions/search",
+        params={"q": "starbucks", "cursor": "bogus"},
+        headers=headers,
+    )
+    assert response.status_code == 400, "Invalid cursor was accepted"
+
+    _register(client, "other", "otherpassword", "other@example.com")
+    token = _login(client, "other", "otherpassword").json()["access_token"]
+    response = client.get(
+        "/api/v1/transactions/search",
+        params={"q": "starbucks"},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    assert response.json()["items"] == [], "Another user's transactions were found"
+
+
+def test_account_balance(client):
+    """
+    Test the account balance, as of a date and by month.
+    """
+    _register(client, "testuser", "testpassword", "test@example.com")
+    token = _login(client, "testuser", "testpassword").json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    with Session(engine) as session:
+        account = Account(user_id=1, account_type="checking", balance=0.0)
+        session.add(account)
+        session.commit()
+        url = f"/api/v1/accounts/{account.account_id}"
+
+    statement = (
+        "date,amount,description\n"
+        "2024-01-05,1000.00,PAYROLL\n"
+        "2024-01-20,-42.10,GROCERIES\n"
+        "2024-02-03,-0.15,FEE\n"
+    )
+    client.post(f"{url}/transactions/import", content=statement, headers=headers)
+
+    balance = client.get(f"{url}/balance", headers=headers)
+    assert balance.status_code == 200, balance.text
+    assert balance.json()["balance_minor"] == 95775, "Balance does not match"
+    assert balance.json()["balance"] == 957.75, "Balance does not match"
+
+    balance = client.get(
+        f"{url}/balance", params={"as_of": "2024-01-10T00:00:00"}, headers=headers
+    )
+    assert balance.json()["balance_minor"] == 100000, "Past balance does not match"
+
+    history = client.get(f"{url}/balance/history", headers=headers).json()
+    assert [h["month"] for h in history] == ["2024-01-01", "2024-02-01"]
+    assert [h["balance_minor"] for h in history] == [95790, 95775]
+
+    response = client.get("/api/v1/accounts/999/balance", headers=headers)
+    assert response.status_code == 404, "Unknown account was found"
+
+
+def test_loyalty_ledger(client):
+    """
+    Test posting loyalty entries and reading the balance and history.
+    """
+    _register(client, "testuser", "testpassword", "test@example.com")
+    token = _login(client, "testuser", "testpassword").json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    with Session(engine) as session:
+        program = LoyaltyProgram(
+            user_id=1,
+            program_name="miles",
+            points=0,
+            last_updated_date=datetime(2024, 1, 1),
+        )
+        session.add(program)
+        session.commit()
+        url = f"/api/v1/loyalty/{program.loyalty_id}"
+
+    for entry_type, points in [("earn", 100), ("earn", 50), ("redeem", 30)]:
+        response = client.post(
+            f"{url}/entries",
+            json={"entry_type": entry_type, "points": points},
+            headers=headers,
+        )
+        assert response.status_code == 200, response.text
+    assert response.json()["points"] == 120, "Balance does not match"
+
+    response = client.post(
+        f"{url}/entries", json={"entry_type": "redeem", "points": 500}, headers=headers
+    )
+    assert response.status_code == 409, "Overdraw was accepted"
+
+    balance = client.get(f"{url}/balance", headers=headers).json()
+    assert balance["points"] == 120, "Balance does not match"
+
+    page = client.get(f"{url}/entries", params={"limit": 2}, headers=headers).json()
+    assert [e["points"] for e in page["items"]] == [-30, 50], "Wrong entries"
+    page = client.get(
+        f"{url}/entries", params={"cursor": page["next_cursor"]}, headers=headers
+    ).json()
+    assert [e["points"] for e in page["items"]] == [100], "Wrong second page"
+
+    summary = client.get(f"{url}/summary", headers=headers).json()
+    assert summary["totals"]["earn"] == 150, "Summary does not match"
+
+    response = client.get("/api/v1/loyalty/999/balance", headers=headers)
+    assert response.status_code == 404, "Unknown program was found"
+
+
+def test_metrics(client):
+    """
+    Test that served requests show up on /metrics with their DB usage.
+    """
+    _register(client, "testuser", "testpassword", "test@example.com")
+    client.get("/api/v1/users")
+    response = client.get("/metrics")
+    assert response.status_code == 200, response.text
+    assert response.headers["content-type"].startswith("text/plain")
+    assert (
+        'http_requests_total{method="GET",route="/api/v1/users",status="200"}'
+        in response.text
+    ), "Request was not counted"
+    assert (
+        'http_request_db_statements_count{method="POST",'
+        'route="/api/v1/users/register"}' in response.text
+    ), "DB usage was not recorded"
+
+
+def test_hashing_stats(client):
+    """
+    Test that the hashing pool counters are exposed.
+    """
+    _register(client, "testuser", "testpassword", "test@example.com")
+    stats = client.get("/internal/hashing", headers=INTERNAL_HEADERS).json()
+    assert stats["completed"] >= 1, "Hashing job was not counted"
+    assert "queue_depth" in stats, "Queue depth is missing"
+
+
+def test_internal_endpoints_need_the_token(client):
+    """
+    Test that the internal endpoints only answer to the internal token.
+    """
+    assert client.get("/internal/sql-stats").status_code == 401
+    response = client.get(
+        "/internal/sql-stats", headers={"Authorization": "Bearer not-the-token"}
+    )
+    assert response.status_code == 401, "Wrong token was accepted"
+    response = client.get("/internal/sql-stats", headers=INTERNAL_HEADERS)
+    assert response.status_code == 200, response.text
+
+    assert client.post("/internal/sql-stats/reset").status_code == 401
+    response = client.post("/internal/sql-stats/reset", headers=INTERNAL_HEADERS)
+    assert response.status_code == 200, response.text
+
+
+def test_db_pool_stats(client):
+    """
+    Test that the database pool counters are exposed.
+    """
+    stats = client.get("/internal/db-pool", headers=INTERNAL_HEADERS).json()
+    assert set(stats) == {"sync", "async", "replicas"}, "Pool stats are missing"
+    assert "timeouts" in stats["async"], "Timeout counter is missing"
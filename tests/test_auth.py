@@ -0,0 +1,59 @@
+"""
+Tests for access tokens and the token cache
+"""
+
+import time
+from datetime import timedelta
+
+from src.auth.token_cache import TokenCache
+from src.utils.jwt_handler import create_access_token, decode_access_token
+
+
+def test_token_cache_lru_eviction():
+    """
+    Test that the least recently used token is evicted first.
+    """
+    cache = TokenCache(max_size=2)
+    expires_at = time.time() + 60
+    cache.put("a", {"sub": "1", "exp": expires_at})
+    cache.put("b", {"sub": "2", "exp": expires_at})
+    cache.get("a")  # mark a as recently used
+    cache.put("c", {"sub": "3", "exp": expires_at})
+
+    assert cache.get("a") is not None, "Recently used token was evicted"
+    assert cache.get("b") is None, "Least recently used token was not evicted"
+    assert cache.get("c") is not None, "New token was not cached"
+
+
+def test_token_cache_expiry():
+    """
+    Test that a token is dropped from the cache once it expires.
+    """
+    cache = TokenCache()
+    cache.put("expired", {"sub": "1", "exp": time.time() - 1})
+    cache.put("no_exp", {"sub": "1"})
+
+    assert cache.get("expired") is None, "Expired token was returned"
+    assert cache.get("no_exp") is None, "Token without exp was cached"
+    assert cache.stats()["size"] == 0, "Cache is not empty"
+
+
+def test_key_rotation(monkeypatch):
+    """
+    Test that tokens signed with a previous key stay valid after rotation.
+    """
+    monkeypatch.setenv("SECRET_KEY", "old-key")
+    monkeypatch.setenv("PREVIOUS_SECRET_KEYS", "")
+    old_token = create_access_token({"sub": "1"}, timedelta(minutes=5))
+
+    # rotate the signing key, keeping the old one for verification
+    monkeypatch.setenv("SECRET_KEY", "new-key")
+    monkeypatch.setenv("PREVIOUS_SECRET_KEYS", "old-key")
+    new_token = create_access_token({"sub": "2"}, timedelta(minutes=5))
+
+    assert decode_access_token(old_token)["sub"] == "1", "Old token was rejected"
+    assert decode_access_token(new_token)["sub"] == "2", "New token was rejected"
+
+    # retire the old key
+    monkeypatch.setenv("PREVIOUS_SECRET_KEYS", "")
+    assert decode_access_token(old_token) is None, "Retired key was accepted"
@@ -0,0 +1,183 @@
+"""
+Tests for account balance checkpoints
+"""
+
+import random
+from datetime import datetime, timedelta
+
+import pytest
+from sqlmodel import Session, SQLModel, create_engine, select, text
+
+import src.budget.balances  # noqa: F401  registers the checkpoint maintenance hook
+from src.budget.balances import (
+    _minor_amount,
+    account_balance_as_of,
+    current_account_balance,
+    monthly_balances,
+    rebuild_account_checkpoints,
+    to_minor,
+)
+from src.budget.importer import insert_transactions
+from src.models.db_models import Account, AccountBalanceCheckpoint, Transaction, User
+from src.utils.shared import CONFIG
+
+# Use test database
+engine = create_engine(CONFIG.pytest_database_url)
+
+
+@pytest.fixture(name="session", scope="function")
+def session_fixture():
+    """
+    Create a database session for testing
+    """
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        yield session
+    SQLModel.metadata.drop_all(engine)
+
+
+@pytest.fixture(name="account")
+def account_fixture(session: Session):
+    """
+    Create a user with one account.
+    """
+    user = User(username="balances", email="balances@example.com", password="x")
+    session.add(user)
+    session.commit()
+    account = Account(user_id=user.user_id, account_type="checking", balance=0.0)
+    session.add(account)
+    session.commit()
+    return account
+
+
+def _record(account: Account, date: datetime, amount: float) -> dict:
+    return {
+        "user_id": account.user_id,
+        "account_id": account.account_id,
+        "budget_id": None,
+        "date": date,
+        "amount": amount,
+        "description": "purchase",
+    }
+
+
+def _checkpoint(session: Session, account: Account, month: datetime):
+    checkpoint = session.get(
+        AccountBalanceCheckpoint,
+        (account.account_id, month),
+        populate_existing=True,
+    )
+    return (checkpoint.change_minor, checkpoint.transaction_count)
+
+
+def test_to_minor_rounds_half_away_from_zero():
+    """
+    Test that amounts are rounded to cents like SQL ROUND does.
+    """
+    assert to_minor(12.345) == 1235, "Half cent was not rounded up"
+    assert to_minor(-0.125) == -13, "Negative half cent was not rounded away"
+    assert to_minor(0.1 + 0.2) == 30, "Float error leaked into minor units"
+    assert to_minor(0.285) == 29, "Binary noise hid a half cent"
+
+
+def test_sql_rounding_matches_to_minor(session, account):
+    """
+    Test that SQL rounds amounts to minor units exactly like to_minor.
+    """
+    amounts = [0.285, -0.285, 1.005, 10.125, -2.675, 0.1 + 0.2, 30_000_000.5]
+    session.add_all(
+        Transaction(
+            user_id=account.user_id,
+            account_id=account.account_id,
+            date=datetime(2024, 1, 1),
+            amount=amount,
+            description="purchase",
+        )
+        for amount in amounts
+    )
+    session.commit()
+
+    minor = session.exec(
+        select(_minor_amount()).order_by(Transaction.transaction_id)
+    ).all()
+    assert minor == [to_minor(amount) for amount in amounts]
+
+
+def test_checkpoints_follow_orm_writes(session, account):
+    """
+    Test that inserts, updates, back-dating and deletes move the checkpoints.
+    """
+    january, february = datetime(2024, 1, 1), datetime(2024, 2, 1)
+    transaction = Transaction(
+        user_id=account.user_id,
+        account_id=account.account_id,
+        date=datetime(2024, 2, 10),
+        amount=19.99,
+        description="books",
+    )
+    session.add(transaction)
+    session.commit()
+    assert _checkpoint(session, account, february) == (1999, 1), "Insert missed"
+
+    transaction.amount = 25.0
+    session.commit()
+    assert _checkpoint(session, account, february) == (2500, 1), "Update missed"
+
+    transaction.date = datetime(2024, 1, 20)
+    session.commit()
+    assert _checkpoint(session, account, february) == (0, 0), "Move out missed"
+    assert _checkpoint(session, account, january) == (2500, 1), "Move in missed"
+
+    session.delete(transaction)
+    session.commit()
+    assert _checkpoint(session, account, january) == (0, 0), "Delete missed"
+
+
+def test_balance_as_of_matches_full_sum(session, account):
+    """
+    Test that checkpoint-based balances equal summing the whole history.
+    """
+    random.seed(0)
+    start = datetime(2023, 1, 1)
+    records = [
+        _record(
+            account,
+            start + timedelta(minutes=random.randrange(400 * 1440)),
+            round(random.uniform(-300, 300), 2),
+        )
+        for _ in range(2000)
+    ]
+    insert_transactions(session.connection(), records)
+    session.commit()
+
+    connection = session.connection()
+    for _ in range(20):
+        when = start + timedelta(minutes=random.randrange(420 * 1440))
+        expected = sum(to_minor(r["amount"]) for r in records if r["date"] <= when)
+        balance = account_balance_as_of(connection, account.account_id, when)
+        assert balance == expected, f"Balance as of {when} does not match"
+
+    total = sum(to_minor(r["amount"]) for r in records)
+    assert current_account_balance(connection, account.account_id) == total
+
+    history = monthly_balances(connection, account.account_id)
+    assert len(history) == 14, "Months are missing"
+    assert history[-1]["balance_minor"] == total, "Closing balance does not match"
+    opening = monthly_balances(connection, account.account_id, datetime(2024, 1, 5))
+    assert opening == history[12:], "Start did not fold in earlier months"
+
+
+def test_rebuild_account_checkpoints(session, account):
+    """
+    Test that a rebuild reconciles checkpoints with the transactions.
+    """
+    insert_transactions(
+        session.connection(),
+        [_record(account, datetime(2024, 3, day), 1.25) for day in range(1, 5)],
+    )
+    session.exec(text("DELETE FROM accountbalancecheckpoint"))
+    session.commit()
+
+    assert rebuild_account_checkpoints(session.connection()) == 1
+    session.commit()
+    assert _checkpoint(session, account, datetime(2024, 3, 1)) == (500, 4)
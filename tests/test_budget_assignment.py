@@ -0,0 +1,259 @@
+"""
+Tests for automatic budget assignment
+"""
+
+from datetime import datetime
+
+import pytest
+from sqlmodel import Session, SQLModel, create_engine, select
+
+import src.budget.assignment  # noqa: F401  registers the budget assignment hook
+import src.budget.rollups  # noqa: F401  registers the rollup maintenance hook
+from src.budget.assignment import (
+    BUDGET_INDEXES,
+    BudgetIndex,
+    BudgetWindow,
+    backfill_budgets,
+    current_period,
+)
+from src.budget.importer import insert_transactions
+from src.models.db_models import Account, Budget, BudgetRollup, Transaction, User
+from src.utils.shared import CONFIG
+
+# Use test database
+engine = create_engine(CONFIG.pytest_database_url)
+
+
+@pytest.fixture(name="session", scope="function")
+def session_fixture():
+    """
+    Create a database session for testing, with no cached budget indexes
+    """
+    SQLModel.metadata.create_all(engine)
+    BUDGET_INDEXES.clear()
+    with Session(engine) as session:
+        yield session
+    SQLModel.metadata.drop_all(engine)
+
+
+def test_overlapping_windows():
+    """
+    Test that the shortest window covering a date wins, with whole days.
+    """
+    index = BudgetIndex(
+        [
+            BudgetWindow(1, datetime(2024, 1, 1), datetime(2024, 12, 31)),
+            BudgetWindow(2, datetime(2024, 3, 1), datetime(2024, 3, 31)),
+            BudgetWindow(3, datetime(2024, 3, 10), datetime(2024, 3, 12)),
+            BudgetWindow(4, datetime(2025, 6, 1), datetime(2025, 6, 30)),
+        ]
+    )
+    assert index.lookup(datetime(2023, 12, 31)) is None, "Date before all budgets"
+    assert index.lookup(datetime(2024, 2, 29, 23, 59)) == 1
+    assert index.lookup(datetime(2024, 3, 9)) == 2, "Shorter window did not win"
+    assert index.lookup(datetime(2024, 3, 12, 18)) == 3, "End day is not inclusive"
+    assert index.lookup(datetime(2024, 3, 13)) == 2, "Outer window did not resume"
+    assert index.lookup(datetime(2025, 1, 15)) is None, "Gap was assigned"
+    assert index.lookup(datetime(2025, 6, 30)) == 4
+    assert index.lookup(datetime(2025, 7, 1)) is None, "Date after all budgets"
+
+
+def test_recurring_windows():
+    """
+    Test that recurring budgets repeat their window, however far out.
+    """
+    index = BudgetIndex(
+        [
+            # the 25th to the end of every month
+            BudgetWindow(1, datetime(2024, 1, 25), datetime(2024, 1, 31), "monthly"),
+            # every weekend, from Saturday 6 January 2024
+            BudgetWindow(2, datetime(2024, 1, 6), datetime(2024, 1, 7), "weekly"),
+            BudgetWindow(3, datetime(2024, 1, 1), datetime(2024, 12, 31)),
+        ]
+    )
+    assert index.lookup(datetime(2024, 1, 3)) == 3, "Recurred before its start"
+    assert index.lookup(datetime(2024, 2, 29)) == 1, "Month end was not clamped"
+    assert index.lookup(datetime(2024, 3, 1)) == 3, "Clamped period ran over"
+    assert index.lookup(datetime(2024, 4, 27)) == 2, "Weekend did not recur"
+    assert index.lookup(datetime(2024, 4, 26)) == 1
+    assert index.lookup(datetime(2031, 3, 31)) == 1, "Far month did not recur"
+    assert index.lookup(datetime(2031, 3, 30)) == 2, "Far week did not recur"
+    assert index.lookup(datetime(2031, 3, 24)) is None
+    assert index.lookup(datetime(2024, 12, 30)) == 1, "Earlier year was lost"
+
+
+def test_open_ended_and_boundary_dates():
+    """
+    Test that budgets and lookups at the ends of the calendar do not overflow.
+    """
+    index = BudgetIndex(
+        [
+            BudgetWindow(1, datetime(2024, 1, 1), datetime(9999, 12, 31)),
+            BudgetWindow(2, datetime(2024, 1, 25), datetime(2024, 1, 31), "monthly"),
+            BudgetWindow(3, datetime(2024, 1, 6), datetime(2024, 1, 7), "weekly"),
+        ]
+    )
+    assert index.lookup(datetime(2024, 1, 2)) == 1, "Open-ended budget was lost"
+    assert index.lookup(datetime(9999, 12, 28)) == 2, "Last month did not recur"
+    assert index.lookup(datetime(9999, 12, 31, 12)) == 2, "Last day was not covered"
+    assert index.lookup(datetime(9999, 12, 18)) == 3, "Last weeks did not recur"
+    assert index.lookup(datetime.max) is None
+    assert index.lookup(datetime(2024, 6, 3)) == 1, "Near dates after far ones"
+    assert current_period(
+        BudgetWindow(2, datetime(2024, 1, 25), datetime(2024, 1, 31), "monthly"),
+        datetime(9999, 12, 30),
+    ) == (datetime(9999, 12, 25), datetime.max)
+
+
+def test_far_lookups_do_not_generate_every_period():
+    """
+    Test that a lookup far from the last one only builds the periods it needs.
+    """
+    index = BudgetIndex(
+        [BudgetWindow(1, datetime(2024, 1, 6), datetime(2024, 1, 7), "weekly")]
+    )
+    assert index.lookup(datetime(2024, 1, 6)) == 1
+    assert index.lookup(datetime(9000, 1, 1)) is None
+    assert len(index._segments[2]) < 200, "Every year in between was built"
+
+
+def test_current_period():
+    """
+    Test finding the period of a budget in effect at a date.
+    """
+    monthly = BudgetWindow(1, datetime(2024, 1, 25), datetime(2024, 1, 31), "monthly")
+    assert current_period(monthly, datetime(2024, 3, 10)) == (
+        datetime(2024, 2, 25),
+        datetime(2024, 3, 1),
+    ), "Latest started period was not chosen"
+    assert current_period(monthly, datetime(2023, 6, 1)) == (
+        datetime(2024, 1, 25),
+        datetime(2024, 2, 1),
+    ), "Budget yet to start did not give its first period"
+    once = BudgetWindow(2, datetime(2024, 1, 1), datetime(2024, 1, 31))
+    assert current_period(once, datetime(2025, 1, 1)) == (
+        datetime(2024, 1, 1),
+        datetime(2024, 2, 1),
+    )
+
+
+def _setup(session: Session):
+    """
+    Create a user with an account and a January and a recurring budget.
+    """
+    user = User(username="assign", email="assign@example.com", password="x")
+    session.add(user)
+    session.commit()
+    account = Account(user_id=user.user_id, account_type="checking", balance=0.0)
+    january = Budget(
+        user_id=user.user_id,
+        name="january",
+        amount=500.0,
+        start_date=datetime(2024, 1, 1),
+        end_date=datetime(2024, 1, 31),
+    )
+    weekly = Budget(
+        user_id=user.user_id,
+        name="weekly",
+        amount=50.0,
+        start_date=datetime(2024, 1, 1),
+        end_date=datetime(2024, 1, 7),
+        recurrence="weekly",
+    )
+    session.add_all([account, january, weekly])
+    session.commit()
+    return user, account, january, weekly
+
+
+def _transaction(user: User, account: Account, day: int, month: int = 1):
+    return Transaction(
+        user_id=user.user_id,
+        account_id=account.account_id,
+        date=datetime(2024, month, day),
+        amount=10.0,
+        description="coffee",
+    )
+
+
+def _rollup(session: Session, budget: Budget):
+    rollup = session.get(BudgetRollup, budget.budget_id, populate_existing=True)
+    return (rollup.spent, rollup.transaction_count) if rollup else (0.0, 0)
+
+
+def test_orm_inserts_are_assigned(session):
+    """
+    Test that new transactions get a budget, and that the rollups count it.
+    """
+    user, account, january, weekly = _setup(session)
+    transactions = [_transaction(user, account, day) for day in (5, 20)]
+    transactions.append(_transaction(user, account, 14, month=2))
+    explicit = _transaction(user, account, 6)
+    explicit.budget_id = january.budget_id
+    session.add_all([*transactions, explicit])
+    session.commit()
+
+    assert [t.budget_id for t in transactions] == [
+        weekly.budget_id,
+        weekly.budget_id,
+        weekly.budget_id,
+    ], "Transactions were not assigned to the shorter, recurring budget"
+    assert explicit.budget_id == january.budget_id, "Explicit budget was replaced"
+    assert _rollup(session, weekly) == (30.0, 3), "Assignment was not rolled up"
+
+    # a new budget invalidates the cached index of its user
+    session.add(
+        Budget(
+            user_id=user.user_id,
+            name="day",
+            amount=5.0,
+            start_date=datetime(2024, 3, 1),
+            end_date=datetime(2024, 3, 1),
+        )
+    )
+    session.commit()
+    transaction = _transaction(user, account, 1, month=3)
+    session.add(transaction)
+    session.commit()
+    assert transaction.budget_id == 3, "New budget was not used"
+
+
+def test_bulk_inserts_and_backfill(session, monkeypatch):
+    """
+    Test that bulk loads are assigned, and that the backfill assigns the
+    transactions inserted while assignment was off.
+    """
+    user, account, january, weekly = _setup(session)
+    records = [
+        {
+            "user_id": user.user_id,
+            "account_id": account.account_id,
+            "budget_id": None,
+            "date": datetime(2024, 1, day),
+            "amount": 1.0,
+            "description": "coffee",
+        }
+        for day in (3, 30)
+    ]
+    insert_transactions(session.connection(), records)
+    session.commit()
+    assert [r["budget_id"] for r in records] == [weekly.budget_id] * 2
+
+    monkeypatch.setenv("BUDGET_AUTO_ASSIGN", "false")
+    session.add_all([_transaction(user, account, day) for day in range(1, 6)])
+    session.add(_transaction(user, account, 1, month=6))
+    session.commit()
+    assert _rollup(session, weekly) == (2.0, 2), "Assigned while turned off"
+
+    after_id, total = 0, 0
+    while after_id is not None:
+        after_id, assigned = backfill_budgets(
+            session.connection(), after_id=after_id, batch_size=2
+        )
+        total += assigned
+    session.commit()
+    assert total == 6, "Backfill missed transactions"
+    assert _rollup(session, weekly) == (62.0, 8), "Backfill was not rolled up"
+    unassigned = session.exec(
+        select(Transaction).where(Transaction.budget_id.is_(None))
+    ).all()
+    assert unassigned == [], "Transactions were left unassigned"
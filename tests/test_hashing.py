@@ -0,0 +1,51 @@
+"""
+Tests for the password hashing service
+"""
+
+import threading
+
+import pytest
+
+from src.auth.hashing import HashingSaturatedError, PasswordHasher
+
+
+@pytest.fixture(name="hasher", scope="function")
+def hasher_fixture():
+    """
+    Create a small hashing pool for testing
+    """
+    hasher = PasswordHasher(workers=1, max_queue=0)
+    yield hasher
+    hasher.shutdown()
+
+
+def test_hash_and_verify_password(hasher):
+    """
+    Test that a hashed password verifies and a wrong password does not.
+    """
+    hashed = hasher.hash_password("testpassword")
+
+    assert hashed != "testpassword", "Password was not hashed"
+    assert hasher.verify_password("testpassword", hashed), "Password did not verify"
+    assert not hasher.verify_password(
+        "wrongpassword", hashed
+    ), "Wrong password verified"
+
+    stats = hasher.stats()
+    assert stats["completed"] == 3, "Completed counter does not match"
+    assert stats["in_flight"] == 0, "Jobs still in flight"
+
+
+def test_saturated_pool_rejects(hasher):
+    """
+    Test that a full pool rejects new jobs instead of queueing them.
+    """
+    release = threading.Event()
+    blocker = hasher._submit(release.wait)
+
+    with pytest.raises(HashingSaturatedError):
+        hasher.hash_password("testpassword")
+
+    release.set()
+    blocker.result()
+    assert hasher.stats()["rejected"] == 1, "Rejected counter does not match"
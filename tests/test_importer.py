@@ -0,0 +1,194 @@
+"""
+Tests for bulk statement imports
+"""
+
+from datetime import datetime
+
+import pytest
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from src.budget.importer import (
+    CSVStatementParser,
+    OFXStatementParser,
+    import_statement_file,
+)
+from src.models.db_models import Account, Budget, Transaction, User
+from src.utils.shared import CONFIG
+
+# Use test database
+engine = create_engine(CONFIG.pytest_database_url)
+
+OFX_STATEMENT = """OFXHEADER:100
+<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>
+<STMTTRN>
+<TRNTYPE>DEBIT
+<DTPOSTED>20240105120000[-5:EST]
+<TRNAMT>-42.50
+<NAME>GROCERY STORE
+</STMTTRN>
+<STMTTRN><TRNTYPE>CREDIT<DTPOSTED>20240106<TRNAMT>1000.00<MEMO>PAYROLL</STMTTRN>
+</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>
+"""
+
+
+@pytest.fixture(name="session", scope="function")
+def session_fixture():
+    """
+    Create a database session for testing
+    """
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        yield session
+    SQLModel.metadata.drop_all(engine)
+
+
+def test_csv_parser_handles_quoted_newlines():
+    """
+    Test that a quoted field spanning lines is kept as one row.
+    """
+    parser = CSVStatementParser()
+    rows = []
+    for line in ["Date,Amount,Description", '2024-01-05,12.00,"COFFEE', 'SHOP"']:
+        rows += parser.feed(line)
+    rows += parser.close()
+
+    assert rows == [
+        (1, {"date": "2024-01-05", "amount": "12.00", "description": "COFFEE\nSHOP"})
+    ]
+
+
+def test_ofx_parser():
+    """
+    Test parsing SGML-style and single-line OFX transactions.
+    """
+    parser = OFXStatementParser()
+    rows = []
+    for line in OFX_STATEMENT.splitlines():
+        rows += parser.feed(line)
+
+    assert [fields for _, fields in rows] == [
+        {
+            "date": "20240105120000[-5:EST]",
+            "amount": "-42.50",
+            "description": "GROCERY STORE",
+        },
+        {"date": "20240106", "amount": "1000.00", "description": "PAYROLL"},
+    ]
+
+
+def test_import_reports_row_errors(session):
+    """
+    Test that invalid rows are reported while the valid ones are loaded.
+    """
+    user = User(username="importer", email="importer@example.com", password="x")
+    session.add(user)
+    session.commit()
+    account = Account(user_id=user.user_id, account_type="checking", balance=0.0)
+    budget = Budget(
+        user_id=user.user_id,
+        name="food",
+        amount=500.0,
+        start_date=datetime(2024, 1, 1),
+        end_date=datetime(2024, 1, 31),
+    )
+    session.add_all([account, budget])
+    session.commit()
+
+    lines = [
+        "date,amount,description,budget_id",
+        f"2024-01-05,-12.50,COFFEE,{budget.budget_id}",
+        "not-a-date,-1.00,BROKEN,",
+        '01/07/2024,"$1,000.00",PAYROLL,',
+        "2024-01-08,-3.00,,",
+        "2024-01-09,-4.00,BOOKS,999",
+        "2024-01-10,-5.00,LUNCH,",
+    ]
+    result = import_statement_file(
+        session, lines, "csv", user.user_id, account.account_id, batch_size=2
+    )
+
+    assert result.inserted == 3, "Valid rows were not inserted"
+    assert result.failed == 3, "Invalid rows were not counted"
+    assert [error.row for error in result.errors] == [2, 4, 5]
+
+    transactions = session.exec(select(Transaction)).all()
+    assert [t.description for t in transactions] == ["COFFEE", "PAYROLL", "LUNCH"]
+    assert transactions[1].amount == 1000.0, "Amount was not parsed"
+    assert transactions[0].budget_id == budget.budget_id, "Budget was not set"
+
+
+def test_ofx_parser_reads_records_on_one_line():
+    """
+    Test that every transaction of a single-line XML statement is parsed.
+    """
+    parser = OFXStatementParser()
+    rows = parser.feed(
+        "<OFX><BANKTRANLIST>"
+        "<STMTTRN><DTPOSTED>20240105</DTPOSTED><TRNAMT>-1.00</TRNAMT>"
+        "<NAME>A</NAME></STMTTRN>"
+        "<STMTTRN><DTPOSTED>20240106</DTPOSTED><TRNAMT>-2.00</TRNAMT>"
+        "<NAME>B</NAME></STMTTRN>"
+        "</BANKTRANLIST></OFX>"
+    )
+
+    assert rows == [
+        (1, {"date": "20240105", "amount": "-1.00", "description": "A"}),
+        (2, {"date": "20240106", "amount": "-2.00", "description": "B"}),
+    ], "Transactions on one line were dropped"
+
+
+def test_import_rejects_non_finite_amounts(session):
+    """
+    Test that NaN and infinite amounts are reported as row errors.
+    """
+    user = User(username="importer", email="importer@example.com", password="x")
+    session.add(user)
+    session.commit()
+    account = Account(user_id=user.user_id, account_type="checking", balance=0.0)
+    session.add(account)
+    session.commit()
+
+    lines = [
+        "date,amount,description",
+        "2024-01-05,nan,BROKEN",
+        "2024-01-06,-inf,BROKEN",
+        "2024-01-07,-5.00,LUNCH",
+    ]
+    result = import_statement_file(
+        session, lines, "csv", user.user_id, account.account_id
+    )
+
+    assert result.inserted == 1, "Valid row was not inserted"
+    assert [error.row for error in result.errors] == [1, 2], "Amounts not rejected"
+    transactions = session.exec(select(Transaction)).all()
+    assert [t.description for t in transactions] == ["LUNCH"]
+
+
+def test_import_converts_offset_dates_to_utc(session):
+    """
+    Test that dates with a UTC offset are stored as naive UTC.
+    """
+    user = User(username="importer", email="importer@example.com", password="x")
+    session.add(user)
+    session.commit()
+    account = Account(user_id=user.user_id, account_type="checking", balance=0.0)
+    # assigning the budget compares the date with naive budget dates
+    budget = Budget(
+        user_id=user.user_id,
+        name="food",
+        amount=500.0,
+        start_date=datetime(2024, 1, 1),
+        end_date=datetime(2024, 1, 31),
+    )
+    session.add_all([account, budget])
+    session.commit()
+
+    lines = ["date,amount,description", "2024-01-06T10:00:00+02:00,-5.00,LUNCH"]
+    result = import_statement_file(
+        session, lines, "csv", user.user_id, account.account_id
+    )
+
+    assert result.inserted == 1, result.errors
+    transaction = session.exec(select(Transaction)).one()
+    assert transaction.date == datetime(2024, 1, 6, 8), "Date was not made UTC"
+    assert transaction.budget_id == budget.budget_id, "Budget was not assigned"
@@ -0,0 +1,155 @@
+"""
+Tests for the loyalty points ledger
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlmodel import Session, SQLModel, create_engine, func, select, text
+
+from src.models.db_models import LoyaltyCheckpoint, LoyaltyEntry, LoyaltyProgram, User
+from src.points.ledger import (
+    InsufficientPointsError,
+    LoyaltyProgramNotFoundError,
+    balance_as_of,
+    points_summary,
+    post_entry,
+    rebuild_balances,
+)
+from src.utils.shared import CONFIG
+
+# Use test database
+engine = create_engine(CONFIG.pytest_database_url)
+
+
+@pytest.fixture(name="session", scope="function")
+def session_fixture():
+    """
+    Create a database session for testing
+    """
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        yield session
+    SQLModel.metadata.drop_all(engine)
+
+
+@pytest.fixture(name="program")
+def program_fixture(session: Session):
+    """
+    Create a user with an empty loyalty program.
+    """
+    user = User(username="ledger", email="ledger@example.com", password="x")
+    session.add(user)
+    session.commit()
+    program = LoyaltyProgram(
+        user_id=user.user_id,
+        program_name="miles",
+        points=0,
+        last_updated_date=datetime(2024, 1, 1),
+    )
+    session.add(program)
+    session.commit()
+    return program
+
+
+def _balance(session: Session, program: LoyaltyProgram):
+    session.refresh(program)
+    return program.points
+
+
+def test_entries_move_cached_balance(session, program):
+    """
+    Test that every entry is in the ledger and the cached balance follows it.
+    """
+    connection = session.connection()
+    post_entry(connection, program.loyalty_id, "earn", 500)
+    post_entry(connection, program.loyalty_id, "redeem", 200)
+    post_entry(connection, program.loyalty_id, "adjust", -50)
+    posted = post_entry(connection, program.loyalty_id, "expire", 100)
+    session.commit()
+
+    assert posted["balance"] == 150, "Returned balance does not match"
+    assert _balance(session, program) == 150, "Cached balance does not match"
+    ledger = session.exec(select(func.sum(LoyaltyEntry.points))).one()
+    assert ledger == 150, "Ledger does not sum to the balance"
+    assert program.entry_count == 4, "Entries were not counted"
+    last_entry = session.get(LoyaltyEntry, posted["entry_id"])
+    assert program.last_updated_date == last_entry.date, "Program was not dated"
+
+
+def test_overdraw_is_rejected(session, program):
+    """
+    Test that redeeming more than the balance writes nothing.
+    """
+    connection = session.connection()
+    post_entry(connection, program.loyalty_id, "earn", 100)
+    with pytest.raises(InsufficientPointsError):
+        post_entry(connection, program.loyalty_id, "redeem", 101)
+    with pytest.raises(ValueError):
+        post_entry(connection, program.loyalty_id, "earn", -5)
+    with pytest.raises(LoyaltyProgramNotFoundError):
+        post_entry(connection, 999, "earn", 5)
+    session.commit()
+
+    assert _balance(session, program) == 100, "Balance changed"
+    count = session.exec(select(func.count()).select_from(LoyaltyEntry)).one()
+    assert count == 1, "Rejected entries were written"
+
+
+def test_balance_as_of_uses_checkpoints(session, program, monkeypatch):
+    """
+    Test that past balances match a full replay, with checkpoints in place.
+    """
+    monkeypatch.setenv("LOYALTY_CHECKPOINT_INTERVAL", "3")
+    connection = session.connection()
+    start = datetime(2024, 1, 1)
+    balances = []
+    for day in range(10):
+        posted = post_entry(
+            connection,
+            program.loyalty_id,
+            "earn",
+            10 * (day + 1),
+            date=start + timedelta(days=day),
+        )
+        balances.append(posted["balance"])
+    session.commit()
+
+    checkpoints = session.exec(select(LoyaltyCheckpoint)).all()
+    assert [c.balance for c in checkpoints] == [balances[2], balances[5], balances[8]]
+
+    connection = session.connection()
+    assert balance_as_of(connection, program.loyalty_id, start - timedelta(1)) == 0
+    for day, expected in enumerate(balances):
+        when = start + timedelta(days=day, hours=12)
+        assert balance_as_of(connection, program.loyalty_id, when) == expected
+
+
+def test_points_summary(session, program):
+    """
+    Test net points per entry type within a month.
+    """
+    connection = session.connection()
+    post_entry(connection, program.loyalty_id, "earn", 100, date=datetime(2024, 2, 28))
+    post_entry(connection, program.loyalty_id, "earn", 300, date=datetime(2024, 3, 5))
+    post_entry(connection, program.loyalty_id, "redeem", 50, date=datetime(2024, 3, 9))
+    post_entry(connection, program.loyalty_id, "earn", 70, date=datetime(2024, 4, 1))
+
+    totals = points_summary(
+        connection, program.loyalty_id, datetime(2024, 3, 1), datetime(2024, 4, 1)
+    )
+    assert totals == {"earn": 300, "redeem": -50, "adjust": 0, "expire": 0}
+
+
+def test_rebuild_balances(session, program):
+    """
+    Test that a drifted cached balance is recomputed from the ledger.
+    """
+    post_entry(session.connection(), program.loyalty_id, "earn", 40)
+    session.exec(text("UPDATE loyaltyprogram SET points = 7, entry_count = 0"))
+    session.commit()
+
+    assert rebuild_balances(session.connection()) == 1, "Program was not rebuilt"
+    session.commit()
+    assert _balance(session, program) == 40, "Balance was not rebuilt"
+    assert program.entry_count == 1, "Entry count was not rebuilt"
@@ -0,0 +1,90 @@
+"""
+Tests for the queued, structured logging
+"""
+
+import json
+import logging
+import queue
+import sys
+
+from src.utils.logger import (
+    DroppingQueueHandler,
+    JSONFormatter,
+    SizeAndTimeRotatingFileHandler,
+)
+from src.utils.request_context import CURRENT_ROUTE
+
+
+def _record(message: str = "hello %s", args=("world",), **extra) -> logging.LogRecord:
+    record = logging.LogRecord(
+        "app.test", logging.INFO, __file__, 10, message, args, None
+    )
+    record.__dict__.update(extra)
+    return record
+
+
+def test_json_formatter():
+    """
+    Test that records become one JSON object with extras and exceptions.
+    """
+    try:
+        raise RuntimeError("boom")
+    except RuntimeError:
+        record = _record(user_id=7)
+        record.exc_info = sys.exc_info()
+
+    entry = json.loads(JSONFormatter().format(record))
+    assert entry["message"] == "hello world", "Message was not formatted"
+    assert entry["level"] == "INFO", "Level is missing"
+    assert entry["logger"] == "app.test", "Logger name is missing"
+    assert entry["user_id"] == 7, "Extra field is missing"
+    assert "RuntimeError: boom" in entry["exception"], "Exception is missing"
+
+
+def test_queue_handler_drops_instead_of_blocking():
+    """
+    Test that a full queue drops and counts records.
+    """
+    handler = DroppingQueueHandler(queue.Queue(2))
+    for _ in range(5):
+        handler.handle(_record())
+    assert handler.stats() == {"queued": 2, "capacity": 2, "dropped": 3}
+
+
+def test_queue_handler_captures_request_context():
+    """
+    Test that the route and message are resolved in the logging thread.
+    """
+    handler = DroppingQueueHandler(queue.Queue(1))
+    token = CURRENT_ROUTE.set("GET /api/v1/users")
+    try:
+        handler.handle(_record(args=(["mutable"],)))
+    finally:
+        CURRENT_ROUTE.reset(token)
+
+    record = handler.queue.get_nowait()
+    assert record.route == "GET /api/v1/users", "Route was not captured"
+    assert record.getMessage() == "hello ['mutable']", "Message was not merged"
+    assert record.args is None, "Arguments were not dropped"
+
+
+def test_rotation_by_size_and_time(tmp_path):
+    """
+    Test that the file rotates at the size limit and when the interval passes.
+    """
+    path = tmp_path / "app.log"
+    handler = SizeAndTimeRotatingFileHandler(str(path), 200, 3600, 3)
+    handler.setFormatter(JSONFormatter())
+    for _ in range(5):
+        handler.handle(_record())
+    assert (tmp_path / "app.log.1").exists(), "File did not rotate by size"
+
+    path = tmp_path / "timed.log"
+    handler = SizeAndTimeRotatingFileHandler(str(path), 0, 3600, 3)
+    handler.handle(_record())
+    assert not (tmp_path / "timed.log.1").exists(), "File rotated too early"
+    handler.rollover_at = 0
+    handler.handle(_record())
+    handler.close()
+    assert (tmp_path / "timed.log.1").exists(), "File did not rotate by time"
+    assert handler.rollover_at > 0, "Next rotation was not scheduled"
@@ -0,0 +1,116 @@
+"""
+Tests for the request metrics
+"""
+
+import asyncio
+
+from sqlalchemy import create_engine, text
+
+from src.api.metrics import Histogram, MetricsMiddleware, RequestMetrics
+from src.db.tracing import install_db_usage
+from src.utils.request_context import REQUEST_DB_USAGE, DBUsage
+
+
+class _Route:
+    path = "/items/{item_id}"
+
+
+def _app(status: int = 200, statements: int = 0, fail: bool = False):
+    """
+    A bare ASGI app that runs `statements` queries and answers with `status`.
+    """
+    engine = create_engine("sqlite://")
+    install_db_usage(engine)
+
+    async def app(scope, receive, send):
+        scope["route"] = _Route()
+        with engine.connect() as connection:
+            for _ in range(statements):
+                connection.execute(text("SELECT 1"))
+        if fail:
+            raise RuntimeError("boom")
+        await send({"type": "http.response.start", "status": status, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    return app
+
+
+def _call(middleware, path: str = "/items/1"):
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        pass
+
+    scope = {"type": "http", "method": "GET", "path": path}
+    asyncio.run(middleware(scope, receive, send))
+
+
+def test_histogram_buckets():
+    """
+    Test that values land in the first bucket whose bound they do not exceed.
+    """
+    histogram = Histogram((1, 5))
+    for value in (0, 1, 3, 5, 9):
+        histogram.observe(value)
+    assert histogram.counts == [2, 2, 1], "Values are in the wrong buckets"
+    lines = histogram.render("x", 'route="/"')
+    assert 'x_bucket{route="/",le="+Inf"} 5' in lines, "+Inf is not cumulative"
+    assert 'x_sum{route="/"} 18.0' in lines, "Sum is missing"
+
+
+def test_middleware_records_route_status_and_db_usage():
+    """
+    Test that requests are labelled by route template and count their queries.
+    """
+    metrics = RequestMetrics()
+    _call(MetricsMiddleware(_app(statements=3), metrics), "/items/1")
+    _call(MetricsMiddleware(_app(status=404), metrics), "/items/2")
+
+    assert metrics.requests == {
+        ("GET", "/items/{item_id}", 200): 1,
+        ("GET", "/items/{item_id}", 404): 1,
+    }, "Requests were not counted by route template"
+    statements = metrics.db_statements[("GET", "/items/{item_id}")]
+    assert statements.sum == 3, "Statements were not counted"
+    assert metrics.db_seconds[("GET", "/items/{item_id}")].sum > 0, "No DB time"
+    assert metrics.in_flight == 0, "In-flight gauge did not go back down"
+
+    rendered = metrics.render()
+    assert (
+        'http_requests_total{method="GET",route="/items/{item_id}",status="404"} 1'
+        in rendered
+    ), "Counter is missing from the output"
+    assert "# TYPE http_request_duration_seconds histogram" in rendered
+
+
+def test_failed_request_is_counted_as_500():
+    """
+    Test that an exception before the response is recorded as a 500.
+    """
+    metrics = RequestMetrics()
+    try:
+        _call(MetricsMiddleware(_app(fail=True), metrics))
+    except RuntimeError:
+        pass
+    assert metrics.requests == {("GET", "/items/{item_id}", 500): 1}
+
+
+def test_db_usage_outside_of_requests():
+    """
+    Test that statements outside of a request are not counted anywhere.
+    """
+    engine = create_engine("sqlite://")
+    install_db_usage(engine)
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+    assert REQUEST_DB_USAGE.get() is None
+
+    usage = DBUsage()
+    token = REQUEST_DB_USAGE.set(usage)
+    try:
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+    finally:
+        REQUEST_DB_USAGE.reset(token)
+    assert usage.statements == 1, "Statement was not counted"
@@ -0,0 +1,139 @@
+"""
+Tests for schema migrations
+"""
+
+from datetime import datetime
+
+import pytest
+from alembic.autogenerate import compare_metadata
+from alembic.migration import MigrationContext
+from alembic.util import CommandError
+from sqlmodel import Session, SQLModel, create_engine, text
+
+from src.budget.search import is_search_object
+from src.db.migrate import SchemaVersionError, check_schema_version, downgrade, upgrade
+from src.models.db_models import AccountBalanceCheckpoint, Transaction
+from src.utils.shared import CONFIG
+
+# Use test database
+engine = create_engine(CONFIG.pytest_database_url)
+
+
+@pytest.fixture(name="migrated", scope="function")
+def migrated_fixture():
+    """
+    Migrate the test database to head and back down afterwards
+    """
+    upgrade(CONFIG.pytest_database_url)
+    yield
+    downgrade(CONFIG.pytest_database_url)
+
+
+def test_migrations_match_models(migrated):
+    """
+    Test that the migrated schema matches the models.
+    """
+    # the search indexes are made by hand, the models do not describe them
+    opts = {
+        "compare_type": True,
+        "include_name": lambda name, type_, parents: not is_search_object(name),
+    }
+    with engine.connect() as connection:
+        diff = compare_metadata(
+            MigrationContext.configure(connection, opts=opts), SQLModel.metadata
+        )
+    assert diff == [], f"Models and migrations differ: {diff}"
+
+
+def test_check_schema_version(migrated):
+    """
+    Test that the startup check passes at head or later and fails below it.
+    """
+    check_schema_version(engine)
+
+    # a revision of newer code, migrated ahead of its deploy
+    with engine.begin() as connection:
+        version = connection.execute(
+            text("SELECT version_num FROM alembic_version")
+        ).scalar()
+        connection.execute(text("UPDATE alembic_version SET version_num = 'f00d'"))
+    check_schema_version(engine)
+    with engine.begin() as connection:
+        connection.execute(
+            text("UPDATE alembic_version SET version_num = :version"),
+            {"version": version},
+        )
+
+    downgrade(CONFIG.pytest_database_url, "0001")
+    with pytest.raises(SchemaVersionError):
+        check_schema_version(engine)
+
+
+def test_duplicate_usernames_stop_the_unique_indexes():
+    """
+    Test that the lookup indexes are not built over duplicate usernames.
+    """
+    upgrade(CONFIG.pytest_database_url, "0001")
+    try:
+        with engine.begin() as connection:
+            connection.execute(
+                text(
+                    'INSERT INTO "user" (username, email, password) '
+                    "VALUES ('twin', 'one@example.com', 'x'), "
+                    "('twin', 'two@example.com', 'x')"
+                )
+            )
+        with pytest.raises(CommandError, match="user.username"):
+            upgrade(CONFIG.pytest_database_url)
+        with engine.connect() as connection:
+            version = connection.execute(
+                text("SELECT version_num FROM alembic_version")
+            ).scalar()
+        assert version == "0001", "Upgrade went on despite the duplicates"
+    finally:
+        downgrade(CONFIG.pytest_database_url)
+
+
+def test_balance_checkpoints_are_backfilled():
+    """
+    Test that existing transactions are folded into monthly checkpoints.
+    """
+    upgrade(CONFIG.pytest_database_url, "0004")
+    try:
+        with engine.begin() as connection:
+            connection.execute(
+                text(
+                    'INSERT INTO "user" (username, email, password) '
+                    "VALUES ('backfill', 'backfill@example.com', 'x')"
+                )
+            )
+            connection.execute(
+                text(
+                    "INSERT INTO account (user_id, account_type, balance) "
+                    "VALUES (1, 'checking', 0)"
+                )
+            )
+            connection.execute(
+                Transaction.__table__.insert(),
+                [
+                    {
+                        "user_id": 1,
+                        "account_id": 1,
+                        "date": datetime(2024, 1, day),
+                        "amount": 10.05,
+                        "description": "coffee",
+                    }
+                    for day in (3, 17, 30)
+                ],
+            )
+        upgrade(CONFIG.pytest_database_url)
+
+        with Session(engine) as session:
+            checkpoint = session.get(
+                AccountBalanceCheckpoint, (1, datetime(2024, 1, 1))
+            )
+            assert checkpoint is not None, "Checkpoint was not backfilled"
+            assert checkpoint.change_minor == 3015, "Change does not match"
+            assert checkpoint.transaction_count == 3, "Count does not match"
+    finally:
+        downgrade(CONFIG.pytest_database_url)
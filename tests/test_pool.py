@@ -0,0 +1,39 @@
+"""
+Tests for connection pool instrumentation
+"""
+
+import pytest
+from sqlalchemy import exc
+from sqlalchemy.pool import QueuePool
+from sqlmodel import create_engine
+
+from src.db.pool import PoolStats, instrumented_pool_class
+from src.utils.shared import CONFIG
+
+
+def test_pool_stats_count_checkouts_and_timeouts():
+    """
+    Test that checkouts and pool exhaustion timeouts are counted.
+    """
+    stats = PoolStats("test")
+    engine = create_engine(
+        CONFIG.pytest_database_url,
+        poolclass=instrumented_pool_class(QueuePool, stats),
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=0.1,
+    )
+
+    with engine.connect():
+        snapshot = stats.snapshot()
+        assert snapshot["checkouts"] == 1, "Checkout was not counted"
+        assert snapshot["checked_out"] == 1, "Checked out connection not reported"
+
+        # the only connection is taken, so the next checkout times out
+        with pytest.raises(exc.TimeoutError):
+            engine.connect()
+
+    snapshot = stats.snapshot()
+    assert snapshot["timeouts"] == 1, "Timeout was not counted"
+    assert snapshot["checked_out"] == 0, "Connection was not returned"
+    engine.dispose()
@@ -0,0 +1,93 @@
+"""
+Tests for login rate limiting
+"""
+
+import pytest
+
+from src.auth import rate_limit
+from src.auth.rate_limit import (
+    LoginLimiter,
+    LoginRateLimitedError,
+    LoginsSaturatedError,
+    TokenBucketLimiter,
+)
+
+
+@pytest.fixture(name="clock")
+def clock_fixture(monkeypatch):
+    """
+    Replace the limiter's clock with one the test moves forward
+    """
+    clock = [1000.0]
+    monkeypatch.setattr(rate_limit.time, "monotonic", lambda: clock[0])
+    return clock
+
+
+def test_token_bucket_refills(clock):
+    """
+    Test that a bucket allows its burst, then one attempt per refilled token.
+    """
+    limiter = TokenBucketLimiter(rate=0.5, burst=2)
+
+    assert limiter.acquire("a") == 0 and limiter.acquire("a") == 0
+    assert limiter.acquire("a") == pytest.approx(2.0), "Wait should be 1 token"
+    assert limiter.acquire("b") == 0, "Keys should have separate buckets"
+
+    clock[0] += 1
+    assert limiter.acquire("a") == pytest.approx(1.0), "Half a token refilled"
+    clock[0] += 1
+    assert limiter.acquire("a") == 0, "A full token should be refilled"
+
+    clock[0] += 100
+    assert limiter.acquire("a") == 0 and limiter.acquire("a") == 0
+    assert limiter.acquire("a") > 0, "Refill should stop at the burst"
+    assert limiter.stats()["rejected"] == 3, "Rejected counter does not match"
+
+
+def test_token_bucket_evicts_least_recently_used(clock):
+    """
+    Test that the number of buckets stays bounded.
+    """
+    limiter = TokenBucketLimiter(rate=0.1, burst=1, max_keys=2)
+    limiter.acquire("a")
+    limiter.acquire("b")
+    limiter.acquire("a")  # mark a as recently used
+    limiter.acquire("c")
+
+    assert limiter.stats()["keys"] == 2, "Buckets were not evicted"
+    assert limiter.acquire("a") > 0, "Recently used bucket was evicted"
+    assert limiter.acquire("b") == 0, "Evicted bucket should start over"
+
+
+def test_login_limiter(clock):
+    """
+    Test the per-IP and per-username limits and the verification cap.
+    """
+    limiter = LoginLimiter(
+        ip_limiter=TokenBucketLimiter(rate=1, burst=2),
+        username_limiter=TokenBucketLimiter(rate=1, burst=1),
+        max_concurrent=1,
+    )
+    limiter.check("10.0.0.1", "alice")
+    with pytest.raises(LoginRateLimitedError) as error:
+        limiter.check("10.0.0.2", "alice")
+    assert error.value.retry_after == pytest.approx(1.0)
+
+    limiter.check("10.0.0.1", "bob")
+    with pytest.raises(LoginRateLimitedError):
+        limiter.check("10.0.0.1", "carol")
+    assert (
+        limiter.username_limiter.stats()["allowed"] == 2
+    ), "A throttled IP should not use up username attempts"
+
+    with limiter.verifying():
+        with pytest.raises(LoginsSaturatedError):
+            with limiter.verifying():
+                pass
+    with limiter.verifying():
+        pass
+    assert limiter.stats()["verifications"] == {
+        "in_flight": 0,
+        "max_concurrent": 1,
+        "saturated": 1,
+    }
@@ -0,0 +1,65 @@
+"""
+Tests for read replica routing
+"""
+
+import asyncio
+import time
+
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from src.db.pool import PoolStats
+from src.db.replicas import PRIMARY_COOKIE, Replica, ReplicaSet, pinned_to_primary
+
+
+def _replica(url: str) -> Replica:
+    """A replica on an async SQLite engine."""
+    engine = create_async_engine(url, poolclass=NullPool)
+    return Replica(url, engine, PoolStats(url))
+
+
+def test_round_robin_over_healthy_replicas(tmp_path):
+    """
+    Test that replicas take turns and those marked down are skipped.
+    """
+    first = _replica(f"sqlite+aiosqlite:///{tmp_path}/first.db")
+    second = _replica(f"sqlite+aiosqlite:///{tmp_path}/second.db")
+    replicas = ReplicaSet([first, second], check_interval=3600)
+
+    async def choose(times):
+        return [replicas.choose() for _ in range(times)]
+
+    chosen = asyncio.run(choose(4))
+    assert chosen == [first, second, first, second], "Replicas did not alternate"
+
+    second.mark_down("test")
+    assert asyncio.run(choose(2)) == [first, first], "Down replica was chosen"
+    first.mark_down("test")
+    assert asyncio.run(choose(1)) == [None], "Primary was not used as fallback"
+    assert replicas.stats()[0]["failures"] == 1, "Failure was not counted"
+
+
+def test_health_check(tmp_path):
+    """
+    Test that health checks take unreachable replicas out of rotation and
+    put recovered ones back.
+    """
+    reachable = _replica(f"sqlite+aiosqlite:///{tmp_path}/replica.db")
+    unreachable = _replica(f"sqlite+aiosqlite:///{tmp_path}/missing/replica.db")
+    replicas = ReplicaSet([reachable, unreachable], check_timeout=5)
+    reachable.mark_down("test")
+
+    asyncio.run(replicas.check())
+    assert reachable.healthy, "Reachable replica was not put back"
+    assert not unreachable.healthy, "Unreachable replica was kept"
+    assert "health check failed" in unreachable.last_error, "Error was not kept"
+
+
+def test_pinned_to_primary():
+    """
+    Test that only an unexpired read-your-writes cookie pins to the primary.
+    """
+    assert pinned_to_primary({PRIMARY_COOKIE: str(time.time() + 5)})
+    assert not pinned_to_primary({PRIMARY_COOKIE: str(time.time() - 1)})
+    assert not pinned_to_primary({PRIMARY_COOKIE: "garbage"})
+    assert not pinned_to_primary({})
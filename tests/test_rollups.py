@@ -0,0 +1,119 @@
+"""
+Tests for budget spend rollups
+"""
+
+from datetime import datetime
+
+import pytest
+from sqlmodel import Session, SQLModel, create_engine, text
+
+import src.budget.rollups  # noqa: F401  registers the rollup maintenance hook
+from src.budget.importer import insert_transactions
+from src.budget.rollups import rebuild_budget_rollups
+from src.models.db_models import Account, Budget, BudgetRollup, Transaction, User
+from src.utils.shared import CONFIG
+
+# Use test database
+engine = create_engine(CONFIG.pytest_database_url)
+
+
+@pytest.fixture(name="session", scope="function")
+def session_fixture():
+    """
+    Create a database session for testing
+    """
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        yield session
+    SQLModel.metadata.drop_all(engine)
+
+
+def _create_budgets(session: Session, count: int):
+    """
+    Create a user with an account and `count` budgets.
+    """
+    user = User(username="rollups", email="rollups@example.com", password="x")
+    session.add(user)
+    session.commit()
+    account = Account(user_id=user.user_id, account_type="checking", balance=0.0)
+    budgets = [
+        Budget(
+            user_id=user.user_id,
+            name=f"budget {i}",
+            amount=500.0,
+            start_date=datetime(2024, 1, 1),
+            end_date=datetime(2024, 1, 31),
+        )
+        for i in range(count)
+    ]
+    session.add_all([account, *budgets])
+    session.commit()
+    return user, account, budgets
+
+
+def _rollup(session: Session, budget: Budget):
+    rollup = session.get(BudgetRollup, budget.budget_id, populate_existing=True)
+    return (rollup.spent, rollup.transaction_count) if rollup else (0.0, 0)
+
+
+def test_rollup_follows_orm_writes(session):
+    """
+    Test that inserts, updates, moves and deletes are reflected in the rollup.
+    """
+    user, account, (food, fun) = _create_budgets(session, 2)
+
+    transactions = [
+        Transaction(
+            user_id=user.user_id,
+            account_id=account.account_id,
+            budget_id=food.budget_id,
+            date=datetime(2024, 1, 5),
+            amount=amount,
+            description="groceries",
+        )
+        for amount in (10.0, 20.0)
+    ]
+    session.add_all(transactions)
+    session.commit()
+    assert _rollup(session, food) == (30.0, 2), "Inserts were not rolled up"
+
+    transactions[0].amount = 15.0
+    session.commit()
+    assert _rollup(session, food) == (35.0, 2), "Update was not rolled up"
+
+    transactions[1].budget_id = fun.budget_id
+    session.commit()
+    assert _rollup(session, food) == (15.0, 1), "Move out was not rolled up"
+    assert _rollup(session, fun) == (20.0, 1), "Move in was not rolled up"
+
+    session.delete(transactions[0])
+    session.commit()
+    assert _rollup(session, food) == (0.0, 0), "Delete was not rolled up"
+
+
+def test_rollup_follows_bulk_inserts_and_rebuild(session):
+    """
+    Test that bulk loads update the rollup and a rebuild fixes drift.
+    """
+    user, account, (food,) = _create_budgets(session, 1)
+    records = [
+        {
+            "user_id": user.user_id,
+            "account_id": account.account_id,
+            "budget_id": food.budget_id,
+            "date": datetime(2024, 1, day),
+            "amount": 5.0,
+            "description": "coffee",
+        }
+        for day in range(1, 11)
+    ]
+    insert_transactions(session.connection(), records)
+    session.commit()
+    assert _rollup(session, food) == (50.0, 10), "Bulk insert was not rolled up"
+
+    # drift the rollup behind its back, then reconcile
+    session.exec(text("UPDATE budgetrollup SET spent = 0, transaction_count = 0"))
+    session.commit()
+    rebuild_budget_rollups(session.connection())
+    session.commit()
+    assert _rollup(session, food) == (50.0, 10), "Rebuild did not reconcile drift"
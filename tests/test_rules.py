@@ -0,0 +1,247 @@
+"""
+Tests for transaction categorization rules
+"""
+
+from datetime import datetime
+
+import pytest
+from sqlmodel import Session, SQLModel, create_engine, select
+
+import src.budget.rollups  # noqa: F401  registers the rollup maintenance hook
+import src.budget.rules  # noqa: F401  registers the rule cache invalidation hooks
+from src.budget.importer import insert_transactions
+from src.budget.rules import (
+    MAX_PATTERN_LENGTH,
+    RULE_MATCHERS,
+    KeywordAutomaton,
+    RuleMatcher,
+    RuleSpec,
+    recategorize,
+    validate_rule,
+)
+from src.models.db_models import (
+    Account,
+    Budget,
+    BudgetRollup,
+    CategoryRule,
+    Transaction,
+    User,
+)
+from src.utils.shared import CONFIG
+
+# Use test database
+engine = create_engine(CONFIG.pytest_database_url)
+
+
+@pytest.fixture(name="session", scope="function")
+def session_fixture():
+    """
+    Create a database session for testing, with no cached rule matchers
+    """
+    SQLModel.metadata.create_all(engine)
+    RULE_MATCHERS.clear()
+    with Session(engine) as session:
+        yield session
+    SQLModel.metadata.drop_all(engine)
+
+
+def _rule(rule_id, pattern, match_type="contains", priority=0, budget_id=None):
+    return RuleSpec(
+        rule_id, pattern, match_type, f"rule {rule_id}", budget_id, priority
+    )
+
+
+def test_keyword_automaton():
+    """
+    Test that every occurrence of every keyword is found, overlaps included.
+    """
+    automaton = KeywordAutomaton(["HE", "SHE", "HERS", "HIS"])
+    assert sorted(automaton.find("USHERS")) == [(4, 0), (4, 1), (6, 2)]
+    assert list(automaton.find("NOTHING")) == [], "Found a keyword that is absent"
+
+
+def test_rule_precedence():
+    """
+    Test that the lowest priority wins across literal and regex rules.
+    """
+    matcher = RuleMatcher(
+        [
+            _rule(1, "amzn", priority=5),
+            _rule(2, "AMZN  MKTP", priority=1),
+            _rule(3, r"mktp us\*\w+", "regex", priority=0),
+            _rule(4, "COFFEE", "prefix"),
+            _rule(5, "payroll", "exact"),
+            _rule(6, r"^UBER\b", "regex", priority=9),
+        ]
+    )
+    assert matcher.match("AMZN Mktp US*2K4").rule_id == 3, "Regex priority lost"
+    assert matcher.match("AMZN MKTP CA").rule_id == 2, "Whitespace not collapsed"
+    assert matcher.match("amzn prime").rule_id == 1
+    assert matcher.match("coffee shop").rule_id == 4
+    assert matcher.match("BEST COFFEE") is None, "Prefix matched mid-description"
+    assert matcher.match(" Payroll ").rule_id == 5
+    assert matcher.match("PAYROLL BONUS") is None, "Exact matched a longer text"
+    assert matcher.match("Uber trip").rule_id == 6
+    assert matcher.match("SUBER") is None, "Anchored regex matched mid-text"
+    assert RuleMatcher([]).match("ANYTHING") is None
+
+
+def test_validate_rule():
+    """
+    Test that rules that cannot be compiled together, or could backtrack
+    exponentially, are rejected.
+    """
+    validate_rule(r"AMZN|AMAZON", "regex")
+    validate_rule(r"(AMZN )?MKTP[+*]+\d{2,}", "regex")
+    for pattern, match_type in [
+        ("(unclosed", "regex"),
+        (r"(a)\1", "regex"),
+        ("(?P<name>x)", "regex"),
+        ("(a+)+$", "regex"),
+        (r"(?:\w+\s?)*X", "regex"),
+        ("((ab)*c){2,}", "regex"),
+        ("A" * (MAX_PATTERN_LENGTH + 1), "contains"),
+        ("  ", "contains"),
+        ("x", "glob"),
+    ]:
+        with pytest.raises(ValueError):
+            validate_rule(pattern, match_type)
+
+
+def _setup(session: Session):
+    """
+    Create a user with an account, a budget and a rule assigning to it.
+    """
+    user = User(username="rules", email="rules@example.com", password="x")
+    session.add(user)
+    session.commit()
+    account = Account(user_id=user.user_id, account_type="checking", balance=0.0)
+    budget = Budget(
+        user_id=user.user_id,
+        name="shopping",
+        amount=500.0,
+        start_date=datetime(2030, 1, 1),
+        end_date=datetime(2030, 1, 31),
+    )
+    session.add_all([account, budget])
+    session.commit()
+    session.add(
+        CategoryRule(
+            user_id=user.user_id,
+            pattern="AMZN",
+            category="shopping",
+            budget_id=budget.budget_id,
+        )
+    )
+    session.commit()
+    return user, account, budget
+
+
+def _rollup(session: Session, budget: Budget):
+    rollup = session.get(BudgetRollup, budget.budget_id, populate_existing=True)
+    return (rollup.spent, rollup.transaction_count) if rollup else (0.0, 0)
+
+
+def test_imports_are_categorized(session):
+    """
+    Test that bulk loads take the category and budget of the matching rule.
+    """
+    user, account, budget = _setup(session)
+    records = [
+        {
+            "user_id": user.user_id,
+            "account_id": account.account_id,
+            "budget_id": None,
+            "date": datetime(2024, 1, 5),
+            "amount": 10.0,
+            "description": description,
+        }
+        for description in ("AMZN MKTP US*2K4", "amzn prime", "RENT")
+    ]
+    insert_transactions(session.connection(), records)
+    session.commit()
+
+    assert [r.get("category") for r in records] == ["shopping", "shopping", None]
+    assert _rollup(session, budget) == (20.0, 2), "Rule budget was not rolled up"
+
+
+def test_recategorize(session):
+    """
+    Test that the job applies changed rules to the existing transactions.
+    """
+    user, account, budget = _setup(session)
+    session.add_all(
+        [
+            Transaction(
+                user_id=user.user_id,
+                account_id=account.account_id,
+                date=datetime(2024, 1, day),
+                amount=5.0,
+                description=description,
+            )
+            for day, description in [(1, "STARBUCKS 123"), (2, "AMZN"), (3, "RENT")]
+        ]
+    )
+    session.commit()
+    assert _rollup(session, budget) == (0.0, 0), "ORM inserts were categorized"
+
+    session.add(
+        CategoryRule(user_id=user.user_id, pattern="STARBUCKS", category="coffee")
+    )
+    session.commit()
+    after_id, total = 0, 0
+    while after_id is not None:
+        after_id, changed = recategorize(
+            session.connection(), user.user_id, after_id, batch_size=2
+        )
+        total += changed
+    session.commit()
+
+    assert total == 2, "Wrong number of transactions changed"
+    categories = session.exec(
+        select(Transaction.category).order_by(Transaction.transaction_id)
+    ).all()
+    assert categories == ["coffee", "shopping", None], "Rules were not re-applied"
+    assert _rollup(session, budget) == (5.0, 1), "Moved budget was not rolled up"
+
+
+def test_recategorize_keeps_assigned_budgets(session):
+    """
+    Test that the job only moves assigned transactions when asked to.
+    """
+    user, account, budget = _setup(session)
+    manual = Budget(
+        user_id=user.user_id,
+        name="gifts",
+        amount=100.0,
+        start_date=datetime(2030, 2, 1),
+        end_date=datetime(2030, 2, 28),
+    )
+    session.add(manual)
+    session.commit()
+    session.add(
+        Transaction(
+            user_id=user.user_id,
+            account_id=account.account_id,
+            budget_id=manual.budget_id,
+            date=datetime(2024, 1, 1),
+            amount=5.0,
+            description="AMZN GIFT CARD",
+        )
+    )
+    session.commit()
+
+    recategorize(session.connection(), user.user_id)
+    session.commit()
+    transaction = session.exec(select(Transaction)).one()
+    session.refresh(transaction)
+    assert transaction.category == "shopping", "Category was not re-applied"
+    assert transaction.budget_id == manual.budget_id, "Assigned budget was replaced"
+    assert _rollup(session, budget) == (0.0, 0)
+
+    recategorize(session.connection(), user.user_id, reassign_budgets=True)
+    session.commit()
+    session.refresh(transaction)
+    assert transaction.budget_id == budget.budget_id, "Budget was not reassigned"
+    assert _rollup(session, budget) == (5.0, 1), "Moved budget was not rolled up"
+    assert _rollup(session, manual) == (0.0, 0), "Old budget was not rolled back"
@@ -0,0 +1,116 @@
+"""
+Tests for transaction search
+"""
+
+from datetime import datetime
+
+import pytest
+from sqlmodel import Session, create_engine, select
+
+from src.budget.search import (
+    match_condition,
+    max_edits,
+    parse_query,
+    search_transactions,
+    within_edits,
+)
+from src.db.migrate import downgrade, upgrade
+from src.models.db_models import Account, Transaction, User
+from src.utils.shared import CONFIG
+
+# Use test database
+engine = create_engine(CONFIG.pytest_database_url)
+
+
+@pytest.fixture(name="session", scope="function")
+def session_fixture():
+    """
+    Create a database session for testing, migrated so the search index exists
+    """
+    upgrade(CONFIG.pytest_database_url)
+    with Session(engine) as session:
+        yield session
+    downgrade(CONFIG.pytest_database_url)
+
+
+def test_parse_query():
+    """
+    Test that queries are split into distinct lower-cased words.
+    """
+    assert parse_query("Starbucks  #123 starbucks") == ["starbucks", "123"]
+    assert parse_query('AMZN" OR *') == ["amzn", "or"], "Operators were kept"
+    with pytest.raises(ValueError):
+        parse_query("#*")
+
+
+def test_within_edits():
+    """
+    Test the edit distance check and the typos tolerated per word length.
+    """
+    assert within_edits("starbucks", "starbukcs", 2), "Transposition rejected"
+    assert within_edits("amazon", "amazn", 1), "Deletion rejected"
+    assert not within_edits("amazon", "amzn", 1), "Two edits accepted as one"
+    assert not within_edits("shell", "shelter", 1), "Length difference ignored"
+    assert [max_edits(word) for word in ("tax", "uber", "starbucks")] == [0, 1, 2]
+
+
+def test_index_follows_changes(session):
+    """
+    Test that the search index follows inserts, updates and deletes.
+    """
+    session.add(User(username="testuser", email="test@example.com", password="x"))
+    session.add(Account(user_id=1, account_type="checking", balance=0.0))
+    transaction = Transaction(
+        user_id=1,
+        account_id=1,
+        date=datetime(2024, 1, 5),
+        amount=4.5,
+        description="STARBUCKS #1",
+    )
+    session.add(transaction)
+    session.commit()
+
+    def found(query):
+        page = search_transactions(session.connection(), 1, query)
+        return [item["transaction_id"] for item in page["items"]]
+
+    assert found("starbucks") == [transaction.transaction_id], "Insert not indexed"
+    transaction.description = "PEETS COFFEE"
+    session.commit()
+    assert found("starbucks") == [], "Old description still indexed"
+    assert found("peets") == [transaction.transaction_id], "Update not indexed"
+    session.delete(session.exec(select(Transaction)).one())
+    session.commit()
+    assert found("peets") == [], "Deleted transaction still found"
+
+
+def test_index_is_scoped_to_the_user(session):
+    """
+    Test that the full-text match only returns the user's own rows.
+    """
+    for user_id in (1, 2):
+        session.add(
+            User(
+                username=f"user{user_id}",
+                email=f"user{user_id}@example.com",
+                password="x",
+            )
+        )
+        session.add(Account(user_id=user_id, account_type="checking", balance=0.0))
+    session.commit()
+    for user_id in (1, 2, 2):
+        session.add(
+            Transaction(
+                user_id=user_id,
+                account_id=user_id,
+                date=datetime(2024, 1, 5),
+                amount=1.0,
+                description="STARBUCKS",
+            )
+        )
+    session.commit()
+
+    connection = session.connection()
+    condition = match_condition(connection, 1, ["starbucks"])
+    matched = connection.execute(select(Transaction.user_id).where(condition)).all()
+    assert matched == [(1,)], "Another user's rows were matched"
@@ -0,0 +1,115 @@
+"""
+Tests for the synthetic data seeder
+"""
+
+import argparse
+from datetime import datetime
+
+import pytest
+from sqlmodel import Session, SQLModel, create_engine, func, select
+
+from scripts import seed_data
+from src.budget.balances import current_account_balance, to_minor
+from src.models.db_models import (
+    Account,
+    BudgetRollup,
+    LoyaltyCheckpoint,
+    LoyaltyEntry,
+    LoyaltyProgram,
+    Transaction,
+    User,
+)
+from src.utils.shared import CONFIG
+
+# Use test database
+engine = create_engine(CONFIG.pytest_database_url)
+
+ARGS = argparse.Namespace(
+    seed=7,
+    transactions_per_user=50,
+    entries_per_program=150,
+    max_accounts=3,
+    max_budgets=4,
+    max_programs=2,
+    start=datetime(2024, 1, 1),
+    end=datetime(2025, 1, 1),
+)
+
+
+@pytest.fixture(name="session", scope="function")
+def session_fixture():
+    """
+    Create a database session for testing
+    """
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        yield session
+    SQLModel.metadata.drop_all(engine)
+
+
+def test_generation_does_not_depend_on_chunking():
+    """
+    Test that users are generated the same whether in one chunk or several
+    """
+    whole = seed_data.generate_users(ARGS, 1, 20, "hash")
+    first = seed_data.generate_users(ARGS, 1, 8, "hash")
+    second = seed_data.generate_users(ARGS, 9, 20, "hash")
+
+    for table in whole[0]:
+        assert whole[0][table] == first[0][table] + second[0][table], table
+    assert whole[1] == first[1] + second[1], "Transactions should match"
+    assert whole != seed_data.generate_users(
+        argparse.Namespace(**{**vars(ARGS), "seed": 8}), 1, 20, "hash"
+    ), "Another seed should generate other data"
+
+
+def test_load_users_keeps_derived_tables_consistent(session: Session):
+    """
+    Test that loaded users come with matching rollups, checkpoints and ledgers
+    """
+    seed_data.init_worker(CONFIG.pytest_database_url, ARGS, "hash")
+    users, transactions = seed_data.load_users((1, 10))
+    assert (users, transactions) == (
+        10,
+        session.exec(select(func.count()).select_from(Transaction)).one(),
+    ), "Loaded counts should be reported"
+    assert session.exec(select(func.count()).select_from(User)).one() == 10
+
+    _, generated = seed_data.generate_users(ARGS, 1, 10, "hash")
+    assert [t["budget_id"] for t in generated] == session.exec(
+        select(Transaction.budget_id).order_by(Transaction.transaction_id)
+    ).all(), "Transactions left unbudgeted were assigned a budget"
+
+    for account in session.exec(select(Account)).all():
+        amounts = session.exec(
+            select(Transaction.amount).where(
+                Transaction.account_id == account.account_id
+            )
+        ).all()
+        assert current_account_balance(session.connection(), account.account_id) == sum(
+            map(to_minor, amounts)
+        ), "Checkpoints should match transactions"
+
+    for rollup in session.exec(select(BudgetRollup)).all():
+        spent = session.exec(
+            select(func.sum(Transaction.amount)).where(
+                Transaction.budget_id == rollup.budget_id
+            )
+        ).one()
+        assert rollup.spent == pytest.approx(spent), "Rollups should match"
+
+    for program in session.exec(select(LoyaltyProgram)).all():
+        points = session.exec(
+            select(LoyaltyEntry.points).where(
+                LoyaltyEntry.loyalty_id == program.loyalty_id
+            )
+        ).all()
+        assert program.points == sum(points) >= 0, "Balance should match ledger"
+        assert program.entry_count == len(points)
+        checkpoints = session.exec(
+            select(func.count()).where(
+                LoyaltyCheckpoint.loyalty_id == program.loyalty_id
+            )
+        ).one()
+        assert checkpoints == len(points) // CONFIG.loyalty_checkpoint_interval
+    seed_data._ENGINE.dispose()
@@ -0,0 +1,106 @@
+"""
+Tests for the production server supervisor
+"""
+
+import os
+import socket
+import threading
+import time
+
+import httpx
+from fastapi import FastAPI
+
+from src.api import serve
+from src.api.serve import Supervisor
+
+# Served by the spawned workers instead of the API, which needs a database
+app = FastAPI()
+
+
+@app.get("/pid")
+def get_pid():
+    return {"pid": os.getpid()}
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_workers_are_recycled_and_drained():
+    """
+    Test that a worker is replaced after its requests and stopped on exit.
+    """
+    port = _free_port()
+    options = {
+        "host": "127.0.0.1",
+        "port": port,
+        "lifespan": "on",
+        "timeout_graceful_shutdown": 5,
+        "log_config": None,
+    }
+    supervisor = Supervisor(
+        options, workers=1, max_requests=2, app="tests.test_serve:app"
+    )
+    pids, statuses = [], []
+
+    def make_requests():
+        deadline = time.monotonic() + 60
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}") as client:
+            while len(pids) < 5 and time.monotonic() < deadline:
+                try:
+                    # a new connection per request, so recycling can happen
+                    response = client.get("/pid", headers={"Connection": "close"})
+                except httpx.TransportError:
+                    time.sleep(0.2)  # no worker is accepting yet
+                    continue
+                statuses.append(response.status_code)
+                pids.append(response.json()["pid"])
+                # uvicorn checks the request limit once per 0.1s tick
+                time.sleep(0.3)
+        supervisor.should_exit.set()
+
+    thread = threading.Thread(target=make_requests)
+    thread.start()
+    exit_code = supervisor.run()
+    thread.join()
+
+    assert exit_code == 0, "Supervisor did not exit cleanly"
+    assert statuses == [200] * 5, "Requests failed"
+    assert len(set(pids)) >= 2, "Worker was not recycled after its requests"
+    assert not any(
+        process.is_alive() for process, _ in supervisor.processes.values()
+    ), "Workers were left running"
+
+
+class _ExitedProcess:
+    """Stands in for a worker process that exited with an error"""
+
+    pid = 0
+    exitcode = 3
+
+    def is_alive(self):
+        return False
+
+    def join(self, timeout=None):
+        pass
+
+
+def test_startup_failures_stop_only_in_a_loop(monkeypatch):
+    """
+    Test that a transient startup failure is restarted and a crash loop stops.
+    """
+    supervisor = Supervisor({}, workers=1)
+    spawned = []
+
+    def spawn(slot):
+        spawned.append(slot)
+        supervisor.processes[slot] = (_ExitedProcess(), time.monotonic())
+
+    monkeypatch.setattr(supervisor, "spawn", spawn)
+    spawn(0)
+    for _ in range(serve.CRASH_LOOP_FAILURES - 1):
+        assert supervisor.replace_exited() == 0, "Stopped on a transient failure"
+    assert len(spawned) == serve.CRASH_LOOP_FAILURES, "Worker was not restarted"
+    assert supervisor.replace_exited() == 3, "Crash loop did not stop the server"
@@ -0,0 +1,63 @@
+"""
+Tests for SQL tracing
+"""
+
+from sqlmodel import create_engine, text
+
+from src.db import tracing
+from src.db.tracing import SQLTracer, fingerprint
+from src.utils.shared import CONFIG
+
+
+def test_fingerprint_normalizes_literals():
+    """
+    Test that statements differing only in literals share a fingerprint.
+    """
+    assert fingerprint("SELECT * FROM user WHERE user_id = 1") == fingerprint(
+        "SELECT *  FROM user\nWHERE user_id = 42"
+    )
+    assert fingerprint("SELECT 1 WHERE name IN (?, ?, ?)") == fingerprint(
+        "SELECT 2 WHERE name IN (?, ?)"
+    )
+    assert fingerprint("SELECT 'a'::text") == "SELECT ?::text"
+
+
+def test_tracer_aggregates_and_slow_queries():
+    """
+    Test that executed statements are aggregated and slow ones recorded.
+    """
+    tracer = SQLTracer(slow_query_ms=0)  # every statement counts as slow
+    engine = create_engine(CONFIG.pytest_database_url)
+    tracer.install(engine)
+
+    with engine.connect() as conn:
+        for i in range(3):
+            conn.execute(text(f"SELECT {i}"))
+
+    dump = tracer.dump()
+    assert len(dump["statements"]) == 1, "Statements were not aggregated"
+    assert dump["statements"][0]["count"] == 3, "Statement count does not match"
+    assert dump["statements"][0]["p95_ms"] >= 0, "p95 is missing"
+    assert len(dump["slow_queries"]) == 3, "Slow queries were not recorded"
+
+    tracer.reset()
+    assert tracer.dump()["statements"] == [], "Tracer was not reset"
+    engine.dispose()
+
+
+def test_slow_query_log_omits_parameters(monkeypatch):
+    """
+    Test that slow queries are logged without their bound parameters.
+    """
+    warnings = []
+    monkeypatch.setattr(tracing.LOGGER, "warning", warnings.append)
+    tracer = SQLTracer(slow_query_ms=0)
+    engine = create_engine(CONFIG.pytest_database_url)
+    tracer.install(engine)
+
+    with engine.connect() as conn:
+        conn.execute(text("SELECT :secret"), {"secret": "hunter2"})
+
+    assert len(warnings) == 1, "Slow query was not logged"
+    assert "hunter2" not in warnings[0], "Parameters were logged"
+    engine.dispose()
@@ -0,0 +1,79 @@
+"""
+Tests for the user lookup cache
+"""
+
+import pytest
+from sqlmodel import Session, SQLModel, create_engine
+
+from src.auth import user_cache
+from src.auth.user_cache import USER_CACHE, CachedUser, UserCache
+from src.models.db_models import User
+from src.utils.shared import CONFIG
+
+# Use test database
+engine = create_engine(CONFIG.pytest_database_url)
+
+
+def _user(user_id: int, username: str) -> CachedUser:
+    return CachedUser(user_id, username, f"{username}@example.com", "hash")
+
+
+@pytest.fixture(name="session", scope="function")
+def session_fixture():
+    """
+    Create a database session for testing
+    """
+    SQLModel.metadata.create_all(engine)
+    USER_CACHE.clear()
+    with Session(engine) as session:
+        yield session
+    SQLModel.metadata.drop_all(engine)
+
+
+def test_user_cache_lru_and_ttl(monkeypatch):
+    """
+    Test that users are found by id and username until evicted or expired.
+    """
+    clock = [1000.0]
+    monkeypatch.setattr(user_cache.time, "monotonic", lambda: clock[0])
+    cache = UserCache(max_size=2, ttl=60)
+    cache.put(_user(1, "a"), cache.version)
+    cache.put(_user(2, "b"), cache.version)
+    assert cache.get_by_username("a") == _user(1, "a"), "User a was not cached"
+    cache.put(_user(3, "c"), cache.version)
+
+    assert cache.get(2) is None, "Least recently used user was not evicted"
+    assert cache.get_by_username("b") is None, "Username outlived its entry"
+    assert cache.get(3) == _user(3, "c"), "New user was not cached"
+
+    clock[0] += 61
+    assert cache.get(1) is None, "Expired user was returned"
+    assert cache.stats()["hits"] == 2, "Hit counter does not match"
+    assert cache.stats()["misses"] == 3, "Miss counter does not match"
+
+
+def test_user_cache_skips_reads_older_than_an_invalidation():
+    """
+    Test that a user read before an invalidation is not cached after it.
+    """
+    cache = UserCache()
+    version = cache.version
+    cache.invalidate(1)  # a write committed while the lookup was running
+    cache.put(_user(1, "a"), version)
+    assert cache.get(1) is None, "Stale read was cached"
+
+
+def test_committed_writes_invalidate(session: Session):
+    """
+    Test that committing a change to a user drops it from the cache.
+    """
+    user = User(username="testuser", email="test@example.com", password="hash")
+    session.add(user)
+    session.commit()
+    cached = CachedUser(user.user_id, user.username, user.email, user.password)
+    USER_CACHE.put(cached, USER_CACHE.version)
+
+    user.email = "new@example.com"
+    session.add(user)
+    session.commit()
+    assert USER_CACHE.get(user.user_id) is None, "Updated user is still cached"